@@ -0,0 +1,318 @@
+"""
+Asynchronous Calendar API backend: events().list called directly on the
+REST endpoint through one pooled httpx.AsyncClient (HTTP/2 when the h2
+package is installed), so hundreds of calendars can be fetched at once
+in one event loop instead of one blocking httplib2 connection per thread.
+Needs httpx and h2: pip install -r requirements-optional.txt
+
+    CALENDAR_BACKEND=httpx        every calendar uses it (clients.get_calendar_service)
+    CALENDAR_API_ROOT=url         another endpoint, e.g. a local mock server
+    CALENDAR_MAX_CONNECTIONS=10   connection pool size and requests in flight
+
+AsyncCalendarService offers the events().list(**params).execute() and
+calendars().get(calendarId=...).execute() interface of the googleapiclient
+service, running the requests on a background event loop shared by all
+threads, so Calendar and calendar_api use it unchanged. fetch_many() fetches many (calendar,
+period) windows concurrently. Both go through the shared rate limiter
+and retry like calendar_api.list_events_page.
+"""
+import asyncio
+import os
+import threading
+import time as clock
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import quote
+
+import calendar_api
+from calendar_api import (LIST_FIELDS, MAX_RESULTS, MAX_RETRIES, CalendarFetchError, FetchStats, TokenBucket,
+                          http_status, is_retryable, retry_delay)
+
+API_ROOT = os.environ.get("CALENDAR_API_ROOT", "https://www.googleapis.com/calendar/v3")
+# httpx's pool gets slower with every connection it holds, and the
+# default CALENDAR_API_QPS is reached well before 10 are busy
+MAX_CONNECTIONS = int(os.environ.get("CALENDAR_MAX_CONNECTIONS", 10))
+REQUEST_TIMEOUT = 60.0
+
+# (calendar_id, timeMin, timeMax) with RFC3339 strings or aware datetimes,
+# optionally followed by the q= text of the window
+Time = Union[str, datetime]
+Window = Union[Tuple[str, Time, Time], Tuple[str, Time, Time, Optional[str]]]
+
+
+def _import_httpx():
+    try:
+        import httpx
+    except ImportError:
+        raise RuntimeError('The async Calendar backend needs httpx: pip install -r requirements-optional.txt') from None
+    return httpx
+
+
+class HttpError(Exception):
+    """
+    An error response, read by calendar_api like googleapiclient's
+    HttpError: status, resp.get('retry-after') and content
+    """
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}: {response.text[:200]}")
+        self.status = response.status_code
+        self.resp = response.headers
+        self.content = response.content
+
+
+def _events_path(calendar_id: str) -> str:
+    return f"/calendars/{quote(calendar_id, safe='')}/events"
+
+
+def _query_params(params: dict) -> Dict[str, str]:
+    """
+    To turn events().list keyword arguments into query parameters
+    """
+    query = {}
+    for name, value in params.items():
+        if value is None or name == "calendarId":
+            continue
+        query[name] = ("true" if value else "false") if isinstance(value, bool) else str(value)
+    return query
+
+
+class AsyncCalendarClient:
+    """
+    Calendar API requests over one pooled httpx.AsyncClient.
+    Create and use it within a single event loop, and aclose() it
+    """
+    def __init__(self, credentials=None, api_root: str = API_ROOT, max_connections: int = MAX_CONNECTIONS,
+                 http2: Optional[bool] = None):
+        """
+        credentials: google-auth credentials, refreshed when expired (None sends no authorization)
+        http2: defaults to whether the h2 package is installed
+        """
+        httpx = _import_httpx()
+        if http2 is None:
+            try:
+                import h2  # noqa: F401
+                http2 = True
+            except ImportError:
+                http2 = False
+        self.credentials = credentials
+        self.api_root = api_root.rstrip("/")
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=REQUEST_TIMEOUT,
+            headers={"accept-encoding": "gzip", "user-agent": "working-hours-analyser (gzip)"},
+        )
+        # Requests beyond the pool wait here rather than for a pool connection, which times out
+        self._in_flight = asyncio.Semaphore(max_connections)
+        self._refresh_lock = threading.Lock()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        await self.aclose()
+
+    async def _authorization(self) -> Dict[str, str]:
+        if self.credentials is None:
+            return {}
+        if not self.credentials.valid:
+            await asyncio.to_thread(self._refresh_credentials)
+        return {"authorization": f"Bearer {self.credentials.token}"}
+
+    def _refresh_credentials(self):
+        from google.auth.transport.requests import Request
+        with self._refresh_lock:
+            if not self.credentials.valid:
+                self.credentials.refresh(Request())
+
+    async def request(self, path: str, params: dict) -> Tuple[dict, int, bool]:
+        """
+        To GET an API resource (path under api_root) once, returning its
+        JSON, its payload bytes and whether it came gzipped. Raises HttpError
+        for error responses and httpx errors for network failures
+        """
+        headers = await self._authorization()
+        async with self._in_flight:
+            response = await self._client.get(self.api_root + path, params=_query_params(params), headers=headers)
+        if response.status_code >= 400:
+            raise HttpError(response)
+        return response.json(), len(response.content), response.headers.get("content-encoding") == "gzip"
+
+    async def request_page(self, params: dict) -> Tuple[dict, int, bool]:
+        """
+        To send one events().list request as is, see request()
+        """
+        return await self.request(_events_path(params["calendarId"]), params)
+
+    async def list_events_page(self, stats: Optional[FetchStats] = None, limiter: Optional[TokenBucket] = None,
+                               **params) -> dict:
+        """
+        The async counterpart of calendar_api.list_events_page: field mask,
+        page size, rate limit, retries with backoff and stats.
+        Raises CalendarFetchError when the request can't succeed
+        """
+        params.setdefault("fields", LIST_FIELDS)
+        params.setdefault("maxResults", MAX_RESULTS)
+        limiter = limiter or calendar_api.rate_limiter
+        attempt = 0
+        while True:
+            waited = 0.0
+            while delay := limiter.try_acquire():
+                await asyncio.sleep(delay)
+                waited += delay
+            if stats is not None and waited:
+                stats.record_throttle(waited)
+            started = clock.perf_counter()
+            try:
+                page, payload_bytes, gzipped = await self.request_page(params)
+            except Exception as e:
+                status = http_status(e)
+                if attempt >= MAX_RETRIES or not is_retryable(e):
+                    raise CalendarFetchError(
+                        f"events().list of {params.get('calendarId')} failed"
+                        f"{f' with HTTP {status}' if status else ''} after {attempt + 1} attempt(s): {e}",
+                        status, attempt + 1, params.get("pageToken")
+                    ) from e
+                delay = retry_delay(attempt, e)
+                if stats is not None:
+                    stats.record_retry(delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            if stats is not None:
+                stats.record(payload_bytes, clock.perf_counter() - started, gzipped, "q" in params)
+            return page
+
+    async def fetch_events(self, calendar_id: str, time_min: Time, time_max: Time,
+                           stats: Optional[FetchStats] = None, query: Optional[str] = None) -> List[dict]:
+        """
+        To page through the events of one calendar between time_min and time_max
+        """
+        params = {
+            "calendarId": calendar_id,
+            "timeMin": time_min.isoformat() if isinstance(time_min, datetime) else time_min,
+            "timeMax": time_max.isoformat() if isinstance(time_max, datetime) else time_max,
+            "singleEvents": True,
+            "orderBy": "startTime",
+        }
+        if query:
+            params["q"] = query
+        events = []
+        page_token = None
+        while True:
+            page = await self.list_events_page(stats, pageToken=page_token, **params)
+            events.extend(page.get("items", []))
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                return events
+
+    async def fetch_many(self, windows: Iterable[Window], stats: Union[None, FetchStats, List[FetchStats]] = None
+                         ) -> List[Union[List[dict], CalendarFetchError]]:
+        """
+        To fetch the events of every window concurrently, in the order of
+        windows, a window that failed getting its CalendarFetchError instead.
+        stats: shared by every window, or a list of one per window
+        """
+        windows = list(windows)
+        window_stats = stats if isinstance(stats, list) else [stats] * len(windows)
+        results = await asyncio.gather(
+            *(self.fetch_events(*window[:3], stats, *window[3:]) for window, stats in zip(windows, window_stats)),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, CalendarFetchError):
+                raise result
+        return results
+
+
+def fetch_many(windows: Iterable[Window], credentials=None, stats: Union[None, FetchStats, List[FetchStats]] = None,
+               **client_options) -> List[Union[List[dict], CalendarFetchError]]:
+    """
+    To fetch the events of many (calendar_id, timeMin, timeMax) windows
+    concurrently from synchronous code, on a new event loop
+    (client_options: api_root, max_connections, http2)
+    """
+    async def run():
+        async with AsyncCalendarClient(credentials, **client_options) as client:
+            return await client.fetch_many(list(windows), stats)
+    return asyncio.run(run())
+
+
+class _Request:
+    """
+    A request of AsyncCalendarService. After execute(), payload_bytes and
+    gzipped describe the response, for the stats of calendar_api
+    """
+    def __init__(self, service: "AsyncCalendarService", path: str, params: dict):
+        self.service = service
+        self.path = path
+        self.params = params
+        self.payload_bytes: Optional[int] = None
+        self.gzipped = False
+
+    def execute(self) -> dict:
+        client = self.service.client
+        result, self.payload_bytes, self.gzipped = self.service.run(client.request(self.path, self.params))
+        return result
+
+
+class _Events:
+    def __init__(self, service: "AsyncCalendarService"):
+        self.service = service
+
+    def list(self, calendarId: str, **params) -> _Request:
+        return _Request(self.service, _events_path(calendarId), params)
+
+
+class _Calendars:
+    def __init__(self, service: "AsyncCalendarService"):
+        self.service = service
+
+    def get(self, calendarId: str, **params) -> _Request:
+        return _Request(self.service, f"/calendars/{quote(calendarId, safe='')}", params)
+
+
+class AsyncCalendarService:
+    """
+    Stand-in for the googleapiclient Calendar service: events().list(**params)
+    .execute() and calendars().get(calendarId=...).execute() send the request
+    through an AsyncCalendarClient running on a background event loop thread,
+    so every thread and calendar shares its connection pool. Thread-safe. Retries, rate limit and stats stay with
+    calendar_api.list_events_page, as with the googleapiclient service
+    """
+    def __init__(self, credentials=None, **client_options):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="calendar-async", daemon=True)
+        self._thread.start()
+
+        async def create():
+            return AsyncCalendarClient(credentials, **client_options)
+        self.client = self.run(create())
+
+    def run(self, coroutine):
+        """
+        To run a coroutine on the service's event loop and wait for its result
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def events(self) -> _Events:
+        return _Events(self)
+
+    def calendars(self) -> _Calendars:
+        return _Calendars(self)
+
+    def fetch_many(self, windows: Iterable[Window], stats: Union[None, FetchStats, List[FetchStats]] = None
+                   ) -> List[Union[List[dict], CalendarFetchError]]:
+        """
+        AsyncCalendarClient.fetch_many on the shared connection pool
+        """
+        return self.run(self.client.fetch_many(list(windows), stats))
+
+    def close(self):
+        self.run(self.client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
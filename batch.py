@@ -0,0 +1,270 @@
+"""
+Non-interactive batch reports: every user and period of a JSON config file
+is reported in one process, without any input() prompt.
+
+    python batch.py roster.json --format csv --output reports.csv
+
+Config file:
+{
+    "defaults": {"country": "AT", "weekdays": "mon-fri", "all_day_policy": "omit"},
+    "periods": [{"start": "2025-01-01", "end": "2025-01-31"}],
+    "users": [
+        {
+            "name": "Iliana",
+            "weekly_contract_hours": 26.5,
+            "work_calendar": {"id": "...@group.calendar.google.com", "title_filter": "shift"},
+            "vacation_calendar": {"id": "...@group.calendar.google.com", "title_filter": "urlaub iliana"}
+        }
+    ]
+}
+Any default can be set per user (e.g. a holiday "subdivision" like "W"
+for Vienna), and a user can have its own "periods". A "title_filter" can
+also list include/exclude keywords and regexes, see title_matcher.py.
+Add "query_pushdown": true to a calendar to have the API pre-select its
+events by the title keyword (see TITLE_QUERY_PUSHDOWN in run.py).
+Set "split": "month" or "week" to also get one row per month or week
+of each period.
+All the rows of a user come from one fetch, whose API pages are counted
+in api_pages_requested of the user's first row only (0 on the others),
+so the column sums up to the pages of the whole batch.
+Calendars and holiday tables are shared by all the jobs using them, so a
+vacation calendar used by the whole team is fetched once. All the
+periods of a user are computed from a single fetch spanning them.
+Every calendar of the config is validated up front, up to 50 per batch
+HTTP request, and users with an unreadable calendar get an error row.
+With --sheets the rows and each user's shifts are also written to the
+working-hours-reports spreadsheet (see sheets_export.py).
+The rows can also be written as JSON Lines or Parquet, and every user's
+shifts to a file of their own with --shifts-output (see report.py):
+
+    python batch.py roster.json --format parquet --output reports.parquet --shifts-output shifts.parquet
+"""
+import argparse
+import json
+import sys
+import time as clock
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from calendar_api import CalendarMetadata, fetch_calendar_metadata
+from clients import get_calendar_service
+import instrumentation
+from report import SHIFT_SCHEMA, SUMMARY_SCHEMA, RecordWriter, open_path, open_writer, shift_records
+from rollup import BUCKETS, split_period
+from run import User, WorkCalendar, VacationCalendar, HolidayCalendar, Report
+from sheets_export import SheetsExporter
+from title_matcher import get_title_matcher
+
+ALL_DAY_POLICIES = ("omit", "8hr", "24hr")
+
+REPORT_FIELDS = [name for name, _ in SUMMARY_SCHEMA]
+
+
+class BatchRunner:
+    def __init__(self, config: dict, exporter: Optional[SheetsExporter] = None,
+                 shift_writer: Optional[RecordWriter] = None, service=None):
+        """
+        exporter: collects the shifts of every user for a Sheets export
+        shift_writer: writes the shifts of every user as they are fetched (SHIFT_SCHEMA)
+        service: Calendar API service of every calendar instead of the shared one
+        """
+        self.config = config
+        self.exporter = exporter
+        self.shift_writer = shift_writer
+        self.service = service
+        self.defaults = config.get("defaults", {})
+        # (calendar class, calendar ID, title matcher key, query_pushdown)
+        self._calendars: Dict[Tuple[type, str, tuple, Optional[bool]], object] = {}
+        self._holiday_calendars: Dict[Tuple[str, str], HolidayCalendar] = {}
+        self.calendar_metadata: Dict[str, CalendarMetadata] = {}
+
+    @classmethod
+    def from_file(batch_class, path: str, exporter: Optional[SheetsExporter] = None,
+                  shift_writer: Optional[RecordWriter] = None) -> "BatchRunner":
+        with open(path, encoding="utf-8") as config_file:
+            return batch_class(json.load(config_file), exporter, shift_writer)
+
+    def get_calendar(self, calendar_class, calendar_config: dict):
+        """
+        To reuse one calendar instance (and so its fetched snapshots)
+        for every job with the same calendar ID and title filter
+        """
+        query_pushdown = calendar_config.get("query_pushdown")
+        key = (calendar_class, calendar_config["id"], get_title_matcher(calendar_config.get("title_filter")).key, query_pushdown)
+        if key not in self._calendars:
+            self._calendars[key] = calendar_class(
+                calendar_config["id"], calendar_config.get("title_filter") or None,
+                query_pushdown=query_pushdown, service=self.service)
+        return self._calendars[key]
+
+    def get_holiday_calendar(self, country_code: str, subdivision: str = None) -> HolidayCalendar:
+        key = (country_code.upper(), (subdivision or "").upper())
+        if key not in self._holiday_calendars:
+            self._holiday_calendars[key] = HolidayCalendar(key[0], subdivision or None)
+        return self._holiday_calendars[key]
+
+    def build_user(self, user_config: dict) -> User:
+        settings = {**self.defaults, **user_config}
+        weekdays = settings.get("weekdays", "mon-fri")
+        if isinstance(weekdays, str):
+            weekdays = User.parse_working_weekdays(weekdays)
+        if not weekdays:
+            raise ValueError(f"Invalid weekdays for {settings.get('name')}: {settings.get('weekdays')}")
+        return User(settings["name"], settings["country"], float(settings["weekly_contract_hours"]), list(weekdays))
+
+    def validate_calendars(self, service=None) -> Dict[str, CalendarMetadata]:
+        """
+        To check access to every calendar of the config and read their
+        metadata (time zone...) in as few batch requests as possible
+        """
+        calendar_ids = []
+        for user_config in self.config["users"]:
+            settings = {**self.defaults, **user_config}
+            calendar_ids.extend(settings[name]["id"] for name in ("work_calendar", "vacation_calendar") if name in settings)
+        self.calendar_metadata = fetch_calendar_metadata(service or self.service or get_calendar_service(), calendar_ids)
+        return self.calendar_metadata
+
+    def jobs(self) -> List[dict]:
+        """
+        To list one job per user with all its periods, in config order
+        """
+        jobs = []
+        for user_config in self.config["users"]:
+            settings = {**self.defaults, **user_config}
+            jobs.append({
+                "user": user_config,
+                "periods": [
+                    (date.fromisoformat(period["start"]), date.fromisoformat(period["end"]))
+                    for period in settings.get("periods") or self.config.get("periods", [])
+                ],
+                "all_day_policy": settings.get("all_day_policy", "omit"),
+                "split": settings.get("split"),
+            })
+        return jobs
+
+    def run_job(self, job: dict) -> List[dict]:
+        """
+        To fetch the events of a user once, over the range spanning all its
+        periods, and return the rows of every period (and month or week)
+        from the per-day breakdown of that single report, each the same
+        as a separate report of its period (see DailyRollup.from_report)
+        """
+        settings = {**self.defaults, **job["user"]}
+        if job["all_day_policy"] not in ALL_DAY_POLICIES:
+            raise ValueError(f"all_day_policy must be one of {', '.join(ALL_DAY_POLICIES)}")
+        if job["split"] and job["split"] not in BUCKETS:
+            raise ValueError(f"split must be one of {', '.join(BUCKETS)}")
+        if not job["periods"]:
+            return []
+        if any(start_date > end_date for start_date, end_date in job["periods"]):
+            raise ValueError("Start date cannot be after end date")
+        for name in ("work_calendar", "vacation_calendar"):
+            metadata = self.calendar_metadata.get(settings[name]["id"])
+            if metadata is not None and not metadata.can_read_details:
+                raise ValueError(f"Cannot read the events of {name.replace('_', ' ')} {metadata.calendar_id}: "
+                                 f"{metadata.error or 'free/busy access only'}")
+        user = self.build_user(job["user"])
+        report = Report(
+            user=user,
+            work_calendar=self.get_calendar(WorkCalendar, settings["work_calendar"]),
+            vacation_calendar=self.get_calendar(VacationCalendar, settings["vacation_calendar"]),
+            holiday_calendar=self.get_holiday_calendar(user.country_code, settings.get("subdivision")),
+            start_date=min(start_date for start_date, _ in job["periods"]),
+            end_date=max(end_date for _, end_date in job["periods"]),
+            all_day_policy=job["all_day_policy"],
+            # Calendars shared by several users are fetched once per run
+            reuse_snapshots=True
+        )
+        if self.exporter is not None:
+            self.exporter.add_shifts(user.name, report.start_date, report.end_date, report.shifts)
+        if self.shift_writer is not None:
+            self.shift_writer.write(shift_records(user.name, report.shifts))
+        rollup = report.get_rollup()
+        periods = []
+        for start_date, end_date in job["periods"]:
+            periods.append((start_date, end_date))
+            if job["split"]:
+                periods.extend(split_period(start_date, end_date, job["split"]))
+        rows = rollup.reports(periods)
+        # The periods share one fetch: its pages go on the user's first row, the others have 0
+        rows[0]["api_pages_requested"] = report.api_pages_requested
+        return rows
+
+    def run(self) -> Tuple[List[dict], float]:
+        """
+        To run every job, returning one result row per period
+        (with an 'error' instead of figures if it failed) and the seconds taken
+        """
+        results = []
+        started = clock.perf_counter()
+        self.validate_calendars()
+        for job in self.jobs():
+            try:
+                results.extend(self.run_job(job))
+            except Exception as e:
+                for start_date, end_date in job["periods"]:
+                    results.append({
+                        "name": job["user"].get("name"),
+                        "start_date": start_date.isoformat(),
+                        "end_date": end_date.isoformat(),
+                        "error": str(e),
+                    })
+        return results, clock.perf_counter() - started
+
+
+def write_results(results: List[dict], output, output_format: str):
+    if output_format == "json":
+        json.dump(results, output, indent=2)
+        output.write("\n")
+    else:
+        with open_writer(output, output_format, SUMMARY_SCHEMA) as writer:
+            writer.write(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate working hours reports for every user and period of a config file.")
+    parser.add_argument("config", help="JSON config file with users, calendars and periods")
+    parser.add_argument("--format", choices=("json", "csv", "jsonl", "parquet"), default="json")
+    parser.add_argument("--output", help="output file (default: stdout)")
+    parser.add_argument("--shifts-output", help="also write the shifts of every user to this file, in the same format")
+    parser.add_argument("--sheets", action="store_true", help="also export the reports and shifts to Google Sheets")
+    parser.add_argument("--metrics", choices=instrumentation.METRICS_FORMATS,
+                        help="write stage timings and counters of every report to stderr (or REPORT_METRICS_FILE)")
+    parser.add_argument("--profile", metavar="DIRECTORY", help="write a cProfile dump of every report to this directory")
+    args = parser.parse_args(argv)
+    instrumentation.configure(metrics_format=args.metrics, profile_dir=args.profile)
+    if args.format == "parquet" and not args.output:
+        parser.error("--format parquet needs --output")
+
+    exporter = SheetsExporter() if args.sheets else None
+    # Opened before running, so a missing pyarrow fails before any fetch
+    parquet_writer = open_path(args.output, args.format, SUMMARY_SCHEMA) if args.format == "parquet" else None
+    shift_writer = None
+    if args.shifts_output:
+        # Shifts are streamed user by user: JSON Lines stands in for json
+        shift_writer = open_path(args.shifts_output, "jsonl" if args.format == "json" else args.format, SHIFT_SCHEMA)
+    try:
+        results, seconds = BatchRunner.from_file(args.config, exporter, shift_writer).run()
+    finally:
+        if shift_writer is not None:
+            shift_writer.close()
+    if parquet_writer is not None:
+        with parquet_writer:
+            parquet_writer.write(results)
+    elif args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as output:
+            write_results(results, output, args.format)
+    else:
+        write_results(results, sys.stdout, args.format)
+
+    failed = sum(1 for result in results if result.get("error"))
+    throughput = len(results) / seconds if seconds else 0.0
+    print(f"{len(results)} reports ({failed} failed) in {seconds:.2f}s: {throughput:.1f} reports/second", file=sys.stderr)
+    if exporter is not None:
+        exporter.add_summary_rows(results)
+        print(f"Exported to Google Sheets with {exporter.flush()} write requests", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,658 @@
+"""
+Offline benchmarks of the report calculations, timing the faster
+implementations against the previous ones, run with: python benchmark.py
+The tests check that both give the same results: python -m pytest
+The report scenarios time the main steps of a report on synthetic
+calendars (see synthetic_calendar.py) from 1 month to 10 years. Their
+timings can be stored and compared with a later run to spot regressions:
+
+    python benchmark.py --scenarios-only --save baseline.json
+    python benchmark.py --scenarios-only --compare baseline.json
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import timeit
+import threading
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+import holidays
+from dateutil.parser import parse
+
+import calendar_api
+from calendar_api import TokenBucket
+from holiday_index import HolidayIndex
+from timestamps import parse_timestamp
+from server import ReportServer, ReportService, synthetic_service
+from run import User, HolidayCalendar, Report, VacationCalendar, WorkCalendar, Shift, count_weekdays, summarise_shifts
+from synthetic_calendar import (VACATION_TITLE, WORK_TITLE, CalendarProfile, FakeCalendarService, MockCalendarServer,
+                                generate_events)
+from title_matcher import TitleMatcher
+
+SCENARIO_SPANS = {
+    "1 month": (date(2024, 1, 1), date(2024, 1, 31)),
+    "1 year": (date(2024, 1, 1), date(2024, 12, 31)),
+    "10 years": (date(2015, 1, 1), date(2024, 12, 31)),
+}
+SCENARIO_CALENDAR_ID = "bench@synthetic"
+# A scenario this many times slower than its stored timing is a regression
+REGRESSION_FACTOR = 1.25
+
+
+def loop_expected_working_days(start_date, end_date, weekdays, days_off):
+    """
+    Day by day loop formerly used by Report.calculate_expected_working_days
+    """
+    expected_days = 0
+    for i in range((end_date - start_date).days + 1):
+        current_day = start_date + timedelta(days=i)
+        if current_day.weekday() in weekdays and current_day not in days_off:
+            expected_days += 1
+    return expected_days
+
+
+def closed_form_expected_working_days(start_date, end_date, weekdays, days_off):
+    weekdays = set(weekdays)
+    off = {day for day in days_off if day.weekday() in weekdays and start_date <= day <= end_date}
+    return count_weekdays(start_date, end_date, weekdays) - len(off)
+
+
+def loop_contract_dates(start_date, end_date, weekdays):
+    """
+    Comprehension formerly used by User.get_contract_working_weekdays_dates
+    """
+    return {
+        start_date + timedelta(days=i)
+        for i in range((end_date - start_date).days + 1)
+        if (start_date + timedelta(days=i)).weekday() in weekdays
+    }
+
+
+def loop_holidays(country_code, start_date, end_date):
+    """
+    Day by day loop formerly used by HolidayCalendar.fetch_holidays
+    """
+    all_holidays = holidays.country_holidays(country_code)
+    found = []
+    included_day = start_date
+    while included_day <= end_date:
+        if included_day in all_holidays:
+            found.append({"date": included_day, "title": all_holidays[included_day]})
+        included_day += timedelta(days=1)
+    return found
+
+
+def bench_day_range_engine(years=10, number=20):
+    start_date = date(2015, 1, 1)
+    end_date = start_date + timedelta(days=365 * years)
+    weekdays = [0, 1, 2, 3, 4]
+    days_off = {start_date + timedelta(days=i) for i in range(0, 365 * years, 17)}
+    print(f"\nExpected working days over {years} years ({number} runs):")
+    for label, function in (("loop", loop_expected_working_days), ("closed form", closed_form_expected_working_days)):
+        seconds = timeit.timeit(lambda: function(start_date, end_date, weekdays, days_off), number=number)
+        print(f"  {label:<12} {seconds / number * 1000:8.3f} ms")
+    print(f"Holidays AT over {years} years ({number} runs):")
+    for label, function in (
+            ("loop", lambda: loop_holidays("AT", start_date, end_date)),
+            ("index", lambda: HolidayCalendar("AT").fetch_holidays(start_date, end_date))):
+        seconds = timeit.timeit(function, number=number)
+        print(f"  {label:<12} {seconds / number * 1000:8.3f} ms")
+
+
+def bench_holiday_index(users=200):
+    """
+    A roster run asks the holidays of the same country and month once
+    per user: the index expands the year once, the loop every time
+    """
+    start_date, end_date = date(2025, 1, 1), date(2025, 1, 31)
+    started = timeit.default_timer()
+    for _ in range(users):
+        loop_holidays("AT", start_date, end_date)
+    loop_seconds = timeit.default_timer() - started
+    index = HolidayIndex()
+    started = timeit.default_timer()
+    for _ in range(users):
+        HolidayCalendar("AT", holiday_index=index).fetch_holidays(start_date, end_date)
+    index_seconds = timeit.default_timer() - started
+    print(f"\nHolidays AT for {users} users, one month:")
+    print(f"  {'loop':<12} {loop_seconds * 1000:8.3f} ms")
+    print(f"  {'index':<12} {index_seconds * 1000:8.3f} ms")
+
+
+class PagedShiftService:
+    """
+    Stand-in for the Calendar API service returning `total` synthetic
+    shifts in pages of page_size. Pages are generated when requested,
+    so the service itself holds no events in memory
+    """
+    def __init__(self, total: int, page_size: int = 2500, start: datetime = datetime(2015, 1, 1, 8)):
+        self.total = total
+        self.page_size = page_size
+        self.start = start
+
+    def events(self):
+        return self
+
+    def list(self, timeMin=None, timeMax=None, pageToken=None, **params):
+        # Shift i starts 12 hours after shift i - 1 and lasts 8 hours
+        step = timedelta(hours=12)
+        first = max(0, (_parse_utc(timeMin) - self.start - timedelta(hours=8)) // step + 1) if timeMin else 0
+        stop = min(self.total, (_parse_utc(timeMax) - self.start) // step + 1) if timeMax else self.total
+        if pageToken:
+            first = int(pageToken)
+        return _Executable(lambda: self._page(first, stop))
+
+    def _page(self, first: int, stop: int) -> dict:
+        items = []
+        for i in range(first, min(first + self.page_size, stop)):
+            shift_start = self.start + timedelta(hours=12 * i)
+            items.append({
+                "id": f"event{i}",
+                "summary": "Work shift" if i % 4 else "Team meeting",
+                "description": "synthetic event " * 4,
+                "start": {"dateTime": shift_start.isoformat() + "Z"},
+                "end": {"dateTime": (shift_start + timedelta(hours=8)).isoformat() + "Z"},
+            })
+        page = {"items": items}
+        if first + self.page_size < stop:
+            page["nextPageToken"] = str(first + self.page_size)
+        return page
+
+
+def _parse_utc(value: str) -> datetime:
+    """
+    To read a timeMin/timeMax bound as a naive UTC datetime
+    """
+    return parse_timestamp(value).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class _Executable:
+    def __init__(self, function):
+        self.function = function
+
+    def execute(self):
+        return self.function()
+
+
+def bench_streaming_memory(total=100_000):
+    """
+    To compare the peak memory of materialising events, filtered events
+    and shifts as lists with the streaming pipeline, on `total` events
+    """
+    service = PagedShiftService(total)
+    # 12 hours apart: the whole calendar fits in the period
+    start_date = service.start.date()
+    end_date = start_date + timedelta(days=total // 2 + 1)
+
+    def materialised():
+        calendar = WorkCalendar("bench", "shift", service=service, time_zone="UTC")
+        calendar.fetch_events_by_period(start_date, end_date)
+        filtered = calendar.filter_events_by_title(calendar.title_filter)
+        shifts = list(calendar.iter_shifts(start_date, end_date, events=filtered))
+        totals = summarise_shifts(shifts)
+        return totals.hours, totals.worked_days
+
+    def streamed():
+        calendar = WorkCalendar("bench", "shift", service=service, time_zone="UTC")
+        return calendar.stream_worked_totals(start_date, end_date)
+
+    print(f"\nPeak memory for {total} events:")
+    results = []
+    for label, function in (("lists", materialised), ("streaming", streamed)):
+        tracemalloc.start()
+        started = timeit.default_timer()
+        results.append(function())
+        seconds = timeit.default_timer() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  {label:<12} {peak / 2 ** 20:8.1f} MiB {seconds:8.2f} s")
+    assert results[0] == results[1]
+
+
+def bench_shift_representation(total=100_000):
+    """
+    To compare the memory, construction time and aggregation time of
+    shifts as dicts (former representation) and as slotted Shift objects.
+    Both are aggregated the same way (hours and worked days), so only
+    the representation differs; the interval union has its own benchmark
+    """
+    start = datetime(2015, 1, 1, 8)
+    rows = [
+        ("Work shift", start + timedelta(hours=12 * i), start + timedelta(hours=12 * i + 8), 8.0, False)
+        for i in range(total)
+    ]
+
+    def as_dicts():
+        return [
+            {"title": title, "start": shift_start, "end": shift_end, "duration": duration, "all_day": all_day}
+            for title, shift_start, shift_end, duration, all_day in rows
+        ]
+
+    def as_shifts():
+        return [Shift(*row) for row in rows]
+
+    def dict_totals(shifts):
+        worked_days = set()
+        for shift in shifts:
+            if not shift["all_day"]:
+                worked_days.add(shift["start"].date())
+        return sum(shift["duration"] for shift in shifts), len(worked_days)
+
+    def shift_totals(shifts):
+        worked_days = set()
+        for shift in shifts:
+            if not shift.all_day:
+                worked_days.add(shift.start.date())
+        return sum(shift.duration for shift in shifts), len(worked_days)
+
+    print(f"\nShift representation for {total} shifts:")
+    results = []
+    for label, build, totals in (("dict", as_dicts, dict_totals), ("Shift", as_shifts, shift_totals)):
+        tracemalloc.start()
+        shifts = build()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        build_seconds = timeit.timeit(build, number=5) / 5
+        seconds = timeit.timeit(lambda: totals(shifts), number=5) / 5
+        results.append(totals(shifts))
+        print(f"  {label:<12} {size / 2 ** 20:8.1f} MiB {build_seconds * 1000:8.1f} ms to build "
+              f"{seconds * 1000:8.1f} ms to aggregate")
+        del shifts
+    assert results[0] == results[1]
+
+
+def overlapping_shifts(total, seed=5):
+    """
+    To generate `total` shifts in random order, a third of them
+    duplicated or overlapping others, some crossing midnight
+    """
+    rng = random.Random(seed)
+    start = datetime(2015, 1, 1, tzinfo=timezone.utc)
+    shifts = []
+    for i in range(total):
+        if shifts and i % 3 == 0:
+            other = rng.choice(shifts)
+            shift_start = other.start + timedelta(minutes=rng.randrange(-120, 240, 30))
+        else:
+            shift_start = start + timedelta(minutes=30 * rng.randrange(total * 16))
+        shift_end = shift_start + timedelta(hours=rng.choice((1, 4, 8, 10)))
+        shifts.append(Shift("Work shift", shift_start, shift_end, (shift_end - shift_start).total_seconds() / 3600, False))
+    rng.shuffle(shifts)
+    return shifts
+
+
+def slot_union_hours(shifts):
+    """
+    Reference union: the set of half-hour slots covered by the shifts
+    """
+    slots = set()
+    for shift in shifts:
+        first = int(shift.start.timestamp()) // 1800
+        slots.update(range(first, first + int(shift.duration * 2)))
+    return len(slots) / 2
+
+
+def bench_interval_merging(total=300_000):
+    shifts = overlapping_shifts(total)
+    print(f"\nMerging {total} overlapping shifts:")
+    started = timeit.default_timer()
+    totals = summarise_shifts(shifts)
+    seconds = timeit.default_timer() - started
+    print(f"  {'sweep':<12} {seconds * 1000:8.1f} ms  raw {totals.raw_hours:.0f} h, merged {totals.hours:.0f} h, "
+          f"{len(totals.overlap_hours_by_day)} days with overlaps")
+
+
+def synthetic_timestamps(total=100_000, seed=11):
+    """
+    To generate the start/end strings of `total` events the way the API
+    sends them: mostly local times with an offset, some UTC 'Z' times,
+    fractional seconds and all-day dates
+    """
+    rng = random.Random(seed)
+    offsets = ["+01:00", "+02:00", "Z", "-05:00", "+05:30", "+00:00"]
+    values = []
+    for i in range(total):
+        moment = datetime(2015, 1, 1) + timedelta(minutes=rng.randrange(10 * 365 * 24 * 60))
+        if i % 50 == 0:
+            values.append(moment.date().isoformat())
+            continue
+        text = moment.isoformat(timespec="milliseconds" if i % 7 == 0 else "seconds")
+        values.append(text + rng.choice(offsets))
+    return values
+
+
+def bench_timestamp_parsing(total=100_000):
+    values = synthetic_timestamps(total)
+    print(f"\nParsing {total} event timestamps:")
+    for label, function in (("dateutil", parse), ("fast path", parse_timestamp)):
+        started = timeit.default_timer()
+        for value in values:
+            function(value)
+        print(f"  {label:<12} {(timeit.default_timer() - started) * 1000:8.1f} ms")
+
+
+TITLE_WORDS = ["shift", "night", "early", "late", "dienst", "urlaub", "meeting", "training", "cover", "standby",
+               "nacht", "früh", "spät", "team", "review", "dentist", "Straße", "call", "on", "duty"]
+
+
+def synthetic_titles(total=100_000, seed=13):
+    """
+    To generate `total` distinct event titles of 2 to 4 words
+    """
+    rng = random.Random(seed)
+    return [f"{' '.join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(2, 4)))} #{i}" for i in range(total)]
+
+
+def synthetic_keywords(count, seed=17):
+    """
+    To generate `count` keywords, a few real title words and random others
+    """
+    rng = random.Random(seed)
+    keywords = {"nacht", "cover"}
+    while len(keywords) < count:
+        keywords.add("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9))))
+    return sorted(keywords)[:count]
+
+
+def loop_title_filter(titles, include, exclude):
+    """
+    One substring test per keyword and title, as the former single keyword filter did
+    """
+    include = [keyword.lower() for keyword in include]
+    exclude = [keyword.lower() for keyword in exclude]
+    matched = []
+    for title in titles:
+        lowered = title.lower()
+        if any(keyword in lowered for keyword in include) and not any(keyword in lowered for keyword in exclude):
+            matched.append(title)
+    return matched
+
+
+def bench_title_matching(total=100_000, keyword_counts=(1, 10, 100, 1000)):
+    """
+    Substring tests cost one pass per keyword, the trie regex one pass
+    per title, and titles already seen (recurring events) only a lookup
+    """
+    titles = synthetic_titles(total)
+    events = [{"summary": title} for title in titles]
+    print(f"\nFiltering {total} distinct titles by keyword count:")
+    for count in keyword_counts:
+        include = synthetic_keywords(count)
+        started = timeit.default_timer()
+        loop_title_filter(titles, include, ())
+        loop_seconds = timeit.default_timer() - started
+        matcher = TitleMatcher(include)
+        started = timeit.default_timer()
+        sum(1 for _ in matcher.filter(events))
+        compiled_seconds = timeit.default_timer() - started
+        started = timeit.default_timer()
+        sum(1 for _ in matcher.filter(events))
+        cached_seconds = timeit.default_timer() - started
+        print(f"  {count:>5} keywords  substrings {loop_seconds * 1000:8.1f} ms  "
+              f"compiled {compiled_seconds * 1000:8.1f} ms  cached {cached_seconds * 1000:8.1f} ms")
+
+
+def bench_query_pushdown(years=10, other_events_per_week=250):
+    """
+    To compare the pages and bytes fetched with and without the title
+    keyword pushed down as q=, on a shared calendar where most events
+    belong to others, checking the shifts are the same
+    """
+    start_date, end_date = date(2025 - years, 1, 1), date(2024, 12, 31)
+    service = FakeCalendarService({
+        SCENARIO_CALENDAR_ID: generate_events(start_date, end_date, CalendarProfile(other_events_per_week=other_events_per_week))
+    })
+    print(f"\nShared calendar over {years} years, {other_events_per_week} other events per week:")
+    results = []
+    for label, query_pushdown in (("local filter", False), ("q= pushdown", True)):
+        calendar = WorkCalendar(SCENARIO_CALENDAR_ID, WORK_TITLE, event_store=None, service=service,
+                                time_zone=service.time_zone, query_pushdown=query_pushdown)
+        shifts = calendar.get_shifts(start_date, end_date)
+        results.append([(shift.start, shift.end) for shift in shifts])
+        stats = calendar.fetch_stats
+        print(f"  {label:<14} {stats.requests:4d} pages {stats.bytes / 2 ** 20:8.2f} MiB  ({len(shifts)} shifts)")
+    assert results[0] == results[1]
+
+
+def bench_report_service(users=20, requests=400, workers=8):
+    """
+    To serve the reports of a synthetic roster over HTTP and time
+    concurrent requests, the first round on cold calendars and the
+    second on warm ones, checking both return the same figures
+    """
+    config = {
+        "defaults": {"country": "AT", "weekdays": "mon-fri", "all_day_policy": "8hr"},
+        "users": [{
+            "name": f"user{number}",
+            "weekly_contract_hours": 38.5,
+            "work_calendar": {"id": f"work{number}@synthetic", "title_filter": WORK_TITLE},
+            "vacation_calendar": {"id": "team@synthetic", "title_filter": VACATION_TITLE},
+        } for number in range(users)],
+    }
+    service = synthetic_service(config)
+    server = ReportServer(("127.0.0.1", 0), ReportService(config, service), workers, access_log=False)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    months = [(date(2024, month, 1), date(2024 + month // 12, month % 12 + 1, 1) - timedelta(days=1))
+              for month in range(1, 13)]
+    urls = [
+        f"http://127.0.0.1:{server.server_port}/report?user=user{number % users}"
+        f"&start={months[number % 12][0]}&end={months[number % 12][1]}"
+        for number in range(requests)
+    ]
+
+    def get(url):
+        with urllib.request.urlopen(url) as response:
+            return json.load(response)
+
+    print(f"\nReport service, {requests} concurrent requests over {users} users, {workers} workers:")
+    try:
+        rounds = []
+        for label in ("cold", "warm"):
+            server.report_service.latency = type(server.report_service.latency)()
+            started = timeit.default_timer()
+            with ThreadPoolExecutor(max_workers=workers * 2) as executor:
+                rounds.append(list(executor.map(get, urls)))
+            seconds = timeit.default_timer() - started
+            latency = server.report_service.latency.to_dict()
+            print(f"  {label}  {requests / seconds:7.1f} reports/s  p50 {latency['p50_ms']:8.2f} ms  "
+                  f"p99 {latency['p99_ms']:8.2f} ms  ({service.requests} API pages so far)")
+        # Only the cold round requested pages
+        figures = [[[{**row, "api_pages_requested": None} for row in body["rows"]] for body in bodies] for bodies in rounds]
+        assert figures[0] == figures[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_async_backend(calendars=200, latency=0.02):
+    """
+    To fetch a month of many calendars from a local mock of the Calendar
+    API answering after `latency` seconds: on the fetch thread pool with
+    googleapiclient services (one per thread) or the async backend behind
+    the same interface, with fetch_many in one event loop and with
+    run.fetch_snapshots on the async backend, checking all four get the
+    same events
+    """
+    try:
+        from async_calendar import AsyncCalendarService
+    except RuntimeError as e:
+        print(f"\nAsync Calendar backend skipped: {e}")
+        return
+    from google.auth.credentials import AnonymousCredentials
+    from googleapiclient.discovery import build
+    from intervals import get_zone, period_bounds
+    from run import FETCH_MAX_WORKERS, fetch_snapshots
+
+    start_date, end_date = date(2024, 3, 1), date(2024, 3, 31)
+    calendar_ids = [f"calendar{number}@synthetic" for number in range(calendars)]
+    service = FakeCalendarService({
+        calendar_id: generate_events(start_date, end_date, CalendarProfile(seed=seed))
+        for seed, calendar_id in enumerate(calendar_ids)
+    })
+    server = MockCalendarServer(service, latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    local = threading.local()
+
+    def googleapiclient_service():
+        if not hasattr(local, "service"):
+            local.service = build("calendar", "v3", credentials=AnonymousCredentials(), static_discovery=True,
+                                  cache_discovery=False, client_options={"api_endpoint": server.root_url})
+        return local.service
+
+    def thread_pool(get_service):
+        def fetch(calendar_id):
+            calendar = WorkCalendar(calendar_id, service=get_service(), time_zone=service.time_zone, event_store=None)
+            return [event["id"] for event in calendar.iter_events_by_period(start_date, end_date)]
+        with ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS) as executor:
+            return list(executor.map(fetch, calendar_ids))
+
+    def snapshots():
+        calendars = [WorkCalendar(calendar_id, service=async_service, time_zone=service.time_zone, event_store=None)
+                     for calendar_id in calendar_ids]
+        return fetch_snapshots(calendars, start_date, end_date)[0]
+
+    async_service = AsyncCalendarService(api_root=server.api_root)
+    bounds = [bound.isoformat() for bound in period_bounds(start_date, end_date, get_zone(service.time_zone))]
+    print(f"\n{calendars} calendars from a mock Calendar API answering in {latency * 1000:.0f} ms:")
+    try:
+        results = []
+        for label, fetch in (
+            (f"googleapiclient, {FETCH_MAX_WORKERS} threads", lambda: thread_pool(googleapiclient_service)),
+            (f"async backend, {FETCH_MAX_WORKERS} threads", lambda: thread_pool(lambda: async_service)),
+            ("async fetch_many", lambda: async_service.fetch_many(
+                (calendar_id, *bounds) for calendar_id in calendar_ids)),
+            ("fetch_snapshots, async", lambda: [snapshot.events for snapshot in snapshots()]),
+        ):
+            started = timeit.default_timer()
+            events = fetch()
+            seconds = timeit.default_timer() - started
+            results.append([[event if isinstance(event, str) else event["id"] for event in calendar_events]
+                            for calendar_events in events])
+            print(f"  {label:<28} {seconds * 1000:9.1f} ms  {calendars / seconds:8.1f} calendars/s")
+        assert results[0] == results[1] == results[2] == results[3]
+    finally:
+        async_service.close()
+        server.shutdown()
+        server.server_close()
+
+
+def time_scenario(function, setup=None, repeat=5):
+    """
+    To time function(setup()) repeat times, setup being untimed,
+    and return the best and median seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        started = timeit.default_timer()
+        function(argument) if setup else function()
+        timings.append(timeit.default_timer() - started)
+    return min(timings), statistics.median(timings)
+
+
+def bench_report_scenarios(repeat=5) -> dict:
+    """
+    To time get_shifts, get_vacation_days, fetch_holidays, a Report of
+    already fetched calendars and a whole report (fetch included) over
+    each SCENARIO_SPANS, returning {"scenario/span": timings}
+    """
+    user = User("bench", "AT", 38.5, [0, 1, 2, 3, 4])
+    results = {}
+    print(f"\nReport scenarios on synthetic calendars (best and median of {repeat}):")
+    for span, (start_date, end_date) in SCENARIO_SPANS.items():
+        events = generate_events(start_date, end_date)
+        service = FakeCalendarService({SCENARIO_CALENDAR_ID: events})
+
+        def calendars():
+            return (WorkCalendar(SCENARIO_CALENDAR_ID, WORK_TITLE, service=service, time_zone=service.time_zone),
+                    VacationCalendar(SCENARIO_CALENDAR_ID, VACATION_TITLE, service=service, time_zone=service.time_zone))
+
+        def fetched_calendars():
+            work_calendar, vacation_calendar = calendars()
+            work_calendar.get_snapshot(start_date, end_date)
+            vacation_calendar.get_snapshot(start_date, end_date)
+            return work_calendar, vacation_calendar
+
+        def holiday_calendar():
+            # A new index each time: the holidays are expanded as on a first report
+            return HolidayCalendar("AT", "W", holiday_index=HolidayIndex())
+
+        scenarios = (
+            ("get_shifts", lambda: calendars()[0].get_shifts(start_date, end_date, "8hr"), None),
+            ("get_vacation_days", lambda: calendars()[1].get_vacation_days(start_date, end_date), None),
+            ("fetch_holidays", lambda: holiday_calendar().fetch_holidays(start_date, end_date), None),
+            ("report construction",
+             lambda fetched: Report(user, *fetched, holiday_calendar(), start_date, end_date, "8hr", reuse_snapshots=True),
+             fetched_calendars),
+            ("full report",
+             lambda: Report(user, *calendars(), holiday_calendar(), start_date, end_date, "8hr").to_dict(), None),
+        )
+        for name, function, setup in scenarios:
+            best, median = time_scenario(function, setup, repeat)
+            results[f"{name}/{span}"] = {"seconds": best, "median_seconds": median, "events": len(events)}
+            print(f"  {name:<20} {span:<9} {best * 1000:9.2f} ms {median * 1000:9.2f} ms  ({len(events)} events)")
+    return results
+
+
+def save_results(results: dict, path: str):
+    with open(path, "w", encoding="utf-8") as output:
+        json.dump({
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "results": results,
+        }, output, indent=2)
+        output.write("\n")
+
+
+def compare_results(results: dict, path: str) -> list:
+    """
+    To compare best timings with stored ones, returning the scenarios
+    more than REGRESSION_FACTOR times slower
+    """
+    with open(path, encoding="utf-8") as stored_file:
+        stored = json.load(stored_file)
+    print(f"\nCompared with {path} ({stored['created']}, Python {stored['python']}):")
+    regressions = []
+    for key, timings in results.items():
+        if key not in stored["results"]:
+            print(f"  {key:<30} new")
+            continue
+        ratio = timings["seconds"] / stored["results"][key]["seconds"]
+        if ratio > REGRESSION_FACTOR:
+            regressions.append(key)
+        print(f"  {key:<30} {ratio:6.2f}x{'  REGRESSION' if ratio > REGRESSION_FACTOR else ''}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the report calculations.")
+    parser.add_argument("--scenarios-only", action="store_true", help="only time the report scenarios")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each report scenario")
+    parser.add_argument("--save", metavar="PATH", help="store the scenario timings in a JSON file")
+    parser.add_argument("--compare", metavar="PATH", help="compare the scenario timings with stored ones")
+    args = parser.parse_args()
+
+    # The stand-in services need no rate limit
+    calendar_api.rate_limiter = TokenBucket(1e9, 10 ** 9)
+    if not args.scenarios_only:
+        bench_day_range_engine()
+        bench_holiday_index()
+        bench_streaming_memory()
+        bench_shift_representation()
+        bench_timestamp_parsing()
+        bench_interval_merging()
+        bench_title_matching()
+        bench_query_pushdown()
+        bench_report_service()
+        bench_async_backend()
+    scenario_results = bench_report_scenarios(args.repeat)
+    regressions = compare_results(scenario_results, args.compare) if args.compare else []
+    if args.save:
+        save_results(scenario_results, args.save)
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,412 @@
+"""
+Thin layer over events().list used by every fetch of the app.
+Requests only the event fields the reports read, with the largest page
+size the API allows and gzip responses, and records per request stats
+so the bytes and pages of a fetch can be compared.
+Every request goes through a token bucket shared by all threads, and
+rate limit (429/403), server (5xx) and network errors are retried with
+exponential backoff and jitter. Pagination loops resume from the page
+that failed, and CalendarFetchError is raised once retries run out.
+"""
+import json
+import os
+import random
+import threading
+import time as clock
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+# The only event fields read by shifts, vacations, the event store and the snapshots
+EVENT_FIELDS = "id,status,summary,start,end"
+LIST_FIELDS = f"nextPageToken,nextSyncToken,items({EVENT_FIELDS})"
+# Largest page size accepted by events().list (the default is 250)
+MAX_RESULTS = 2500
+
+# Requests per second allowed to all threads together, and the burst size
+CALENDAR_API_QPS = float(os.environ.get("CALENDAR_API_QPS", 10))
+CALENDAR_API_BURST = int(os.environ.get("CALENDAR_API_BURST", 10))
+MAX_RETRIES = int(os.environ.get("CALENDAR_API_MAX_RETRIES", 5))
+# Backoff before retry n is random between 0 and min(BACKOFF_MAX, BACKOFF_BASE * 2 ** n) seconds
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 32.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# events().list answers with the calendar's own metadata, so one
+# single-event request both validates access and describes the calendar
+METADATA_FIELDS = "summary,timeZone,accessRole,items(id)"
+# Most requests Google accepts in one batch HTTP request for the Calendar API
+BATCH_LIMIT = 50
+# Seconds calendar metadata and validation results are reused for
+CALENDAR_METADATA_TTL = float(os.environ.get("CALENDAR_METADATA_TTL", 3600))
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+class CalendarFetchError(Exception):
+    """
+    A Calendar API request that failed for good: not retryable
+    (e.g. 404 unknown calendar, 410 expired sync token) or still
+    failing after MAX_RETRIES retries. status is the HTTP status, if any,
+    and page_token the page that failed, from which a loop can resume
+    """
+    def __init__(self, message: str, status: Optional[int] = None, attempts: int = 1, page_token: Optional[str] = None):
+        super().__init__(message)
+        self.status = status
+        self.attempts = attempts
+        self.page_token = page_token
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: acquire() blocks until a request may be sent,
+    allowing `rate` requests per second on average and bursts of `capacity`
+    """
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = clock.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        To take one token, returning the seconds waited for it
+        """
+        waited = 0.0
+        while True:
+            delay = self.try_acquire()
+            if not delay:
+                return waited
+            clock.sleep(delay)
+            waited += delay
+
+    def try_acquire(self) -> float:
+        """
+        To take one token if there is one, returning 0, or else the seconds
+        until there will be one, without waiting (for event loops)
+        """
+        with self._lock:
+            now = clock.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+# Shared by every thread and calendar of the process
+rate_limiter = TokenBucket(CALENDAR_API_QPS, CALENDAR_API_BURST)
+
+
+def http_status(error: Exception) -> Optional[int]:
+    """
+    To return the HTTP status of an API error (HttpError or CalendarFetchError)
+    """
+    status = getattr(error, "status", None)
+    if status is None:
+        status = getattr(getattr(error, "resp", None), "status", None)
+    return int(status) if status is not None else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Rate limits, server errors and network failures are worth retrying,
+    other HTTP errors (bad request, not found, gone...) are not
+    """
+    status = http_status(error)
+    if status is None:
+        return isinstance(error, (OSError, TimeoutError, ConnectionError)) or \
+            type(error).__module__.startswith(("httplib2", "httpx"))
+    if status in RETRY_STATUSES:
+        return True
+    if status == 403:
+        try:
+            details = json.loads(getattr(error, "content", b"") or b"{}")
+            reasons = {item.get("reason") for item in details.get("error", {}).get("errors", [])}
+        except (ValueError, AttributeError):
+            return False
+        return bool(reasons & RATE_LIMIT_REASONS)
+    return False
+
+
+def retry_delay(attempt: int, error: Optional[Exception] = None) -> float:
+    """
+    Full jitter backoff, or the server's Retry-After if it sent one
+    """
+    retry_after = getattr(getattr(error, "resp", None), "get", lambda key: None)("retry-after")
+    if retry_after:
+        try:
+            return min(BACKOFF_MAX, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class FetchStats:
+    """
+    Thread-safe counters of the events().list requests of a calendar:
+    payload bytes, latency, how many responses came gzip encoded, how many
+    requests (and bytes) had the title filter pushed down as q=, retries
+    and the seconds spent backing off or waiting for the rate limiter
+    """
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+        self.gzip_responses = 0
+        self.query_requests = 0
+        self.query_bytes = 0
+        self.retries = 0
+        self.backoff_seconds = 0.0
+        self.throttled_seconds = 0.0
+        self.latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def record(self, payload_bytes: int, seconds: float, gzipped: bool = False, queried: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.bytes += payload_bytes
+            self.gzip_responses += int(gzipped)
+            self.query_requests += int(queried)
+            self.query_bytes += payload_bytes if queried else 0
+            self.latencies.append(seconds)
+
+    def record_retry(self, backoff_seconds: float):
+        with self._lock:
+            self.retries += 1
+            self.backoff_seconds += backoff_seconds
+
+    def record_throttle(self, seconds: float):
+        with self._lock:
+            self.throttled_seconds += seconds
+
+    def merge(self, other: "FetchStats"):
+        with self._lock:
+            self.requests += other.requests
+            self.bytes += other.bytes
+            self.gzip_responses += other.gzip_responses
+            self.query_requests += other.query_requests
+            self.query_bytes += other.query_bytes
+            self.retries += other.retries
+            self.backoff_seconds += other.backoff_seconds
+            self.throttled_seconds += other.throttled_seconds
+            self.latencies.extend(other.latencies)
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "bytes": self.bytes,
+            "gzip_responses": self.gzip_responses,
+            "retries": self.retries,
+            "backoff_seconds": round(self.backoff_seconds, 4),
+            "throttled_seconds": round(self.throttled_seconds, 4),
+            "seconds": round(sum(latencies), 4),
+            "p50_latency": round(latencies[len(latencies) // 2], 4) if latencies else 0.0,
+            "max_latency": round(latencies[-1], 4) if latencies else 0.0,
+        }
+
+
+def list_events_page(service, stats: Optional[FetchStats] = None, limiter: Optional[TokenBucket] = None, **params) -> dict:
+    """
+    To request one page of events().list with the field mask and page
+    size applied (unless given in params) and record its stats.
+    The page is retried on its own, so a failure in the middle of a
+    pagination loop resumes from the same pageToken.
+    Raises CalendarFetchError when the request can't succeed
+    """
+    params.setdefault("fields", LIST_FIELDS)
+    params.setdefault("maxResults", MAX_RESULTS)
+    limiter = limiter or rate_limiter
+    attempt = 0
+    while True:
+        waited = limiter.acquire()
+        if stats is not None and waited:
+            stats.record_throttle(waited)
+        try:
+            return _execute_page(service, stats, params)
+        except Exception as e:
+            status = http_status(e)
+            if attempt >= MAX_RETRIES or not is_retryable(e):
+                raise CalendarFetchError(
+                    f"events().list of {params.get('calendarId')} failed"
+                    f"{f' with HTTP {status}' if status else ''} after {attempt + 1} attempt(s): {e}",
+                    status, attempt + 1, params.get("pageToken")
+                ) from e
+            delay = retry_delay(attempt, e)
+            if stats is not None:
+                stats.record_retry(delay)
+            clock.sleep(delay)
+            attempt += 1
+
+
+def _execute_page(service, stats: Optional[FetchStats], params: dict) -> dict:
+    """
+    Bytes are the decoded JSON payload: httplib2 unzips responses before
+    handing them over, so the compressed size on the wire is not visible
+    """
+    request = service.events().list(**params)
+    captured = {}
+    headers = getattr(request, "headers", None)
+    if headers is not None:
+        # Google only compresses responses for clients asking for gzip
+        # in both Accept-Encoding and the User-Agent
+        headers["accept-encoding"] = "gzip"
+        user_agent = headers.get("user-agent", "")
+        if "gzip" not in user_agent:
+            headers["user-agent"] = f"{user_agent} (gzip)".strip()
+    postproc = getattr(request, "postproc", None)
+    if postproc is not None:
+        def recording_postproc(response, content):
+            captured["bytes"] = len(content)
+            captured["gzipped"] = response.get("-content-encoding") == "gzip"
+            return postproc(response, content)
+        request.postproc = recording_postproc
+    started = clock.perf_counter()
+    result = request.execute()
+    seconds = clock.perf_counter() - started
+    if stats is not None:
+        # Other services (async_calendar) report the payload on the request
+        payload_bytes = captured.get("bytes", getattr(request, "payload_bytes", None))
+        gzipped = captured.get("gzipped", getattr(request, "gzipped", False))
+        if payload_bytes is None:
+            # Stand-in services don't go through HTTP: measure the JSON instead
+            payload_bytes = len(json.dumps(result))
+        stats.record(payload_bytes, seconds, gzipped, "q" in params)
+    return result
+
+
+@dataclass(slots=True)
+class CalendarMetadata:
+    """
+    What a single-event events().list tells about a calendar.
+    access_role is 'owner', 'writer', 'reader' or 'freeBusyReader';
+    error and status are set instead when the calendar can't be read
+    """
+    calendar_id: str
+    summary: Optional[str] = None
+    time_zone: Optional[str] = None
+    access_role: Optional[str] = None
+    error: Optional[str] = None
+    status: Optional[int] = None
+
+    @property
+    def is_valid(self) -> bool:
+        return self.error is None
+
+    @property
+    def can_read_details(self) -> bool:
+        return self.is_valid and self.access_role != "freeBusyReader"
+
+
+class MetadataCache:
+    """
+    Thread-safe CalendarMetadata by calendar ID, each kept for ttl seconds.
+    Failures are cached too, except transient ones worth retrying
+    """
+    def __init__(self, ttl: float = CALENDAR_METADATA_TTL):
+        self.ttl = ttl
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, calendar_id: str) -> Optional[CalendarMetadata]:
+        with self._lock:
+            entry = self._entries.get(calendar_id)
+            if entry is None or clock.monotonic() - entry[0] > self.ttl:
+                return None
+            return entry[1]
+
+    def put(self, metadata: CalendarMetadata):
+        with self._lock:
+            self._entries[metadata.calendar_id] = (clock.monotonic(), metadata)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every calendar of the process
+metadata_cache = MetadataCache()
+
+
+def fetch_calendar_metadata(
+        service,
+        calendar_ids: Iterable[str],
+        cache: Optional[MetadataCache] = None,
+        use_cached_errors: bool = True
+) -> Dict[str, CalendarMetadata]:
+    """
+    To validate calendars and read their metadata, grouping the probes of
+    up to BATCH_LIMIT calendars into one batch HTTP round-trip
+    (new_batch_http_request). Cached results are reused (failures only if
+    use_cached_errors, e.g. not when a user retries after fixing sharing),
+    transient failures are retried with backoff, and every calendar gets
+    a CalendarMetadata, with an error if it can't be read
+    """
+    cache = cache or metadata_cache
+    results: Dict[str, CalendarMetadata] = {}
+    pending = []
+    for calendar_id in dict.fromkeys(calendar_ids):
+        cached = cache.get(calendar_id)
+        if cached is not None and (cached.is_valid or use_cached_errors):
+            results[calendar_id] = cached
+        else:
+            pending.append(calendar_id)
+    attempt = 0
+    while pending:
+        failed = {}
+        for first in range(0, len(pending), BATCH_LIMIT):
+            chunk = pending[first:first + BATCH_LIMIT]
+            for calendar_id, (response, error) in _execute_probes(service, chunk).items():
+                if error is None:
+                    metadata = CalendarMetadata(
+                        calendar_id, response.get("summary"), response.get("timeZone"), response.get("accessRole"))
+                elif is_retryable(error) and attempt < MAX_RETRIES:
+                    failed[calendar_id] = error
+                    continue
+                else:
+                    metadata = CalendarMetadata(calendar_id, error=str(error), status=http_status(error))
+                results[calendar_id] = metadata
+                if error is None or not is_retryable(error):
+                    cache.put(metadata)
+        pending = list(failed)
+        if pending:
+            clock.sleep(retry_delay(attempt, next(iter(failed.values()))))
+            attempt += 1
+    return results
+
+
+def _execute_probes(service, calendar_ids: List[str]) -> Dict[str, tuple]:
+    """
+    To run one metadata probe per calendar, as a single batch request when
+    the service supports it, returning (response, error) by calendar ID
+    """
+    outcomes: Dict[str, tuple] = {}
+
+    def probe(calendar_id: str):
+        return service.events().list(calendarId=calendar_id, maxResults=1, fields=METADATA_FIELDS)
+
+    new_batch = getattr(service, "new_batch_http_request", None)
+    if new_batch is None:
+        for calendar_id in calendar_ids:
+            rate_limiter.acquire()
+            try:
+                outcomes[calendar_id] = (probe(calendar_id).execute(), None)
+            except Exception as e:
+                outcomes[calendar_id] = (None, e)
+        return outcomes
+
+    def callback(request_id, response, exception):
+        outcomes[calendar_ids[int(request_id)]] = (response, exception)
+
+    batch = new_batch(callback=callback)
+    for index, calendar_id in enumerate(calendar_ids):
+        batch.add(probe(calendar_id), request_id=str(index))
+    # One round-trip: pacing it per probe would hold 50 calendars for seconds
+    rate_limiter.acquire()
+    try:
+        batch.execute()
+    except Exception as e:
+        # The batch round-trip itself failed: every probe of it did
+        for calendar_id in calendar_ids:
+            outcomes.setdefault(calendar_id, (None, e))
+    return outcomes
@@ -0,0 +1,101 @@
+"""
+Lazily built Google API clients.
+Nothing here reads creds.json or touches the network at import time:
+every client is created on first use, then cached for the process.
+The google/gspread libraries themselves are imported on first use too,
+as importing them alone takes a noticeable part of the cold start.
+"""
+import os
+import threading
+
+SCOPE = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.file",
+    "https://www.googleapis.com/auth/drive",
+    "https://www.googleapis.com/auth/calendar.readonly"
+]
+
+CREDS_FILE = os.environ.get('CREDS_FILE', 'creds.json')
+# 'httpx' for the asynchronous Calendar backend (async_calendar.py)
+CALENDAR_BACKEND = os.environ.get('CALENDAR_BACKEND', 'googleapiclient')
+SHEET_NAME = 'working-hours-reports'
+
+_clients = {}
+_lock = threading.RLock()
+_thread_clients = threading.local()
+
+
+def _get_or_create(name, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = factory()
+                _clients[name] = client
+    return client
+
+
+def get_credentials():
+    """
+    To load the service account credentials with the app scopes
+    """
+    def create():
+        from google.oauth2.service_account import Credentials
+        return Credentials.from_service_account_file(CREDS_FILE).with_scopes(SCOPE)
+    return _get_or_create('credentials', create)
+
+
+def get_gspread_client():
+    def create():
+        import gspread
+        return gspread.authorize(get_credentials())
+    return _get_or_create('gspread', create)
+
+
+def get_sheet():
+    """
+    To open the working-hours-reports spreadsheet
+    """
+    return _get_or_create('sheet', lambda: get_gspread_client().open(SHEET_NAME))
+
+
+def get_calendar_service():
+    """
+    To build the Google Calendar service from the discovery document
+    bundled with google-api-python-client (static_discovery), so building
+    it does not download the document again.
+    Each thread gets its own service, as the httplib2 transport underneath
+    is not thread-safe; an injected service is shared by all threads, as is
+    the async one of CALENDAR_BACKEND=httpx.
+    """
+    injected = _clients.get('calendar')
+    if injected is not None:
+        return injected
+    if CALENDAR_BACKEND == 'httpx':
+        def create():
+            from async_calendar import AsyncCalendarService
+            return AsyncCalendarService(get_credentials())
+        return _get_or_create('calendar_async', create)
+    service = getattr(_thread_clients, 'calendar', None)
+    if service is None:
+        from googleapiclient.discovery import build
+        service = build('calendar', 'v3', credentials=get_credentials(), static_discovery=True, cache_discovery=False)
+        _thread_clients.calendar = service
+    return service
+
+
+def set_client(name: str, client):
+    """
+    To inject a ready made client (e.g. a stand-in service for offline
+    runs) under one of the names: 'credentials', 'gspread', 'sheet', 'calendar'
+    """
+    with _lock:
+        _clients[name] = client
+
+
+def reset_clients():
+    global _thread_clients
+    with _lock:
+        _clients.clear()
+        _thread_clients = threading.local()
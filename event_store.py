@@ -0,0 +1,245 @@
+import json
+import sqlite3
+import threading
+import time as clock
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from calendar_api import FetchStats, http_status, list_events_page
+from timestamps import parse_timestamp
+
+# Seconds all-day events are widened by on each side (see _event_bounds)
+ALL_DAY_MARGIN = 14 * 3600
+# Bumped when the stored bounds change, forcing a full sync of every calendar
+SCHEMA_VERSION = 1
+
+
+class EventStore:
+    """
+    Local SQLite copy of Google Calendar events, keyed by calendar_id.
+    The first sync of a calendar downloads all its events, later syncs use
+    the nextSyncToken of the previous one to pull only changed and deleted
+    events. Period queries are then answered from the local copy.
+    Every sync logs the time spans it changed, so derived data (like the
+    daily rollups) can be updated for those spans only.
+    """
+    def __init__(self, path: str = "event_store.sqlite3", min_sync_interval: float = 60.0):
+        self.path = path
+        # Seconds during which a synced calendar is considered fresh,
+        # so several reports in a row cost no API request at all
+        self.min_sync_interval = min_sync_interval
+        # Guards the SQLite connection, never held during API requests
+        self._lock = threading.Lock()
+        self._calendar_locks: Dict[str, threading.Lock] = {}
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    calendar_id TEXT NOT NULL,
+                    event_id TEXT NOT NULL,
+                    start_ts REAL NOT NULL,
+                    end_ts REAL NOT NULL,
+                    body TEXT NOT NULL,
+                    PRIMARY KEY (calendar_id, event_id)
+                )""")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS events_by_period ON events (calendar_id, start_ts, end_ts)")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    calendar_id TEXT PRIMARY KEY,
+                    sync_token TEXT,
+                    synced_at REAL NOT NULL
+                )""")
+            # Spans touched by each sync, NULL bounds meaning the whole calendar
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    calendar_id TEXT NOT NULL,
+                    start_ts REAL,
+                    end_ts REAL
+                )""")
+            if self._connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                self._connection.execute("DELETE FROM events")
+                self._connection.execute("DELETE FROM sync_state")
+                self._connection.execute("DELETE FROM changes")
+                self._connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def sync(self, service, calendar_id: str, stats: Optional[FetchStats] = None) -> int:
+        """
+        To bring the local copy of the calendar up to date and return
+        the number of API pages that were requested for it
+        """
+        # One sync per calendar at a time; the store-wide lock is only taken
+        # for SQLite, so other calendars sync and get queried meanwhile
+        with self._calendar_lock(calendar_id):
+            with self._lock:
+                sync_token, synced_at = self._get_sync_state(calendar_id)
+            if sync_token and clock.time() - synced_at < self.min_sync_interval:
+                return 0
+            try:
+                return self._sync_pages(service, calendar_id, sync_token, stats)
+            except Exception as e:
+                # HttpError 410 Gone: the sync token expired, start over with a full sync
+                if http_status(e) != 410 or not sync_token:
+                    raise
+                with self._lock, self._connection:
+                    self._forget(calendar_id)
+                return self._sync_pages(service, calendar_id, None, stats)
+
+    def _calendar_lock(self, calendar_id: str) -> threading.Lock:
+        with self._lock:
+            return self._calendar_locks.setdefault(calendar_id, threading.Lock())
+
+    def query(self, calendar_id: str, time_min: datetime, time_max: datetime) -> List[dict]:
+        """
+        To return the stored events overlapping [time_min, time_max),
+        ordered by start time like events().list(orderBy='startTime')
+        """
+        return list(self.iter_query(calendar_id, time_min, time_max))
+
+    def iter_query(self, calendar_id: str, time_min: datetime, time_max: datetime, chunk_size: int = 500) -> Iterator[dict]:
+        """
+        To stream the events of query() chunk by chunk
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                """SELECT body FROM events
+                   WHERE calendar_id = ? AND end_ts > ? AND start_ts < ?
+                   ORDER BY start_ts, event_id""",
+                (calendar_id, _timestamp(time_min), _timestamp(time_max))
+            )
+            rows = cursor.fetchmany(chunk_size)
+        while rows:
+            for (body,) in rows:
+                yield json.loads(body)
+            with self._lock:
+                rows = cursor.fetchmany(chunk_size)
+
+    def changes_since(self, calendar_id: str, seq: int = 0) -> Tuple[int, List[Tuple[Optional[float], Optional[float]]]]:
+        """
+        To return the latest change number of the store and the (start, end)
+        timestamps changed in the calendar after change number seq,
+        (None, None) standing for the whole calendar
+        """
+        with self._lock:
+            latest = self._connection.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            rows = self._connection.execute(
+                "SELECT start_ts, end_ts FROM changes WHERE calendar_id = ? AND seq > ? ORDER BY seq",
+                (calendar_id, seq)
+            ).fetchall()
+        return latest, rows
+
+    def clear(self, calendar_id: Optional[str] = None):
+        """
+        To forget one calendar (or all of them), forcing a full sync next time
+        """
+        with self._lock, self._connection:
+            if calendar_id is None:
+                calendar_ids = [row[0] for row in self._connection.execute(
+                    "SELECT calendar_id FROM sync_state UNION SELECT DISTINCT calendar_id FROM events")]
+            else:
+                calendar_ids = [calendar_id]
+            for forgotten_id in calendar_ids:
+                self._forget(forgotten_id)
+
+    def close(self):
+        self._connection.close()
+
+    def _get_sync_state(self, calendar_id: str) -> Tuple[Optional[str], float]:
+        row = self._connection.execute(
+            "SELECT sync_token, synced_at FROM sync_state WHERE calendar_id = ?", (calendar_id,)
+        ).fetchone()
+        return row if row else (None, 0.0)
+
+    def _sync_pages(self, service, calendar_id: str, sync_token: Optional[str], stats: Optional[FetchStats] = None) -> int:
+        """
+        To page through events().list, full (sync_token None) or incremental,
+        and apply every page to the store in one transaction at the end,
+        so an interrupted sync leaves the previous state untouched
+        """
+        pages = 0
+        changed = []
+        page_token = None
+        while True:
+            params = {"calendarId": calendar_id, "singleEvents": True, "pageToken": page_token}
+            if sync_token:
+                params["syncToken"] = sync_token
+            result = list_events_page(service, stats, **params)
+            pages += 1
+            changed.extend(result.get("items", []))
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                break
+        with self._lock, self._connection:
+            if not sync_token:
+                # Full sync: everything may have changed, older changes are moot
+                self._connection.execute("DELETE FROM changes WHERE calendar_id = ?", (calendar_id,))
+                self._connection.execute("INSERT INTO changes (calendar_id) VALUES (?)", (calendar_id,))
+            for event in changed:
+                if sync_token:
+                    previous = self._connection.execute(
+                        "SELECT start_ts, end_ts FROM events WHERE calendar_id = ? AND event_id = ?",
+                        (calendar_id, event["id"])).fetchone()
+                    if previous:
+                        self._log_change(calendar_id, *previous)
+                bounds = _event_bounds(event) if event.get("status") != "cancelled" else None
+                if bounds is None:
+                    self._connection.execute(
+                        "DELETE FROM events WHERE calendar_id = ? AND event_id = ?",
+                        (calendar_id, event["id"]))
+                    continue
+                if sync_token:
+                    self._log_change(calendar_id, *bounds)
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?)",
+                    (calendar_id, event["id"], bounds[0], bounds[1], json.dumps(event)))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                (calendar_id, result.get("nextSyncToken"), clock.time()))
+        return pages
+
+    def _forget(self, calendar_id: str):
+        """
+        To delete the events and sync state of a calendar, logging a
+        whole-calendar change so derived data drops the deleted events too
+        """
+        self._connection.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+        self._connection.execute("DELETE FROM sync_state WHERE calendar_id = ?", (calendar_id,))
+        self._log_change(calendar_id, None, None)
+
+    def _log_change(self, calendar_id: str, start_ts: Optional[float], end_ts: Optional[float]):
+        self._connection.execute(
+            "INSERT INTO changes (calendar_id, start_ts, end_ts) VALUES (?, ?, ?)",
+            (calendar_id, start_ts, end_ts))
+
+
+def _timestamp(moment: datetime) -> float:
+    """
+    Naive datetimes are read as UTC, like the 'Z' suffixed API bounds
+    """
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _event_bounds(event: dict) -> Optional[Tuple[float, float]]:
+    """
+    To return the (start, end) timestamps of an event. All-day events
+    have no time zone, so their dates are widened to cover them in any
+    zone (UTC-12 to UTC+14); readers check the dates themselves
+    """
+    start_info = event.get("start", {})
+    end_info = event.get("end", {})
+    raw_start = start_info.get("dateTime") or start_info.get("date")
+    raw_end = end_info.get("dateTime") or end_info.get("date")
+    if not raw_start or not raw_end:
+        return None
+    try:
+        start = _timestamp(parse_timestamp(raw_start))
+        end = _timestamp(parse_timestamp(raw_end))
+    except (ValueError, OverflowError):
+        return None
+    if "date" in start_info and "dateTime" not in start_info:
+        start -= ALL_DAY_MARGIN
+        end += ALL_DAY_MARGIN
+    return start, end
@@ -0,0 +1,104 @@
+"""
+Process-wide index of public holidays.
+Each (country, subdivision, year) is expanded by the holidays library
+only once and kept as sorted date/title lists, range queries then use
+bisect. With HOLIDAY_INDEX_PATH set the index is also saved to disk,
+so the next processes skip the expansion entirely.
+"""
+import json
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import holidays
+
+HOLIDAY_INDEX_PATH = os.environ.get('HOLIDAY_INDEX_PATH')
+
+
+class HolidayIndex:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._years: Dict[Tuple[str, str, int], Tuple[List[date], List[str]]] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def get_year(self, country_code: str, year: int, subdivision: Optional[str] = None) -> Tuple[List[date], List[str]]:
+        """
+        To return the sorted holiday dates of one year and their titles
+        """
+        key = (country_code.upper(), (subdivision or "").upper(), year)
+        entry = self._years.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self._years.get(key)
+                if entry is None:
+                    expanded = holidays.country_holidays(key[0], subdiv=subdivision or None, years=year)
+                    items = sorted(expanded.items())
+                    entry = ([day for day, _ in items], [title for _, title in items])
+                    self._years[key] = entry
+                    if self.path:
+                        self._save()
+        return entry
+
+    def between(self, country_code: str, start_date: date, end_date: date, subdivision: Optional[str] = None) -> List[Tuple[date, str]]:
+        """
+        To return the (date, title) holidays between start_date and end_date
+        (inclusive), sorted by date
+        """
+        found: Dict[date, str] = {}
+        for year in range(start_date.year, end_date.year + 1):
+            dates, titles = self.get_year(country_code, year, subdivision)
+            low = bisect_left(dates, start_date)
+            high = bisect_right(dates, end_date)
+            for i in range(low, high):
+                found.setdefault(dates[i], titles[i])
+        return sorted(found.items())
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as index_file:
+                stored = json.load(index_file)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable holiday index {self.path}: {e}")
+            return
+        # An index built by another version of the library may be outdated
+        if stored.get("holidays_version") != holidays.__version__:
+            return
+        for key, items in stored.get("years", {}).items():
+            country_code, subdivision, year = key.split("|")
+            self._years[(country_code, subdivision, int(year))] = (
+                [date.fromisoformat(day) for day, _ in items],
+                [title for _, title in items]
+            )
+
+    def _save(self):
+        stored = {
+            "holidays_version": holidays.__version__,
+            "years": {
+                f"{country_code}|{subdivision}|{year}": [[day.isoformat(), title] for day, title in zip(*entry)]
+                for (country_code, subdivision, year), entry in self._years.items()
+            }
+        }
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as index_file:
+            json.dump(stored, index_file, ensure_ascii=False)
+        os.replace(temporary_path, self.path)
+
+
+_holiday_index: Optional[HolidayIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_holiday_index() -> HolidayIndex:
+    """
+    To return the index shared by the whole process
+    """
+    global _holiday_index
+    if _holiday_index is None:
+        with _index_lock:
+            if _holiday_index is None:
+                _holiday_index = HolidayIndex(HOLIDAY_INDEX_PATH)
+    return _holiday_index
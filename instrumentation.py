@@ -0,0 +1,198 @@
+"""
+Per-report instrumentation: stage timers, counters and optional profiling.
+Every Report records how long fetching the events, the holidays, parsing
+the shifts, the vacation days and the figures took, and how many API
+pages (and bytes), events and shifts it went through. Nothing is written unless
+enabled, by environment variable or with configure() (batch.py --metrics):
+
+    REPORT_METRICS=json|prometheus  one metrics record per report
+    REPORT_METRICS_FILE=path        appended to instead of stderr
+    REPORT_PROFILE=directory        one cProfile dump per report
+    REPORT_PROFILER=pyinstrument    HTML profiles instead (needs pyinstrument)
+
+Profiles only see the thread building the report: the calendar fetches
+on the thread pool show up as waiting, their time is in the fetch stage.
+"""
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time as clock
+from contextlib import ContextDecorator, contextmanager, nullcontext
+from functools import wraps
+from typing import Dict, Optional
+
+METRICS_FORMATS = ("json", "prometheus")
+PROFILERS = ("cprofile", "pyinstrument")
+METRICS_FORMAT = os.environ.get("REPORT_METRICS") or None
+METRICS_FILE = os.environ.get("REPORT_METRICS_FILE")
+PROFILE_DIR = os.environ.get("REPORT_PROFILE")
+PROFILER = os.environ.get("REPORT_PROFILER", "cprofile")
+
+# Stages of a report, in the order they run
+STAGES = ("fetch", "holidays", "shifts", "shift_totals", "vacation_days", "days_off", "figures")
+COUNTERS = ("api_pages", "api_bytes", "events_seen", "events_matched", "shifts")
+
+_emit_lock = threading.Lock()
+_profile_numbers = itertools.count(1)
+
+
+def configure(metrics_format: Optional[str] = None, metrics_file: Optional[str] = None,
+              profile_dir: Optional[str] = None, profiler: Optional[str] = None):
+    """
+    To switch metrics or profiling on for the rest of the process,
+    overriding the environment variables (None leaves a setting as is)
+    """
+    global METRICS_FORMAT, METRICS_FILE, PROFILE_DIR, PROFILER
+    if metrics_format is not None:
+        if metrics_format not in METRICS_FORMATS:
+            raise ValueError(f"metrics format must be one of {', '.join(METRICS_FORMATS)}")
+        METRICS_FORMAT = metrics_format
+    if profiler is not None:
+        if profiler not in PROFILERS:
+            raise ValueError(f"profiler must be one of {', '.join(PROFILERS)}")
+        PROFILER = profiler
+    METRICS_FILE = metrics_file if metrics_file is not None else METRICS_FILE
+    PROFILE_DIR = profile_dir if profile_dir is not None else PROFILE_DIR
+
+
+class _Timer(ContextDecorator):
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self._started = clock.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.metrics.add_time(self.stage, clock.perf_counter() - self._started)
+
+
+class Metrics:
+    """
+    Thread-safe stage timings (seconds, summed over calls) and counters
+    of one report, with labels identifying it (user, period)
+    """
+    def __init__(self, labels: Optional[Dict[str, str]] = None):
+        self.labels = labels or {}
+        self.timings: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def timer(self, stage: str) -> _Timer:
+        """
+        To time a block or a function into `stage`:
+        with metrics.timer("shifts"): ... or @metrics.timer("shifts")
+        """
+        return _Timer(self, stage)
+
+    def add_time(self, stage: str, seconds: float):
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "labels": dict(self.labels),
+                "stage_seconds": {stage: round(seconds, 6) for stage, seconds in self.timings.items()},
+                "counters": dict(self.counters),
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        To render the metrics in the Prometheus text exposition format
+        """
+        metrics = self.to_dict()
+        labels = ",".join(f'{name}="{_escape_label(value)}"' for name, value in metrics["labels"].items())
+        lines = ["# TYPE report_stage_seconds gauge"]
+        for stage, seconds in metrics["stage_seconds"].items():
+            lines.append(f'report_stage_seconds{{{labels}{"," if labels else ""}stage="{stage}"}} {seconds}')
+        for name, value in metrics["counters"].items():
+            lines.append(f"# TYPE report_{name}_total counter")
+            lines.append(f"report_{name}_total{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def emit(self, metrics_format: Optional[str] = None, output=None):
+        """
+        To write the metrics as one JSON line or a Prometheus text block,
+        to the metrics file (or stderr) if not given an output.
+        Does nothing when metrics are off
+        """
+        metrics_format = metrics_format or METRICS_FORMAT
+        if not metrics_format:
+            return
+        text = self.to_prometheus() if metrics_format == "prometheus" else json.dumps(self.to_dict()) + "\n"
+        with _emit_lock:
+            if output is not None:
+                output.write(text)
+            elif METRICS_FILE:
+                with open(METRICS_FILE, "a", encoding="utf-8") as metrics_file:
+                    metrics_file.write(text)
+            else:
+                sys.stderr.write(text)
+
+
+def timed(stage: str):
+    """
+    To time a method into the Metrics of its object (self.metrics)
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.timer(stage):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def metrics_enabled() -> bool:
+    return bool(METRICS_FORMAT)
+
+
+def profiled(name: str):
+    """
+    To profile a block into PROFILE_DIR when profiling is on,
+    as <name>-<n>.prof (cProfile) or .html (pyinstrument)
+    """
+    if not PROFILE_DIR:
+        return nullcontext()
+    return _profile(name)
+
+
+@contextmanager
+def _profile(name: str):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}-{next(_profile_numbers)}")
+    if PROFILER == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise RuntimeError("REPORT_PROFILER=pyinstrument needs pyinstrument: pip install pyinstrument") from None
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(path + ".html", "w", encoding="utf-8") as profile_file:
+                profile_file.write(profiler.output_html())
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path + ".prof")
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,128 @@
+"""
+Timezone aware interval helpers.
+Report periods are whole local days of the calendar's time zone,
+[start_date 00:00, end_date + 1 day 00:00), so events are clipped
+against the exact bounds whatever their own offset or DST changes.
+"""
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+def get_zone(name: Optional[str]) -> tzinfo:
+    """
+    To return the time zone of an IANA name like 'Europe/Vienna', UTC if unknown
+    """
+    try:
+        return ZoneInfo(name) if name else timezone.utc
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def local_midnight(day: date, zone: tzinfo) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=zone)
+
+
+def period_bounds(start_date: date, end_date: date, zone: tzinfo) -> Tuple[datetime, datetime]:
+    """
+    To return the aware bounds [start, end) of the days start_date..end_date
+    """
+    if isinstance(start_date, datetime):
+        start_date = start_date.date()
+    if isinstance(end_date, datetime):
+        end_date = end_date.date()
+    return local_midnight(start_date, zone), local_midnight(end_date + timedelta(days=1), zone)
+
+
+def to_zone(moment: datetime, zone: tzinfo) -> datetime:
+    """
+    To express moment in zone, naive datetimes being read as local times of zone
+    """
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=zone)
+    return moment.astimezone(zone)
+
+
+def instant(moment: datetime) -> datetime:
+    """
+    To return moment in UTC. Datetimes sharing a ZoneInfo compare by wall
+    clock and ignore fold, so 02:15+01:00 sorts before 02:30+02:00 on a
+    fall-back night: compare instants instead
+    """
+    return moment.astimezone(timezone.utc)
+
+
+def clip(start: datetime, end: datetime, range_start: datetime, range_end: datetime) -> Optional[Tuple[datetime, datetime]]:
+    """
+    To return the part of [start, end) inside [range_start, range_end), None if empty
+    """
+    clipped_start = start if instant(start) >= instant(range_start) else range_start
+    clipped_end = end if instant(end) <= instant(range_end) else range_end
+    if instant(clipped_end) <= instant(clipped_start):
+        return None
+    return clipped_start, clipped_end
+
+
+def split_by_day(start: datetime, end: datetime) -> Iterator[Tuple[date, datetime, datetime]]:
+    """
+    To split [start, end) at the local midnights of start's time zone,
+    yielding (day, segment start, segment end) for each day it covers
+    """
+    zone = start.tzinfo
+    segment_start = start
+    while instant(segment_start) < instant(end):
+        next_midnight = local_midnight(segment_start.date() + timedelta(days=1), zone)
+        segment_end = end if instant(end) <= instant(next_midnight) else next_midnight
+        yield segment_start.date(), segment_start, segment_end
+        segment_start = segment_end
+
+
+def hours_between(start: datetime, end: datetime) -> float:
+    """
+    Elapsed hours, so a night shift over a DST change counts 7 or 9 hours
+    """
+    return (end.astimezone(timezone.utc) - start.astimezone(timezone.utc)).total_seconds() / 3600
+
+
+class IntervalSweep:
+    """
+    Sweep over [start, end) intervals fed in start order (sort them
+    first, O(n log n), unless they come sorted like events ordered by
+    startTime, see instant() for the sort key). Only the merged interval
+    being extended is kept, so streamed shifts need no buffering. The
+    parts of an interval already covered by earlier ones are collected
+    as overlaps
+    """
+    def __init__(self):
+        self.union_hours = 0.0
+        self.overlap_hours = 0.0
+        self.overlaps: List[Tuple[datetime, datetime]] = []
+        self._start: Optional[datetime] = None
+        self._end: Optional[datetime] = None
+        self._last_start: Optional[datetime] = None
+
+    def add(self, start: datetime, end: datetime):
+        start_instant, end_instant = instant(start), instant(end)
+        if self._last_start is not None and start_instant < self._last_start:
+            raise ValueError("Intervals must be added in start order")
+        self._last_start = start_instant
+        if self._end is None or start_instant > instant(self._end):
+            self._close()
+            self._start, self._end = start, end
+            return
+        if start_instant < instant(self._end):
+            overlap_end = end if end_instant <= instant(self._end) else self._end
+            self.overlaps.append((start, overlap_end))
+            self.overlap_hours += hours_between(start, overlap_end)
+        if end_instant > instant(self._end):
+            self._end = end
+
+    def finish(self) -> "IntervalSweep":
+        self._close()
+        return self
+
+    def _close(self):
+        if self._end is not None:
+            self.union_hours += hours_between(self._start, self._end)
+            self._start = self._end = None
+
@@ -0,0 +1,196 @@
+"""
+Machine readable report output: shifts and per-period summaries written
+to CSV, JSON Lines or Parquet with fixed schemas, so other tools (e.g.
+payroll) can read them instead of the printed reports.
+Records are formatted and written chunk by chunk, so a shift list can be
+streamed (e.g. from WorkCalendar.iter_shifts) without ever being held
+in memory as formatted rows. Parquet output needs pyarrow installed.
+"""
+import csv
+import json
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timezone
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+FORMATS = ("csv", "jsonl", "parquet")
+CHUNK_SIZE = 10_000
+
+# (column, type) with type one of string, date, float, int, bool, timestamp.
+# api_pages_requested is the pages of the fetch the row comes from; rows
+# sharing a fetch (a batch user's periods) have them on the first one only
+SUMMARY_SCHEMA: List[Tuple[str, str]] = [
+    ("name", "string"), ("start_date", "date"), ("end_date", "date"),
+    ("expected_hours", "float"), ("actual_hours", "float"), ("raw_hours", "float"),
+    ("overlap_hours", "float"), ("difference", "float"),
+    ("expected_days", "int"), ("actual_days", "int"), ("vacation_days", "int"),
+    ("holiday_days", "int"), ("total_days_off", "int"),
+    ("api_pages_requested", "int"), ("error", "string"),
+]
+# start/end are UTC timestamps, date the calendar-local day the shift starts on.
+# All-day shifts have no start/end time
+SHIFT_SCHEMA: List[Tuple[str, str]] = [
+    ("name", "string"), ("date", "date"), ("start", "timestamp"), ("end", "timestamp"),
+    ("hours", "float"), ("title", "string"), ("all_day", "bool"),
+]
+
+
+def shift_records(name: str, shifts: Iterable) -> Iterator[dict]:
+    """
+    To turn Shift objects into SHIFT_SCHEMA records, lazily
+    """
+    for shift in shifts:
+        if shift.all_day:
+            yield {"name": name, "date": shift.start, "start": None, "end": None,
+                   "hours": shift.duration, "title": shift.title, "all_day": True}
+        else:
+            yield {"name": name, "date": shift.start.date(), "start": shift.start, "end": shift.end,
+                   "hours": shift.duration, "title": shift.title, "all_day": False}
+
+
+def _convert(value, kind: str):
+    """
+    To normalise a value to its schema type (None stays None)
+    """
+    if value is None or value == "":
+        return None
+    if kind == "date":
+        return date.fromisoformat(value) if isinstance(value, str) else value
+    if kind == "timestamp":
+        return value.astimezone(timezone.utc)
+    if kind == "float":
+        return float(value)
+    if kind == "int":
+        return int(value)
+    if kind == "bool":
+        return bool(value)
+    return str(value)
+
+
+def _to_text(value) -> Optional[object]:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+class RecordWriter(ABC):
+    """
+    Writes records of a fixed schema in chunks of chunk_size.
+    Use as a context manager, or call close()
+    """
+    def __init__(self, output, schema: List[Tuple[str, str]], chunk_size: int = CHUNK_SIZE):
+        self.output = output
+        self.schema = schema
+        self.columns = [name for name, _ in schema]
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+        # Set when the writer opened output itself, see open_path()
+        self._owned_file = None
+
+    def write(self, records: Iterable[dict]) -> int:
+        """
+        To write records (missing columns being empty) and return how many were written
+        """
+        records = iter(records)
+        written = 0
+        while True:
+            chunk = [
+                {name: _convert(record.get(name), kind) for name, kind in self.schema}
+                for record in islice(records, self.chunk_size)
+            ]
+            if not chunk:
+                break
+            self._write_chunk(chunk)
+            written += len(chunk)
+        self.rows_written += written
+        return written
+
+    @abstractmethod
+    def _write_chunk(self, chunk: List[dict]):
+        """
+        To write a chunk of records already converted to the schema types
+        """
+
+    def close(self):
+        if self._owned_file is not None:
+            self._owned_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class CsvRecordWriter(RecordWriter):
+    def __init__(self, output, schema, chunk_size: int = CHUNK_SIZE):
+        super().__init__(output, schema, chunk_size)
+        self._writer = csv.DictWriter(output, fieldnames=self.columns)
+        self._writer.writeheader()
+
+    def _write_chunk(self, chunk: List[dict]):
+        self._writer.writerows({name: _to_text(value) for name, value in record.items()} for record in chunk)
+
+
+class JsonLinesRecordWriter(RecordWriter):
+    def _write_chunk(self, chunk: List[dict]):
+        self.output.write("".join(
+            json.dumps({name: _to_text(value) for name, value in record.items()}) + "\n" for record in chunk
+        ))
+
+
+class ParquetRecordWriter(RecordWriter):
+    """
+    One Parquet row group per chunk. output is a path or binary file
+    """
+    ARROW_TYPES = {"string": "string", "date": "date32", "float": "float64", "int": "int64", "bool": "bool_"}
+
+    def __init__(self, output, schema, chunk_size: int = CHUNK_SIZE):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow: pip install -r requirements-optional.txt") from None
+        super().__init__(output, schema, chunk_size)
+        self._pyarrow = pyarrow
+        self._arrow_schema = pyarrow.schema([
+            (name, pyarrow.timestamp("us", tz="UTC") if kind == "timestamp" else getattr(pyarrow, self.ARROW_TYPES[kind])())
+            for name, kind in schema
+        ])
+        self._writer = pyarrow.parquet.ParquetWriter(output, self._arrow_schema)
+
+    def _write_chunk(self, chunk: List[dict]):
+        self._writer.write_table(self._pyarrow.Table.from_pylist(chunk, schema=self._arrow_schema))
+
+    def close(self):
+        self._writer.close()
+        super().close()
+
+
+WRITERS: Dict[str, type] = {"csv": CsvRecordWriter, "jsonl": JsonLinesRecordWriter, "parquet": ParquetRecordWriter}
+
+
+def open_writer(output, output_format: str, schema: List[Tuple[str, str]], chunk_size: int = CHUNK_SIZE) -> RecordWriter:
+    """
+    To create the writer of a format on an open file (binary for parquet)
+    """
+    if output_format not in WRITERS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return WRITERS[output_format](output, schema, chunk_size)
+
+
+def open_path(path: str, output_format: str, schema: List[Tuple[str, str]], chunk_size: int = CHUNK_SIZE) -> RecordWriter:
+    """
+    To create the writer of a format on a new file at path, closed with the writer
+    """
+    if output_format == "parquet":
+        return open_writer(path, output_format, schema, chunk_size)
+    output = open(path, "w", encoding="utf-8", newline="")
+    try:
+        writer = open_writer(output, output_format, schema, chunk_size)
+    except Exception:
+        output.close()
+        raise
+    writer._owned_file = output
+    return writer
+
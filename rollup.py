@@ -0,0 +1,284 @@
+"""
+Sub-period reports from a single fetch: a report over an outer range
+(e.g. a whole year) is broken down per day once, and prefix sums over
+the daily figures give the report of any sub-period (months, weeks or
+custom buckets) in O(1), without fetching events again.
+RollupStore keeps these daily figures in SQLite and only recomputes
+the days whose events changed since the last query.
+"""
+import json
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from typing import Callable, Dict, List, Optional, Tuple
+
+from intervals import hours_between, split_by_day
+
+BUCKETS = ("month", "week")
+# Daily figures, in the column order of the rollup table
+FIGURES = ("hours", "raw_hours", "worked_days", "vacation_days", "holiday_days", "expected_days")
+
+
+def split_period(start_date: date, end_date: date, bucket: str) -> List[Tuple[date, date]]:
+    """
+    To split [start_date, end_date] into calendar months or ISO weeks
+    (Monday to Sunday), the first and last ones being clipped to the period
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    periods = []
+    period_start = start_date
+    while period_start <= end_date:
+        if bucket == "month":
+            next_start = (period_start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        else:
+            next_start = period_start + timedelta(days=7 - period_start.weekday())
+        period_end = min(next_start - timedelta(days=1), end_date)
+        periods.append((period_start, period_end))
+        period_start = next_start
+    return periods
+
+
+class DailyRollup:
+    """
+    Per-day figures (see FIGURES) of the days from start_date on,
+    with their prefix sums
+    """
+    def __init__(self, user, start_date: date, daily: Dict[str, List[float]]):
+        self.user = user
+        self.start_date = start_date
+        self.daily = daily
+        self.end_date = start_date + timedelta(days=len(daily["hours"]) - 1)
+        self._prefix: Dict[str, List[float]] = {
+            name: list(accumulate(daily[name], initial=0)) for name in FIGURES
+        }
+
+    @classmethod
+    def from_report(rollup_class, report) -> "DailyRollup":
+        """
+        To break a Report down per day, matching separate reports of the
+        sub-periods: timed shifts are split at midnight, while all-day
+        shifts, which a report counts whole on their first day, stay there
+        """
+        start_date = report.start_date
+        days = (report.end_date - start_date).days + 1
+        hours = [0.0] * days
+        raw_hours = [0.0] * days
+        worked = [0] * days
+        for shift in report.shifts:
+            if shift.all_day:
+                index = (date.fromisoformat(shift.start) - start_date).days
+                hours[index] += shift.duration
+                raw_hours[index] += shift.duration
+                continue
+            for day, segment_start, segment_end in split_by_day(shift.start, shift.end):
+                index = (day - start_date).days
+                segment_hours = hours_between(segment_start, segment_end)
+                hours[index] += segment_hours
+                raw_hours[index] += segment_hours
+            if not shift.started_earlier:
+                worked[(shift.start.date() - start_date).days] = 1
+        for day, overlap_hours in report.shift_totals.overlap_hours_by_day.items():
+            hours[(day - start_date).days] -= overlap_hours
+
+        contract_weekdays = set(report.user.contract_working_weekdays)
+        vacation = [0] * days
+        holiday = [0] * days
+        expected = [0] * days
+        for index in range(days):
+            day = start_date + timedelta(days=index)
+            vacation[index] = int(day in report.adjusted_vacation_days)
+            holiday[index] = int(day in report.adjusted_holiday_days)
+            expected[index] = int(day.weekday() in contract_weekdays and not (vacation[index] or holiday[index]))
+        daily = dict(zip(FIGURES, (hours, raw_hours, worked, vacation, holiday, expected)))
+        return rollup_class(report.user, start_date, daily)
+
+    def total(self, name: str, start_date: date, end_date: date):
+        """
+        To sum the daily figure `name` over [start_date, end_date]
+        """
+        if start_date < self.start_date or end_date > self.end_date or start_date > end_date:
+            raise ValueError(f"{start_date} - {end_date} is not within the report period "
+                             f"{self.start_date} - {self.end_date}")
+        prefix = self._prefix[name]
+        return prefix[(end_date - self.start_date).days + 1] - prefix[(start_date - self.start_date).days]
+
+    def to_dict(self, start_date: date, end_date: date) -> Dict[str, object]:
+        """
+        To return the figures of a sub-period with the keys of Report.to_dict()
+        (no API page is requested for it)
+        """
+        user = self.user
+        expected_days = self.total("expected_days", start_date, end_date)
+        hours_per_day = user.weekly_contract_hours / len(user.contract_working_weekdays)
+        expected_hours = round(expected_days * hours_per_day, 2)
+        hours = self.total("hours", start_date, end_date)
+        raw_hours = self.total("raw_hours", start_date, end_date)
+        actual_hours = round(hours, 2)
+        vacation_days = self.total("vacation_days", start_date, end_date)
+        holiday_days = self.total("holiday_days", start_date, end_date)
+        return {
+            "name": user.name,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "expected_hours": expected_hours,
+            "actual_hours": actual_hours,
+            "raw_hours": round(raw_hours, 2),
+            "overlap_hours": round(raw_hours - hours, 2),
+            "difference": round(actual_hours - expected_hours, 2),
+            "expected_days": expected_days,
+            "actual_days": self.total("worked_days", start_date, end_date),
+            "vacation_days": vacation_days,
+            "holiday_days": holiday_days,
+            # Adjusted vacation and holiday days never overlap
+            "total_days_off": vacation_days + holiday_days,
+            "api_pages_requested": 0,
+        }
+
+    def reports(self, periods: List[Tuple[date, date]]) -> List[Dict[str, object]]:
+        return [self.to_dict(start_date, end_date) for start_date, end_date in periods]
+
+
+class RollupStore:
+    """
+    SQLite copy of the daily figures of each (user settings, calendars)
+    combination. Each query syncs the calendars' event store, recomputes
+    only the days touched by the logged event changes (and the days not
+    covered yet), then answers from the prefix sums kept in memory
+    """
+    def __init__(self, path: str = "rollup.sqlite3"):
+        self.path = path
+        # Guards the SQLite connection and the dicts, held for short reads and writes only
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._loaded: Dict[str, DailyRollup] = {}
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS daily_rollup (
+                    rollup_key TEXT NOT NULL,
+                    day INTEGER NOT NULL,
+                    {", ".join(f"{name} {'REAL' if name.endswith('hours') else 'INTEGER'} NOT NULL" for name in FIGURES)},
+                    PRIMARY KEY (rollup_key, day)
+                )""")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS rollup_state (
+                    rollup_key TEXT PRIMARY KEY,
+                    first_day INTEGER NOT NULL,
+                    last_day INTEGER NOT NULL,
+                    change_seqs TEXT NOT NULL
+                )""")
+
+    def get_rollup(self, key: str, user, calendars: list, start_date: date, end_date: date,
+                   build_report: Callable[[date, date], object]) -> DailyRollup:
+        """
+        To return the daily rollup of key covering at least [start_date, end_date].
+        calendars: the calendars feeding it, each with an event_store
+        build_report(start_date, end_date): a fresh Report of those calendars
+        """
+        # Syncing goes to the network: no lock is held meanwhile
+        for calendar in calendars:
+            calendar.sync_event_store()
+        with self._key_lock(key):
+            with self._lock:
+                state = self._connection.execute(
+                    "SELECT first_day, last_day, change_seqs FROM rollup_state WHERE rollup_key = ?", (key,)
+                ).fetchone()
+            spans = []
+            change_seqs = {}
+            if state is None:
+                first_day, last_day, previous_seqs = start_date, end_date, None
+                spans.append((start_date, end_date))
+            else:
+                first_day, last_day = date.fromordinal(state[0]), date.fromordinal(state[1])
+                previous_seqs = json.loads(state[2])
+                if start_date < first_day:
+                    spans.append((start_date, first_day - timedelta(days=1)))
+                if end_date > last_day:
+                    spans.append((last_day + timedelta(days=1), end_date))
+            for calendar in calendars:
+                seq = previous_seqs.get(calendar.calendar_id, 0) if previous_seqs else 0
+                change_seqs[calendar.calendar_id], changes = calendar.event_store.changes_since(calendar.calendar_id, seq)
+                if previous_seqs is not None:
+                    spans.extend(_changed_days(changes, calendar.get_zone(), first_day, last_day))
+            first_day, last_day = min(first_day, start_date), max(last_day, end_date)
+
+            for span_start, span_end in _merge_spans(spans):
+                self._store(key, DailyRollup.from_report(build_report(span_start, span_end)))
+            with self._lock, self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO rollup_state VALUES (?, ?, ?, ?)",
+                    (key, first_day.toordinal(), last_day.toordinal(), json.dumps(change_seqs)))
+            rollup = self._loaded.get(key)
+            if spans or rollup is None:
+                rollup = self._loaded[key] = self._load(key, user, first_day, last_day)
+            # Contract hours are not part of the daily figures
+            rollup.user = user
+            return rollup
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        """
+        To return the lock of one rollup key: a key is updated by one
+        thread at a time, while other keys are updated meanwhile
+        """
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def clear(self, key: Optional[str] = None):
+        with self._lock, self._connection:
+            if key is None:
+                self._connection.execute("DELETE FROM daily_rollup")
+                self._connection.execute("DELETE FROM rollup_state")
+                self._loaded.clear()
+            else:
+                self._connection.execute("DELETE FROM daily_rollup WHERE rollup_key = ?", (key,))
+                self._connection.execute("DELETE FROM rollup_state WHERE rollup_key = ?", (key,))
+                self._loaded.pop(key, None)
+
+    def close(self):
+        self._connection.close()
+
+    def _store(self, key: str, rollup: DailyRollup):
+        first_ordinal = rollup.start_date.toordinal()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO daily_rollup VALUES (?, ?, {', '.join('?' for _ in FIGURES)})",
+                (
+                    (key, first_ordinal + index, *values)
+                    for index, values in enumerate(zip(*(rollup.daily[name] for name in FIGURES)))
+                ))
+
+    def _load(self, key: str, user, first_day: date, last_day: date) -> DailyRollup:
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {', '.join(FIGURES)} FROM daily_rollup WHERE rollup_key = ? AND day BETWEEN ? AND ? ORDER BY day",
+                (key, first_day.toordinal(), last_day.toordinal())
+            ).fetchall()
+        return DailyRollup(user, first_day, dict(zip(FIGURES, (list(column) for column in zip(*rows)))))
+
+
+def _changed_days(changes, zone, first_day: date, last_day: date) -> List[Tuple[date, date]]:
+    """
+    To turn logged (start, end) change timestamps into the local day spans
+    they touch within [first_day, last_day]
+    """
+    spans = []
+    for start_ts, end_ts in changes:
+        if start_ts is None:
+            return [(first_day, last_day)]
+        span_start = datetime.fromtimestamp(start_ts, zone).date()
+        span_end = datetime.fromtimestamp(max(start_ts, end_ts - 1e-6), zone).date()
+        if span_end >= first_day and span_start <= last_day:
+            spans.append((max(span_start, first_day), min(span_end, last_day)))
+    return spans
+
+
+def _merge_spans(spans: List[Tuple[date, date]]) -> List[Tuple[date, date]]:
+    merged: List[List[date]] = []
+    for span_start, span_end in sorted(spans):
+        if merged and span_start <= merged[-1][1] + timedelta(days=1):
+            merged[-1][1] = max(merged[-1][1], span_end)
+        else:
+            merged.append([span_start, span_end])
+    return [(span_start, span_end) for span_start, span_end in merged]
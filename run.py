@@ -1,24 +1,42 @@
-import gspread
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-import holidays
-from datetime import datetime, date, timedelta, time, timezone
-from dateutil.parser import parse
-from typing import Optional, List, Dict, Set
+import os
+import json
+from datetime import datetime, date, timedelta, timezone, tzinfo
+from typing import Optional, List, Dict, Set, Tuple, Iterable, Iterator, Union
+from dataclasses import dataclass
 import re
-
-SCOPE = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive.file",
-    "https://www.googleapis.com/auth/drive",
-    "https://www.googleapis.com/auth/calendar.readonly"
-]
-
-CREDS = Credentials.from_service_account_file('creds.json')
-SCOPE_CREDS = CREDS.with_scopes(SCOPE)
-GSPREAD_CLIENT = gspread.authorize(SCOPE_CREDS)
-SHEET = GSPREAD_CLIENT.open('working-hours-reports')
-CALENDAR_SERVICE = build('calendar', 'v3', credentials=SCOPE_CREDS)
+import time as clock
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from event_store import EventStore
+from clients import get_calendar_service
+from calendar_api import CalendarFetchError, FetchStats, fetch_calendar_metadata, list_events_page
+from timestamps import parse_timestamp
+from intervals import IntervalSweep, clip, get_zone, hours_between, instant, period_bounds, split_by_day, to_zone
+from rollup import DailyRollup, RollupStore, split_period
+from sheets_export import SheetsExporter
+from holiday_index import HolidayIndex, get_holiday_index
+from instrumentation import Metrics, metrics_enabled, profiled, timed
+from title_matcher import get_title_matcher
+
+# Optional local event cache, enabled by setting EVENT_STORE_PATH
+EVENT_STORE_PATH = os.environ.get('EVENT_STORE_PATH')
+_event_store: Optional[EventStore] = None
+# Optional persisted daily rollups (needs the event store), enabled by setting ROLLUP_STORE_PATH
+ROLLUP_STORE_PATH = os.environ.get('ROLLUP_STORE_PATH')
+_rollup_store: Optional[RollupStore] = None
+
+# Upper bound of parallel API requests per fetch, and the length of the
+# time windows a long range is split into so they can be fetched in parallel
+FETCH_MAX_WORKERS = int(os.environ.get('FETCH_MAX_WORKERS', 4))
+FETCH_WINDOW_DAYS = 92
+
+# Long-lived fetch pools: their threads keep their Calendar API service (see
+# clients.get_calendar_service) and its connection from one report to the next.
+# Windows have a pool of their own, as calendar fetches wait for their windows
+_calendar_executor = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS, thread_name_prefix="calendar-fetch")
+_window_executor = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS, thread_name_prefix="window-fetch")
+# Default of Calendar.query_pushdown: let the API pre-select events by title (q=)
+TITLE_QUERY_PUSHDOWN = os.environ.get('TITLE_QUERY_PUSHDOWN', '').lower() in ('1', 'true', 'yes')
 
 WEEKDAYS_ORDERED = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
 
@@ -35,6 +53,27 @@ WEEKDAY_ALIASES = {
 _has_shown_calendar_id_help = False 
 
 
+def get_event_store() -> Optional[EventStore]:
+    """
+    To open the shared event store on first use, if EVENT_STORE_PATH is set
+    """
+    global _event_store
+    if _event_store is None and EVENT_STORE_PATH:
+        _event_store = EventStore(EVENT_STORE_PATH)
+    return _event_store
+
+
+def get_rollup_store() -> Optional[RollupStore]:
+    """
+    To open the shared rollup store on first use, if both
+    ROLLUP_STORE_PATH and EVENT_STORE_PATH are set
+    """
+    global _rollup_store
+    if _rollup_store is None and ROLLUP_STORE_PATH and get_event_store() is not None:
+        _rollup_store = RollupStore(ROLLUP_STORE_PATH)
+    return _rollup_store
+
+
 class User:
     def __init__(self, name: str, country_code: str,  weekly_contract_hours: float, contract_working_weekdays: List[str]):
         self.name = name
@@ -112,60 +151,179 @@ class User:
         print(" • A list of specific days (e.g. Mon Tue Fri)")
         print("------------------------------------------------------------")
         while True:
-            user_input = input("> ").lower().strip()
-            normalized = user_input.replace(',', ' ')
-            normalized = re.sub(r'[–—-]', '-', normalized)
-            normalized = re.sub(r'\s*-\s*', '-', normalized)
-            entries = normalized.split()
-            all_valid = True
-            selected_days = []
-            for entry in entries:
-                if '-' in entry:
-                    parts = entry.split('-')
-                    if len(parts) != 2:
-                        all_valid = False
-                        break
-                    start = WEEKDAY_ALIASES.get(parts[0])
-                    end = WEEKDAY_ALIASES.get(parts[1])
-                    if not start or not end:
-                        all_valid = False
-                        break
-                    start_index = WEEKDAYS_ORDERED.index(start)
-                    end_index = WEEKDAYS_ORDERED.index(end)
-                    if start_index <= end_index:
-                        selected_days.extend(range(start_index, end_index + 1))
-                    else:
-                        selected_days.extend(list(range(start_index, 7)) + list(range(0, end_index + 1)))
-                else:
-                    entry_clean = entry.lower().strip()
-                    day = WEEKDAY_ALIASES.get(entry_clean)
-                    if not day:
-                        all_valid = False
-                        break
-                    day_index = WEEKDAYS_ORDERED.index(day)
-                    selected_days.append(day_index)
-
-            if not all_valid:
+            unique_days = User.parse_working_weekdays(input("> "))
+            if unique_days is None:
                 print("Invalid day or range detected. Please use correct day names or ranges (e.g., 'mon', 'wed-fri'). Try again.")
                 continue
-
-            seen = set()
-            unique_days = [d for d in range(7) if d in selected_days and not (d in seen or seen.add(d))]
             if unique_days:
                 return unique_days
             print("Invalid format. Try again using day names (e.g ''Mon Wed Fri') and/or ranges (e.g Wed-Fri)")
 
+    @staticmethod
+    def parse_working_weekdays(user_input: str) -> Optional[List[int]]:
+        """
+        To parse working days and ranges (e.g. 'mon-th sa' or 'mo - we sun')
+        into ordered weekday numbers (0 = Monday).
+        Returns None if a day or range is invalid
+        """
+        normalized = user_input.lower().strip().replace(',', ' ')
+        normalized = re.sub(r'[–—-]', '-', normalized)
+        normalized = re.sub(r'\s*-\s*', '-', normalized)
+        entries = normalized.split()
+        selected_days = []
+        for entry in entries:
+            if '-' in entry:
+                parts = entry.split('-')
+                if len(parts) != 2:
+                    return None
+                start = WEEKDAY_ALIASES.get(parts[0])
+                end = WEEKDAY_ALIASES.get(parts[1])
+                if not start or not end:
+                    return None
+                start_index = WEEKDAYS_ORDERED.index(start)
+                end_index = WEEKDAYS_ORDERED.index(end)
+                if start_index <= end_index:
+                    selected_days.extend(range(start_index, end_index + 1))
+                else:
+                    selected_days.extend(list(range(start_index, 7)) + list(range(0, end_index + 1)))
+            else:
+                day = WEEKDAY_ALIASES.get(entry)
+                if not day:
+                    return None
+                selected_days.append(WEEKDAYS_ORDERED.index(day))
+
+        seen = set()
+        return [d for d in range(7) if d in selected_days and not (d in seen or seen.add(d))]
+
     def get_contract_working_weekdays_dates(self, start_date: date, end_date: date) -> Set[date]:
         """
         Return the set of dates between start_date and end_date that fall on contract working weekdays.
         Used to filter holidays that actually fall on working days.
         """
-        all_days = (end_date - start_date).days + 1
-        return {
-            start_date + timedelta(days=i)
-            for i in range(all_days)
-            if (start_date + timedelta(days=i)).weekday() in self.contract_working_weekdays
-        }
+        dates = set()
+        for weekday in set(self.contract_working_weekdays):
+            # Jump straight to the first matching day, then one week at a time
+            day = start_date + timedelta(days=(weekday - start_date.weekday()) % 7)
+            while day <= end_date:
+                dates.add(day)
+                day += timedelta(days=7)
+        return dates
+
+
+def iter_events_by_title(events: Iterable[dict], title_filter: Union[None, str, dict]) -> Iterator[dict]:
+    """
+    To yield the events whose title contains title_filter (not casesensitive),
+    or matches its include/exclude keywords and regexes (see title_matcher.py),
+    or all of them without a filter
+    """
+    return get_title_matcher(title_filter).filter(events)
+
+
+def split_into_windows(start_date: date, end_date: date, window_days: int, zone: tzinfo = timezone.utc) -> List[Tuple[datetime, datetime]]:
+    """
+    To split the local days start_date..end_date of zone into consecutive
+    [window_start, window_end) aware datetimes of at most window_days days
+    """
+    windows = []
+    window_start = start_date
+    while window_start <= end_date:
+        window_end = min(window_start + timedelta(days=window_days - 1), end_date)
+        windows.append(period_bounds(window_start, window_end, zone))
+        window_start = window_end + timedelta(days=1)
+    return windows
+
+
+def iter_unique_events(window_results: Iterable[Iterable[dict]]) -> Iterator[dict]:
+    """
+    To chain the events of consecutive windows, skipping the events crossing
+    a window boundary the second time they are returned
+    """
+    seen_ids = set()
+    for window_events in window_results:
+        for event in window_events:
+            event_id = event.get('id')
+            if event_id is not None:
+                if event_id in seen_ids:
+                    continue
+                seen_ids.add(event_id)
+            yield event
+
+
+def fetch_snapshots(calendars: List['Calendar'], start_date: date, end_date: date) -> Tuple[List['EventSnapshot'], Dict[str, float], int]:
+    """
+    To fetch the period snapshots of several calendars on the shared calendar fetch pool.
+    The windows of calendars whose service fetches many windows at once
+    (the async_calendar backend) are all fetched in one go instead.
+    Returns the snapshots in the order of calendars, the seconds each
+    calendar took by calendar_id (close to 0 when already cached) and the
+    API pages requested by this call, not by concurrent ones for the same snapshots
+    """
+    prefetched = _prefetch_windows(calendars, start_date, end_date)
+
+    def timed_snapshot(calendar):
+        started = clock.perf_counter()
+        window_events, pages, seconds = prefetched.get(id(calendar), (None, 0, 0.0))
+        snapshot, pages = calendar.fetch_snapshot(start_date, end_date, window_events, pages)
+        return snapshot, pages, clock.perf_counter() - started + seconds
+
+    results = list(_calendar_executor.map(timed_snapshot, calendars))
+    timings = {}
+    for calendar, (_, _, seconds) in zip(calendars, results):
+        timings[calendar.calendar_id] = timings.get(calendar.calendar_id, 0.0) + seconds
+    return [snapshot for snapshot, _, _ in results], timings, sum(pages for _, pages, _ in results)
+
+
+def _prefetch_windows(calendars: List['Calendar'], start_date: date, end_date: date) -> Dict[int, tuple]:
+    """
+    To fetch the period windows of the calendars whose service has fetch_many
+    concurrently, one fetch_many call per service. Calendars with an event
+    store or a snapshot of the period are left out.
+    Returns (window events, pages requested, seconds) by id(calendar)
+    Raises the CalendarFetchError of the first calendar that failed
+    """
+    groups: Dict[int, Tuple[object, List['Calendar']]] = {}
+    for calendar in {id(calendar): calendar for calendar in calendars}.values():
+        service = calendar.get_service()
+        if calendar.event_store is None and hasattr(service, 'fetch_many') and not calendar.has_snapshot(start_date, end_date):
+            groups.setdefault(id(service), (service, []))[1].append(calendar)
+    prefetched = {}
+    for service, group in groups.values():
+        started = clock.perf_counter()
+        # Reading the time zones may call the API too
+        calendar_windows = list(_calendar_executor.map(lambda calendar: calendar.get_windows(start_date, end_date), group))
+        # Stats of this fetch alone, so concurrent fetches don't add to its pages
+        calendar_stats = [FetchStats() for _ in group]
+        windows, window_stats = [], []
+        for own_windows, stats in zip(calendar_windows, calendar_stats):
+            windows.extend(own_windows)
+            window_stats.extend([stats] * len(own_windows))
+        results = iter(service.fetch_many(windows, window_stats))
+        seconds = clock.perf_counter() - started
+        for calendar, stats in zip(group, calendar_stats):
+            calendar.fetch_stats.merge(stats)
+        for calendar, own_windows, stats in zip(group, calendar_windows, calendar_stats):
+            window_events = [next(results) for _ in own_windows]
+            for result in window_events:
+                if isinstance(result, CalendarFetchError):
+                    raise result
+            # Every page is one recorded request, retries aren't
+            prefetched[id(calendar)] = (window_events, stats.requests, seconds)
+    return prefetched
+
+
+def count_weekdays(start_date: date, end_date: date, weekdays) -> int:
+    """
+    To count the days between start_date and end_date (inclusive) falling on
+    the given weekdays (0 = Monday) without walking the period day by day:
+    every full week has each weekday once, only the leftover days are checked
+    """
+    if start_date > end_date:
+        return 0
+    weekdays = set(weekdays)
+    full_weeks, leftover_days = divmod((end_date - start_date).days + 1, 7)
+    first_weekday = start_date.weekday()
+    leftover = sum(1 for i in range(leftover_days) if (first_weekday + i) % 7 in weekdays)
+    return full_weeks * len(weekdays) + leftover
 
 
 def get_user_data() -> User:
@@ -177,7 +335,8 @@ def get_user_data() -> User:
 
 def get_and_validate_calendar_id(
         prompt_text: str = None,
-        show_help_if_first_time: bool = True
+        show_help_if_first_time: bool = True,
+        service=None
         ) -> str:
     """
     Helper to get calendar ID from user input with:
@@ -189,6 +348,7 @@ def get_and_validate_calendar_id(
     Args to show instructions only the first time:
         prompt_text: str = None,
         show_help_if_first_time: bool = True
+    service: Calendar API service to validate with (shared one by default)
 
     Returns:
         str or None: Validated calendar ID, or None if user exits.
@@ -212,6 +372,8 @@ def get_and_validate_calendar_id(
         _has_shown_calendar_id_help = True  # Mark as shown
     if prompt_text:
         print(prompt_text)
+    if service is None:
+        service = get_calendar_service()
 
     while True:
         calendar_id = input("> ").strip()
@@ -221,37 +383,17 @@ def get_and_validate_calendar_id(
         if not (re.match(calendar_id_pattern, calendar_id) or calendar_id.lower() == "primary"):
             print("😳 Invalid format. Please enter a valid Calendar ID (not a full URL or @gmail address).\n")
             continue
-        # Check access by trying to fetch one event with details within next 7 days
-        now = datetime.now(timezone.utc)
-        time_min = now.isoformat()
-        time_max = (now + timedelta(days=30)).isoformat()
-        try:
-            CALENDAR_SERVICE.calendars().get(calendarId=calendar_id).execute()
-            events_result = CALENDAR_SERVICE.events().list(
-                calendarId=calendar_id,
-                timeMin=time_min,
-                timeMax=time_max,
-                maxResults=1,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
-
-            events = events_result.get('items', [])
-            if events:
-                event = events[0]
-                # Check if event has a 'summary' or other detail fields visible
-                if 'summary' in event and event['summary']:
-                    return calendar_id
-                else:
-                    print("🙈 Your calendar access is limited to free/busy info only, no event details.\n"
-                          "Please ensure the service account has 'See all event details' permission.")
-            else:
-                # No events found but access OK (empty calendar)
-                return calendar_id
-
-        except Exception as e:
+        # Check access with a single request, which also returns the calendar's
+        # time zone and access level (cached, so it isn't asked for again)
+        metadata = fetch_calendar_metadata(service, [calendar_id], use_cached_errors=False)[calendar_id]
+        if metadata.can_read_details:
+            return calendar_id
+        if metadata.is_valid:
+            print("🙈 Your calendar access is limited to free/busy info only, no event details.\n"
+                  "Please ensure the service account has 'See all event details' permission.")
+        else:
             print(f"🤔 Could not access this calendar.\n")
-            if "notFound" in str(e) or "403" in str(e):
+            if metadata.status in (403, 404) or "notFound" in metadata.error:
                 print("""👉  Please make sure:
 - The calendar ID exists.
 - You've shared this calendar with the service account:
@@ -261,11 +403,68 @@ def get_and_validate_calendar_id(
             print("Try again or type 'exit' to cancel.\n")
 
 
+SNAPSHOT_EVENT_KEYS = ("id", "summary", "start", "end")
+
+
+def compact_event(event: dict) -> dict:
+    """
+    To keep only the event fields the report calculations read,
+    so snapshots don't hold descriptions, attendees, etc.
+    """
+    return {key: event[key] for key in SNAPSHOT_EVENT_KEYS if key in event}
+
+
+class EventSnapshot:
+    """
+    Immutable, in-memory copy of the title filtered events of one calendar
+    for one period, fetched once and shared by every calculation of a report
+    """
+    def __init__(self, calendar_id: str, start_date: date, end_date: date, events: List[dict], pages_requested: int,
+                 events_seen: int = 0):
+        self.calendar_id = calendar_id
+        self.start_date = start_date
+        self.end_date = end_date
+        self.events: Tuple[dict, ...] = tuple(events)
+        self.pages_requested = pages_requested
+        # Events of the period read before the title filter
+        self.events_seen = events_seen
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+
 class Calendar:
-    def __init__(self, calendar_id: str, title_filter: Optional[str] = None):
+    def __init__(
+            self,
+            calendar_id: str,
+            title_filter: Union[None, str, dict] = None,
+            event_store: Optional[EventStore] = None,
+            service=None,
+            time_zone: Optional[str] = None,
+            query_pushdown: Optional[bool] = None
+    ):
         self.calendar_id = calendar_id
         self.events: List[dict] = []
         self.title_filter = title_filter
+        # Compiled once, raises ValueError for an invalid filter
+        self.title_matcher = get_title_matcher(title_filter)
+        # Send the title keyword along as q= so the API only returns candidate events.
+        # Off by default: the API searches whole words (of descriptions too), not substrings,
+        # so events whose title only contains the keyword inside a word would be missed
+        self.query_pushdown = TITLE_QUERY_PUSHDOWN if query_pushdown is None else query_pushdown
+        self.event_store = event_store if event_store is not None else get_event_store()
+        # Calendar API service, the shared lazily built one when not injected
+        self.service = service
+        # IANA name like 'Europe/Vienna', read from the calendar metadata when not given
+        self.time_zone = time_zone
+        self._zone: Optional[tzinfo] = None
+        self.pages_requested = 0
+        self.fetch_stats = FetchStats()
+        self._pages_lock = threading.Lock()
+        self._snapshots: Dict[tuple, EventSnapshot] = {}
+        # One lock per snapshot key, so concurrent reports (report server)
+        # fetching the same period wait for a single fetch
+        self._snapshot_locks: Dict[tuple, threading.Lock] = {}
 
     @classmethod
     def from_input(calendar_class, is_first_time=False, prompt_text=None):
@@ -278,50 +477,240 @@ class Calendar:
                 raise KeyboardInterrupt("Calendar ID input cancelled by user.")                
             return calendar_class(calendar_id)
 
+    def get_service(self):
+        """
+        To return the injected Calendar API service or the shared one
+        """
+        return self.service if self.service is not None else get_calendar_service()
+
+    def get_zone(self) -> tzinfo:
+        """
+        To return the calendar's time zone, in which report days start and end.
+        Raises CalendarFetchError if the calendar metadata can't be read,
+        so a transient failure isn't remembered as a UTC calendar
+        """
+        if self._zone is None:
+            if self.time_zone is None:
+                metadata = fetch_calendar_metadata(self.get_service(), [self.calendar_id])[self.calendar_id]
+                if not metadata.is_valid:
+                    raise CalendarFetchError(f"Could not read the time zone of {self.calendar_id}: {metadata.error}", metadata.status)
+                self.time_zone = metadata.time_zone or 'UTC'
+            self._zone = get_zone(self.time_zone)
+        return self._zone
+
+    def sync_event_store(self, stats: Optional[FetchStats] = None):
+        """
+        To bring the event store copy of this calendar up to date
+        (stats: recording the requests instead of fetch_stats)
+        """
+        pages = self.event_store.sync(self.get_service(), self.calendar_id, self.fetch_stats if stats is None else stats)
+        with self._pages_lock:
+            self.pages_requested += pages
+
+    def clear_snapshots(self):
+        """
+        To drop the period snapshots, so the next report reads the events again
+        """
+        self._snapshots.clear()
+        self._snapshot_locks.clear()
+
     def fetch_events_by_period(self, start_date: date, end_date: date) -> List[dict]:
         """
         Fetches events from the calendar using its ID
         within a given period of time.
+        (materialised version of iter_events_by_period)
+        Raises CalendarFetchError rather than returning partial events
         """
-        try:
-            expanded_start = start_date - timedelta(days=1)
-            time_min = datetime.combine(expanded_start, time.min).isoformat() + 'Z'
-            time_max = datetime.combine(end_date, time.max).isoformat() + 'Z'
-            all_events = []
-            page_token = None
-            while True:
-                events_result = CALENDAR_SERVICE.events().list(
-                    calendarId=self.calendar_id,
-                    timeMin=time_min,
-                    timeMax=time_max,
-                    singleEvents=True,
-                    orderBy='startTime',
-                    pageToken=page_token
-                ).execute()
-                events = events_result.get('items', [])
-                all_events.extend(events)
-                page_token = events_result.get('nextPageToken')
-                if not page_token:
-                    break
-
-            self.events = all_events
-        except Exception as e:
-            print(f"Error fetching events: {e}")
+        self.events = list(self.iter_events_by_period(start_date, end_date))
         return self.events
 
-    def filter_events_by_title(self, title_filter: Optional[str] = None) -> List[dict]:
+    def iter_events_by_period(self, start_date: date, end_date: date, query: Optional[str] = None,
+                              stats: Optional[FetchStats] = None) -> Iterator[dict]:
+        """
+        To stream the events of the period page by page, so callers can
+        consume them without holding the whole range in memory.
+        The period runs from start_date 00:00 to end_date 24:00 in the
+        calendar's time zone, without any padding.
+        With an event store the calendar is synced incrementally
+        and the period is read from the local copy instead.
+        query: free text the API pre-selects events with (q=), ignored
+        with the event store, which keeps every event of the calendar
+        stats: recording the requests instead of fetch_stats
+        """
+        zone = self.get_zone()
+        if isinstance(start_date, datetime):
+            start_date = start_date.date()
+        if isinstance(end_date, datetime):
+            end_date = end_date.date()
+        if self.event_store is not None:
+            self.sync_event_store(stats)
+            yield from self.event_store.iter_query(self.calendar_id, *period_bounds(start_date, end_date, zone))
+            return
+        windows = split_into_windows(start_date, end_date, FETCH_WINDOW_DAYS, zone)
+        yield from iter_unique_events(self._iter_window_results(windows, query, stats))
+
+    def get_windows(self, start_date: date, end_date: date) -> List[Tuple[str, str, str, Optional[str]]]:
+        """
+        To return the (calendar_id, timeMin, timeMax, q) windows iter_events_by_period
+        fetches the period in, for services fetching many windows at once
+        """
+        windows = split_into_windows(start_date, end_date, FETCH_WINDOW_DAYS, self.get_zone())
+        query = self.get_server_query()
+        return [(self.calendar_id, window_start.isoformat(), window_end.isoformat(), query)
+                for window_start, window_end in windows]
+
+    def _iter_window_results(self, windows: List[Tuple[datetime, datetime]], query: Optional[str] = None,
+                             stats: Optional[FetchStats] = None) -> Iterator[Iterable[dict]]:
+        """
+        To yield the events of each window in window order.
+        A single window is streamed page by page, several windows are
+        fetched in parallel, FETCH_MAX_WORKERS windows at a time so only
+        those are held in memory, and merged back in window order so
+        the result does not depend on timing
+        """
+        if len(windows) == 1:
+            yield self._iter_window(*windows[0], query, stats)
+            return
+        for i in range(0, len(windows), FETCH_MAX_WORKERS):
+            batch = windows[i:i + FETCH_MAX_WORKERS]
+            yield from _window_executor.map(lambda window: list(self._iter_window(*window, query, stats)), batch)
+
+    def _iter_window(self, window_start: datetime, window_end: datetime, query: Optional[str] = None,
+                     stats: Optional[FetchStats] = None) -> Iterator[dict]:
+        """
+        To page through the events of one time window
+        (timeMin/timeMax are RFC3339 with the calendar's UTC offset)
+        """
+        time_min = window_start.isoformat()
+        time_max = window_end.isoformat()
+        page_token = None
+        service = self.get_service()
+        # q is only sent when set, so requests without it stay unchanged
+        query_params = {"q": query} if query else {}
+        while True:
+            events_result = list_events_page(
+                service,
+                self.fetch_stats if stats is None else stats,
+                calendarId=self.calendar_id,
+                timeMin=time_min,
+                timeMax=time_max,
+                singleEvents=True,
+                orderBy='startTime',
+                pageToken=page_token,
+                **query_params
+            )
+            with self._pages_lock:
+                self.pages_requested += 1
+            yield from events_result.get('items', [])
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                break
+
+    def filter_events_by_title(self, title_filter: Union[None, str, dict] = None) -> List[dict]:
         """
-        Filters events by title keyword if provided
+        Filters events by title keyword (or include/exclude filter) if provided
         (not casesensitive)
         """
         if not title_filter:
             return self.events
+        return list(iter_events_by_title(self.events, title_filter))
 
-        filtered_events = [
-            event for event in self.events
-            if title_filter.lower() in event.get("summary", "").lower()
-        ]
-        return filtered_events
+    def iter_filtered_events(self, start_date: date, end_date: date) -> Iterator[dict]:
+        """
+        To stream the period events matching the title filter straight
+        from the API, without a snapshot
+        """
+        return self.title_matcher.filter(self.iter_events_by_period(start_date, end_date, self.get_server_query()))
+
+    def get_server_query(self) -> Optional[str]:
+        """
+        To return the q= text pushed down to the API, if enabled and the
+        filter allows it. The local filter still runs on what comes back
+        """
+        return self.title_matcher.server_query if self.query_pushdown else None
+
+    def _snapshot_key(self, start_date: date, end_date: date) -> tuple:
+        start_day = start_date.date() if isinstance(start_date, datetime) else start_date
+        end_day = end_date.date() if isinstance(end_date, datetime) else end_date
+        return self.calendar_id, start_day, end_day, self.title_matcher.key
+
+    def has_snapshot(self, start_date: date, end_date: date) -> bool:
+        return self._snapshot_key(start_date, end_date) in self._snapshots
+
+    def get_snapshot(self, start_date: date, end_date: date, window_events: Optional[List[List[dict]]] = None,
+                     pages_requested: int = 0) -> EventSnapshot:
+        """
+        To return the title filtered events of the period as a snapshot,
+        only calling the API the first time a (calendar_id, period) is requested
+        (dates and datetimes of the same day share one snapshot)
+        window_events: the events of the get_windows() windows, already fetched
+        in pages_requested pages (see fetch_snapshots), instead of calling the API
+        """
+        return self.fetch_snapshot(start_date, end_date, window_events, pages_requested)[0]
+
+    def fetch_snapshot(self, start_date: date, end_date: date, window_events: Optional[List[List[dict]]] = None,
+                       pages_requested: int = 0) -> Tuple[EventSnapshot, int]:
+        """
+        To return the snapshot of get_snapshot() and the API pages this call
+        requested for it, 0 when it was built by an earlier or concurrent call
+        """
+        key = self._snapshot_key(start_date, end_date)
+        _, start_day, end_day, _ = key
+        if window_events is not None:
+            with self._pages_lock:
+                self.pages_requested += pages_requested
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None:
+            return snapshot, pages_requested
+        with self._pages_lock:
+            lock = self._snapshot_locks.setdefault(key, threading.Lock())
+        with lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                return snapshot, pages_requested
+            events_seen = 0
+
+            def counted(events):
+                nonlocal events_seen
+                for event in events:
+                    events_seen += 1
+                    yield event
+
+            # Requests of this fetch alone, so concurrent fetches of other
+            # periods don't add to its pages
+            stats = FetchStats()
+            try:
+                # Only the matching events are kept, the others are dropped page by page.
+                # A failed fetch raises instead of caching an incomplete snapshot
+                if window_events is not None:
+                    period_events = iter_unique_events(window_events)
+                else:
+                    period_events = self.iter_events_by_period(start_day, end_day, self.get_server_query(), stats)
+                events = [compact_event(event) for event in self.title_matcher.filter(counted(period_events))]
+            finally:
+                self.fetch_stats.merge(stats)
+            if window_events is None:
+                # Every page is one recorded request, retries aren't
+                pages_requested = stats.requests
+            snapshot = EventSnapshot(self.calendar_id, start_day, end_day, events, pages_requested, events_seen)
+            self._snapshots[key] = snapshot
+            return snapshot, pages_requested
+
+
+@dataclass(slots=True)
+class Shift:
+    """
+    One worked shift, clipped to the report range.
+    All-day shifts keep their raw 'YYYY-MM-DD' start and end.
+    started_earlier: the shift began before the report range, so its
+    worked day belongs to an earlier report
+    """
+    title: str
+    start: Union[datetime, str]
+    end: Union[datetime, str]
+    duration: float
+    all_day: bool
+    started_earlier: bool = False
 
 
 class WorkCalendar(Calendar):
@@ -344,24 +733,34 @@ class WorkCalendar(Calendar):
         """
         To fetch the period filtered events of this instance
         and filters them by title if requested
+        (served from the period snapshot after the first fetch)
         """
-        self.fetch_events_by_period(start_date, end_date)
-        return self.filter_events_by_title(self.title_filter)
+        return self.get_snapshot(start_date, end_date).events
 
-    def get_shifts(self, start_date, end_date, all_day_policy: str = "omit") -> list[dict]:
+    def get_shifts(self, start_date, end_date, all_day_policy: str = "omit", events: Optional[Iterable[dict]] = None) -> List[Shift]:
         """
         Fetches filtered events to return a list of shifts
         that fall within the [start_date, end_date] range
         with parsed start, end, duration.
         all_day_policy (str): Determines how to handle all-day events
             - "omit" (default): Skip all-day event
-            - "8hr": Count all-day events as 8-hour shifts
-            - "24hr": Count all-day events as 24-hour shifts
+            - "8hr": Count all-day events as 8-hour shifts, on their first day
+            - "24hr": Count all-day events as 24-hour shifts, on their first day
+        (materialised version of iter_shifts)
+        """
+        return list(self.iter_shifts(start_date, end_date, all_day_policy, events))
+
+    def iter_shifts(self, start_date, end_date, all_day_policy: str = "omit", events: Optional[Iterable[dict]] = None) -> Iterator[Shift]:
         """
-        range_start = datetime.combine(start_date, time.min)
-        range_end = datetime.combine(end_date, time.max)
-        events = self.fetch_filtered_events(range_start, range_end)
-        shifts = []
+        To yield the shifts of the period one by one from events,
+        by default the filtered events of the period snapshot
+        (pass iter_filtered_events() to stream them from the API instead)
+        """
+        zone = self.get_zone()
+        range_start, range_end = period_bounds(start_date, end_date, zone)
+        first_day, last_day = range_start.date(), (range_end - timedelta(days=1)).date()
+        if events is None:
+            events = self.fetch_filtered_events(first_day, last_day)
         for event in events:
             start_info = event.get("start", {})
             end_info = event.get("end", {})
@@ -371,49 +770,110 @@ class WorkCalendar(Calendar):
             if is_all_day:
                 if all_day_policy == "omit":
                     continue
+                try:
+                    event_first_day = date.fromisoformat(shift_raw_start)
+                    event_last_day = date.fromisoformat(shift_raw_end) - timedelta(days=1)
+                except ValueError:
+                    continue
+                # Counted whole on its first day, so the reports of consecutive periods add up
+                if not first_day <= event_first_day <= last_day:
+                    continue
                 hours = 8.0 if all_day_policy == "8hr" else 24.0
-                shifts.append({
-                    "title": event.get("summary", ""),
-                    "start": shift_raw_start,
-                    "end": shift_raw_end,
-                    "duration": hours,
-                    "all_day": True
-                })
+                yield Shift(event.get("summary", ""), shift_raw_start, shift_raw_end, hours, True)
                 continue
             try:
-                shift_start = parse(shift_raw_start).replace(tzinfo=None)
-                shift_end = parse(shift_raw_end).replace(tzinfo=None)
+                shift_start = to_zone(parse_timestamp(shift_raw_start), zone)
+                shift_end = to_zone(parse_timestamp(shift_raw_end), zone)
                 if shift_end <= shift_start:
                     continue
             except Exception:
                 continue
-            if shift_end <= range_start or shift_start >= range_end:
+            clipped = clip(shift_start, shift_end, range_start, range_end)
+            if clipped is None:
                 continue
-            clipped_start = max(shift_start, range_start)
-            clipped_end = min(shift_end, range_end)
-            duration = (clipped_end - clipped_start).total_seconds() / 3600
-            shifts.append({
-                "title": event.get("summary", ""),
-                "start": clipped_start,
-                "end": clipped_end,
-                "duration": duration,
-                "all_day": False
-                })
-        return shifts
-
-    def calculate_worked_hours(self, start_date, end_date, all_day_policy="omit") -> float:
-        shifts = self.get_shifts(start_date, end_date, all_day_policy)
-        return sum(shift["duration"] for shift in shifts)
+            clipped_start, clipped_end = clipped
+            yield Shift(event.get("summary", ""), clipped_start, clipped_end, hours_between(clipped_start, clipped_end), False,
+                        instant(shift_start) < instant(range_start))
+
+    def calculate_worked_hours(self, start_date, end_date, all_day_policy="omit", deduplicate: bool = True) -> float:
+        """
+        To return the worked hours, time covered by overlapping shifts
+        counting once unless deduplicate is False
+        """
+        totals = summarise_shifts(self.iter_shifts(start_date, end_date, all_day_policy))
+        return totals.hours if deduplicate else totals.raw_hours
 
     def calculate_worked_days(self, start_date, end_date, all_day_policy: str = "omit") -> int:
         """
         To return the number of unique days with at least one shift worked
         using a set of dates to automatically remove
-        duplicate date objects (shift["start"])
+        duplicate date objects (shift.start)
         """
-        shifts = self.get_shifts(start_date, end_date, all_day_policy)
-        worked_days = {shift["start"].date() for shift in shifts}
-        return len(worked_days)
+        return summarise_shifts(self.iter_shifts(start_date, end_date, all_day_policy)).worked_days
+
+    def stream_worked_totals(self, start_date, end_date, all_day_policy: str = "omit") -> Tuple[float, int]:
+        """
+        To compute (worked hours, worked days) in one pass over the events
+        streamed from the API, without keeping events or shifts in memory
+        (the API returns them in start order, so no sort is needed)
+        """
+        events = self.iter_filtered_events(start_date, end_date)
+        totals = summarise_shifts(self.iter_shifts(start_date, end_date, all_day_policy, events=events), presorted=True)
+        return totals.hours, totals.worked_days
+
+
+@dataclass(slots=True)
+class ShiftTotals:
+    """
+    hours: worked hours, time covered by several shifts counting once
+    raw_hours: plain sum of the shift durations
+    overlap_hours_by_day: hours counted more than once in raw_hours, per day
+    """
+    hours: float
+    raw_hours: float
+    worked_days: int
+    overlap_hours_by_day: Dict[date, float]
+
+    @property
+    def overlap_hours(self) -> float:
+        return self.raw_hours - self.hours
+
+
+def summarise_shifts(shifts: Iterable[Shift], presorted: bool = False) -> ShiftTotals:
+    """
+    To return the hours and unique worked days of shifts in a single pass.
+    Overlapping or duplicated shifts (e.g. the same shift in two calendars,
+    or a meeting inside a shift) are merged by a sort and sweep, which
+    is skipped with presorted when shifts come in start order.
+    A shift is worked on the day it starts, so a night shift crossing
+    midnight makes one worked day, in the report of its first night.
+    All-day shifts count for the hours but not for the worked days,
+    as they have no start time
+    """
+    raw_hours = 0.0
+    all_day_hours = 0.0
+    worked_days = set()
+    intervals = []
+    sweep = IntervalSweep()
+    for shift in shifts:
+        raw_hours += shift.duration
+        if shift.all_day:
+            all_day_hours += shift.duration
+            continue
+        if not shift.started_earlier:
+            worked_days.add(shift.start.date())
+        if presorted:
+            sweep.add(shift.start, shift.end)
+        else:
+            intervals.append((shift.start, shift.end))
+    for start, end in sorted(intervals, key=lambda interval: instant(interval[0])):
+        sweep.add(start, end)
+    sweep.finish()
+    overlap_hours_by_day: Dict[date, float] = {}
+    for start, end in sweep.overlaps:
+        for day, segment_start, segment_end in split_by_day(start, end):
+            overlap_hours_by_day[day] = overlap_hours_by_day.get(day, 0.0) + hours_between(segment_start, segment_end)
+    return ShiftTotals(sweep.union_hours + all_day_hours, raw_hours, len(worked_days), overlap_hours_by_day)
 
 
 def get_calendar_data() -> WorkCalendar:
@@ -441,18 +901,20 @@ class VacationCalendar(Calendar):
         """
         To fetch the period filtered events of this instance
         and filters them by title if requested
+        (served from the period snapshot after the first fetch)
         """
-        self.fetch_events_by_period(start_date, end_date)
-        return self.filter_events_by_title(self.title_filter)
+        return self.get_snapshot(start_date, end_date).events
 
-    def get_vacation_days(self, start_date: date, end_date: date) -> set:
+    def get_vacation_days(self, start_date: date, end_date: date, events: Optional[Iterable[dict]] = None) -> set:
         """
         To calculate the number of vacation days between start_date and end_date,
         from filtered events, clipping any multi-day events to stay within bounds.
         clipped_start = max(date_start, start_date) - clip up to start_date if event starts earlier
         clipped_end = min(date_end, end_date) - clip down to end_date if event ends later
+        events: by default the filtered events of the period snapshot
         """
-        vacation_events = self.fetch_filtered_events(start_date, end_date)
+        vacation_events = self.fetch_filtered_events(start_date, end_date) if events is None else events
+        zone = self.get_zone()
         vacation_days = set()
         for vacation_event in vacation_events:
             start_info = vacation_event.get("start", {})
@@ -460,10 +922,15 @@ class VacationCalendar(Calendar):
             start_str = start_info.get("dateTime") or start_info.get("date")
             end_str = end_info.get("dateTime") or end_info.get("date")
             try:
-                date_start = parse(start_str).date()
-                date_end = parse(end_str).date()
                 if "date" in start_info and "date" in end_info:
-                    date_end -= timedelta(days=1)
+                    date_start = date.fromisoformat(start_str)
+                    date_end = date.fromisoformat(end_str) - timedelta(days=1)
+                else:
+                    # Timed events: local days of the calendar, the end being exclusive
+                    event_start = to_zone(parse_timestamp(start_str), zone)
+                    event_end = to_zone(parse_timestamp(end_str), zone)
+                    date_start = event_start.date()
+                    date_end = max(event_start, event_end - timedelta(microseconds=1)).date()
                 clipped_start = max(date_start, start_date)
                 clipped_end = min(date_end, end_date)
                 if clipped_start <= clipped_end:
@@ -487,25 +954,23 @@ def get_vacation_calendar() -> VacationCalendar:
 
 
 class HolidayCalendar:
-    def __init__(self, country_code: str):
+    def __init__(self, country_code: str, subdivision: Optional[str] = None, holiday_index: Optional[HolidayIndex] = None):
         self.country_code = country_code
+        self.subdivision = subdivision
         self.holidays: List[Dict[str, date]] = []
+        # Shared by every HolidayCalendar of the process unless one is given
+        self.holiday_index = holiday_index if holiday_index is not None else get_holiday_index()
 
     def fetch_holidays(self, start_date: date, end_date: date) -> List[Dict[str, any]]:
         """
         To fetch the official public holidays between start_date and 
-        end_date for the given country
-        """
-        all_holidays = holidays.country_holidays(self.country_code)
-        included_day = start_date
-        self.holidays = []
-        while included_day <= end_date:
-            if included_day in all_holidays:
-                self.holidays.append({
-                    "date": included_day,
-                    "title": all_holidays[included_day]
-                })
-            included_day += timedelta(days=1)
+        end_date for the given country (and subdivision if set)
+        from the holiday index, which expands each year only once
+        """
+        self.holidays = [
+            {"date": holiday_date, "title": title}
+            for holiday_date, title in self.holiday_index.between(self.country_code, start_date, end_date, self.subdivision)
+        ]
         return self.holidays
     
     def count_holidays(self) -> int:
@@ -528,8 +993,23 @@ class Report:
             holiday_calendar: 'HolidayCalendar',
             start_date: date,
             end_date: date,
-            all_day_policy: str = "omit"
+            all_day_policy: str = "omit",
+            service=None,
+            reuse_snapshots: bool = False
     ):
+        """
+        service: optional Calendar API service used by both calendars
+        instead of the shared one (e.g. a stand-in for offline runs)
+        reuse_snapshots: keep the snapshots the calendars already hold
+        (e.g. the reports of one batch run), by default they are dropped
+        so the report reads the current events
+        """
+        if service is not None:
+            work_calendar.service = service
+            vacation_calendar.service = service
+        if not reuse_snapshots:
+            work_calendar.clear_snapshots()
+            vacation_calendar.clear_snapshots()
         self.user = user
         self.work_calendar = work_calendar
         self.vacation_calendar = vacation_calendar
@@ -537,38 +1017,90 @@ class Report:
         self.start_date = start_date
         self.end_date = end_date
         self.all_day_policy = all_day_policy
-        # Fetch events and holidays once for the period
-        self.work_calendar.fetch_filtered_events(start_date, end_date)
-        self.vacation_calendar.fetch_filtered_events(start_date, end_date)
-        self.holiday_calendar.fetch_holidays(start_date, end_date)
-        self.shifts = self.work_calendar.get_shifts(start_date, end_date, all_day_policy)
+        # Stage timings and counters, see instrumentation.py
+        self.metrics = Metrics({
+            "user": user.name, "start_date": start_date.isoformat(), "end_date": end_date.isoformat()
+        })
+        with profiled(f"report-{user.name}-{start_date.isoformat()}-{end_date.isoformat()}"):
+            self._build(start_date, end_date, all_day_policy)
+        if metrics_enabled():
+            # The figures are computed now so that their time is part of the record
+            self.to_dict()
+            self.metrics.emit()
+
+    def _build(self, start_date: date, end_date: date, all_day_policy: str):
+        metrics = self.metrics
+        # Fetch events and holidays once for the period, every later
+        # calculation reads the calendar snapshots instead of the API.
+        # Both calendars are fetched in parallel while the holidays are computed
+        calendars = list({id(c): c for c in (self.work_calendar, self.vacation_calendar)}.values())
+        bytes_before = sum(c.fetch_stats.bytes for c in calendars)
+        def timed_holidays():
+            started = clock.perf_counter()
+            self.holiday_calendar.fetch_holidays(start_date, end_date)
+            return clock.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=1) as holiday_executor:
+            holidays_future = holiday_executor.submit(timed_holidays)
+            with metrics.timer("fetch"):
+                snapshots, self.fetch_timings, self.api_pages_requested = fetch_snapshots(calendars, start_date, end_date)
+            self.fetch_timings[f"holidays:{self.holiday_calendar.country_code}"] = holidays_future.result()
+        metrics.add_time("holidays", self.fetch_timings[f"holidays:{self.holiday_calendar.country_code}"])
+        # The snapshots received, as the calendars' own may be cleared meanwhile
+        received = {id(calendar): snapshot for calendar, snapshot in zip(calendars, snapshots)}
+        self.work_snapshot = received[id(self.work_calendar)]
+        self.vacation_snapshot = received[id(self.vacation_calendar)]
+        metrics.count("api_pages", self.api_pages_requested)
+        metrics.count("api_bytes", sum(c.fetch_stats.bytes for c in calendars) - bytes_before)
+        metrics.count("events_seen", sum(snapshot.events_seen for snapshot in snapshots))
+        metrics.count("events_matched", sum(len(snapshot) for snapshot in snapshots))
+        with metrics.timer("shifts"):
+            self.shifts = self.work_calendar.get_shifts(start_date, end_date, all_day_policy, self.work_snapshot.events)
+        metrics.count("shifts", len(self.shifts))
+        with metrics.timer("shift_totals"):
+            self.shift_totals = summarise_shifts(self.shifts)
         # Get sets of vacation and holiday days
-        self.vacation_days: Set[date] = self.vacation_calendar.get_vacation_days(start_date, end_date)
-        self.holiday_days: Set[date] = {h['date'] for h in self.holiday_calendar.holidays}
-        # Calculate overlapping holiday days within vacation days
-        self.overlapping_days: Set[date] = self.vacation_days & self.holiday_days
-        # Adjust vacation days by removing overlapping holidays
-        self.adjusted_vacation_days: Set[date] = self.vacation_days - self.overlapping_days
-        # FIXED: Only count holidays that are working days AND not overlapping with vacation
-        contract_workdays = self.user.get_contract_working_weekdays_dates(start_date, end_date)
-        self.adjusted_holiday_days: Set[date] = {
-            day for day in self.holiday_days
-            if day in contract_workdays and day not in self.vacation_days
-        }
+        with metrics.timer("vacation_days"):
+            self.vacation_days: Set[date] = self.vacation_calendar.get_vacation_days(start_date, end_date, self.vacation_snapshot.events)
+        with metrics.timer("days_off"):
+            self.holiday_days: Set[date] = {h['date'] for h in self.holiday_calendar.holidays}
+            # Calculate overlapping holiday days within vacation days
+            self.overlapping_days: Set[date] = self.vacation_days & self.holiday_days
+            # Adjust vacation days by removing overlapping holidays
+            self.adjusted_vacation_days: Set[date] = self.vacation_days - self.overlapping_days
+            # FIXED: Only count holidays that are working days AND not overlapping with vacation
+            contract_weekdays = set(self.user.contract_working_weekdays)
+            self.adjusted_holiday_days: Set[date] = {
+                day for day in self.holiday_days
+                if day.weekday() in contract_weekdays and day not in self.vacation_days
+            }
+        self._rollup: Optional[DailyRollup] = None
+
+    def get_rollup(self) -> DailyRollup:
+        """
+        To return the per-day breakdown of this report, from which the
+        figures of any sub-period are read without fetching again
+        """
+        if self._rollup is None:
+            self._rollup = DailyRollup.from_report(self)
+        return self._rollup
+
+    def breakdown(self, bucket: str) -> List[Dict[str, object]]:
+        """
+        To return the to_dict() figures of every month or week of the period
+        """
+        return self.get_rollup().reports(split_period(self.start_date, self.end_date, bucket))
 
     def calculate_expected_working_days(self) -> int:
         """
         To return working days that are not vacation or holiday days.
         """
-        all_days = (self.end_date - self.start_date).days + 1
-        expected_days = 0
-        for i in range(all_days):
-            current_day = self.start_date + timedelta(days=i)
-            weekday = current_day.weekday()
-            if weekday in self.user.contract_working_weekdays:
-                if current_day not in self.adjusted_holiday_days and current_day not in self.adjusted_vacation_days:
-                    expected_days += 1
-        return expected_days
+        contract_weekdays = set(self.user.contract_working_weekdays)
+        days_off = {
+            day for day in self.adjusted_holiday_days | self.adjusted_vacation_days
+            if day.weekday() in contract_weekdays and self.start_date <= day <= self.end_date
+        }
+        return count_weekdays(self.start_date, self.end_date, contract_weekdays) - len(days_off)
     
     def calculate_vacation_days_count(self) -> int:
         """
@@ -591,16 +1123,17 @@ class Report:
 
     def calculate_actual_working_days(self) -> int:
         """
-        To get actual working days as returned by work_calendar.
+        To get actual working days from the shifts of the work calendar.
         Assumes work_calendar handles all filtering.
         """
-        return self.work_calendar.calculate_worked_days(self.start_date, self.end_date)
+        return self.shift_totals.worked_days
 
     def calculate_actual_working_hours(self) -> float:
         """
-        To return the actual worked hours in the period using the calendar.
+        To return the actual worked hours in the period using the calendar,
+        overlapping shifts counting once.
         """
-        return self.work_calendar.calculate_worked_hours(self.start_date, self.end_date, self.all_day_policy)
+        return self.shift_totals.hours
     
     def calculate_expected_working_hours(self) -> float:
         """
@@ -614,6 +1147,30 @@ class Report:
         hours_per_day = self.user.weekly_contract_hours / working_days_per_week
         return round(total_working_days * hours_per_day, 2)
 
+    @timed("figures")
+    def to_dict(self) -> Dict[str, object]:
+        """
+        To return the report figures as plain values (for JSON/CSV output)
+        """
+        expected_hours = round(self.calculate_expected_working_hours(), 2)
+        actual_hours = round(self.calculate_actual_working_hours(), 2)
+        return {
+            "name": self.user.name,
+            "start_date": self.start_date.isoformat(),
+            "end_date": self.end_date.isoformat(),
+            "expected_hours": expected_hours,
+            "actual_hours": actual_hours,
+            "raw_hours": round(self.shift_totals.raw_hours, 2),
+            "overlap_hours": round(self.shift_totals.overlap_hours, 2),
+            "difference": round(actual_hours - expected_hours, 2),
+            "expected_days": self.calculate_expected_working_days(),
+            "actual_days": self.calculate_actual_working_days(),
+            "vacation_days": self.calculate_vacation_days_count(),
+            "holiday_days": self.calculate_holiday_days_count(),
+            "total_days_off": self.calculate_total_days_off(),
+            "api_pages_requested": self.api_pages_requested,
+        }
+
     def print_summary(self):
         """
         to print the hour_report by default
@@ -628,38 +1185,20 @@ class Report:
             self.print_shifts_report()
     
     def print_hours_report(self):
-        print("\n---------------------------------------------------")
-        print(f"Your Working Hours Report: {self.start_date.strftime('%B %Y')}")
-        print("---------------------------------------------------")
-        print(f"👤 Name: {self.user.name}\n")
-        print(f"📊 Report Period: {self.start_date.strftime('%d.%m.%Y')} - {self.end_date.strftime('%d.%m.%Y')}\n")
-        
-        expected_hours = round(self.calculate_expected_working_hours(), 2)
-        actual_hours = round(self.calculate_actual_working_hours(), 2)
-        difference = round(actual_hours - expected_hours, 2)
-
-        if difference > 0:
-            diff_label = f"{abs(difference)} ⬆️ hours above expected"
-        elif difference < 0:
-            diff_label = f"{abs(difference)} ⬇️ hours below expected"
-        else:
-            diff_label = "🎯 exactly on target"
-
-        print(f"⏱️ Expected working hours (based on contract): {expected_hours} hours\n")
-        print(f"✅ Actual worked hours (from Google Calendar): {actual_hours} hours\n")
-        print(f"🔁 Difference: {diff_label}")
-        print("---------------------------------------------------")
+        print_hours_figures(self.to_dict(), self.shift_totals.overlap_hours_by_day)
     
     def print_days_report(self):
-        print("\n>>> Getting your Days Report…\n")
-        print("---------------------------------------------------")
-        print(f"Your Days Report: {self.start_date.strftime('%B %Y')}")
+        print_days_figures(self.to_dict())
+
+    def print_breakdown_report(self, bucket: str):
+        print("\n---------------------------------------------------")
+        print(f"Your {bucket.capitalize()}ly Breakdown")
         print("---------------------------------------------------")
         print(f"👤 Name: {self.user.name}\n")
-        print(f"📊 Report Period: {self.start_date.strftime('%d.%m.%Y')} - {self.end_date.strftime('%d.%m.%Y')}\n")
-        print(f"📅 Expected working days: {self.calculate_expected_working_days()}\n")
-        print(f"✅ Working days: {self.calculate_actual_working_days()}\n")
-        print(f"🏖️ Vacation days: {self.calculate_vacation_days_count()}")
+        for row in self.breakdown(bucket) + [self.to_dict()]:
+            period = f"{date.fromisoformat(row['start_date']).strftime('%d.%m.%Y')} - {date.fromisoformat(row['end_date']).strftime('%d.%m.%Y')}"
+            print(f"📊 {period}: {row['actual_hours']} / {row['expected_hours']} hours ({row['difference']:+}), "
+                  f"{row['actual_days']} / {row['expected_days']} days")
         print("---------------------------------------------------")
 
     def print_shifts_report(self):
@@ -671,13 +1210,94 @@ class Report:
         print(f"📊 Report Period: {self.start_date.strftime('%d.%m.%Y')} - {self.end_date.strftime('%d.%m.%Y')}\n")
 
         for shift in self.shifts:
-            date_str = shift["start"].strftime("%d.%m.%Y")
-            time_range = f" {shift['start'].strftime('%H:%M')} - {shift['end'].strftime('%H:%M')}"
-            duration = round(shift["duration"], 1)
-            print(f"👉 {date_str} {time_range}: {shift['title']} ({duration} hrs)")
+            date_str = shift.start.strftime("%d.%m.%Y")
+            time_range = f" {shift.start.strftime('%H:%M')} - {shift.end.strftime('%H:%M')}"
+            duration = round(shift.duration, 1)
+            print(f"👉 {date_str} {time_range}: {shift.title} ({duration} hrs)")
         print("---------------------------------------------------")
 
 
+def print_hours_figures(row: Dict[str, object], overlap_hours_by_day: Optional[Dict[date, float]] = None):
+    """
+    To print the hours report of a to_dict() row
+    """
+    start_date, end_date = date.fromisoformat(row["start_date"]), date.fromisoformat(row["end_date"])
+    print("\n---------------------------------------------------")
+    print(f"Your Working Hours Report: {start_date.strftime('%B %Y')}")
+    print("---------------------------------------------------")
+    print(f"👤 Name: {row['name']}\n")
+    print(f"📊 Report Period: {start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')}\n")
+
+    difference = row["difference"]
+    if difference > 0:
+        diff_label = f"{abs(difference)} ⬆️ hours above expected"
+    elif difference < 0:
+        diff_label = f"{abs(difference)} ⬇️ hours below expected"
+    else:
+        diff_label = "🎯 exactly on target"
+
+    print(f"⏱️ Expected working hours (based on contract): {row['expected_hours']} hours\n")
+    print(f"✅ Actual worked hours (from Google Calendar): {row['actual_hours']} hours\n")
+    print(f"🔁 Difference: {diff_label}")
+    if overlap_hours_by_day:
+        print(f"\n⚠️ Overlapping shifts counted once ({row['raw_hours']} hours in total):")
+        for day, hours in sorted(overlap_hours_by_day.items()):
+            print(f"   {day.strftime('%d.%m.%Y')}: {round(hours, 2)} hours overlapping")
+    elif row["overlap_hours"]:
+        print(f"\n⚠️ Overlapping shifts counted once: {row['overlap_hours']} of {row['raw_hours']} hours")
+    print("---------------------------------------------------")
+
+
+def print_days_figures(row: Dict[str, object]):
+    """
+    To print the days report of a to_dict() row
+    """
+    start_date, end_date = date.fromisoformat(row["start_date"]), date.fromisoformat(row["end_date"])
+    print("\n>>> Getting your Days Report…\n")
+    print("---------------------------------------------------")
+    print(f"Your Days Report: {start_date.strftime('%B %Y')}")
+    print("---------------------------------------------------")
+    print(f"👤 Name: {row['name']}\n")
+    print(f"📊 Report Period: {start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')}\n")
+    print(f"📅 Expected working days: {row['expected_days']}\n")
+    print(f"✅ Working days: {row['actual_days']}\n")
+    print(f"🏖️ Vacation days: {row['vacation_days']}")
+    print("---------------------------------------------------")
+
+
+def get_stored_rollup(
+        user: User,
+        work_calendar: WorkCalendar,
+        vacation_calendar: VacationCalendar,
+        holiday_calendar: HolidayCalendar,
+        start_date: date,
+        end_date: date,
+        all_day_policy: str = "omit"
+) -> Optional[DailyRollup]:
+    """
+    To return the persisted daily rollup of these calendars and settings,
+    covering at least the period (None without a rollup store).
+    Only the days whose events changed since the last call are recomputed
+    """
+    rollup_store = get_rollup_store()
+    calendars = [work_calendar, vacation_calendar]
+    if rollup_store is None or any(calendar.event_store is None for calendar in calendars):
+        return None
+    for calendar in calendars:
+        calendar.get_zone()
+    key = json.dumps([
+        work_calendar.calendar_id, work_calendar.title_filter, work_calendar.time_zone,
+        vacation_calendar.calendar_id, vacation_calendar.title_filter, vacation_calendar.time_zone,
+        holiday_calendar.country_code.upper(), holiday_calendar.subdivision,
+        sorted(user.contract_working_weekdays), all_day_policy,
+    ], sort_keys=True)
+
+    def build_report(span_start: date, span_end: date) -> Report:
+        return Report(user, work_calendar, vacation_calendar, holiday_calendar, span_start, span_end, all_day_policy)
+
+    return rollup_store.get_rollup(key, user, calendars, start_date, end_date, build_report)
+
+
 """
 Helper and flow methods
 """
@@ -757,6 +1377,12 @@ def main():
                     return
             else:
                 report.print_summary()
+                export = input("\nDo you want to save this report to the working-hours-reports spreadsheet? (yes/no)\n> ").strip().lower()
+                if export in ("yes", "y"):
+                    exporter = SheetsExporter()
+                    exporter.add_report(report)
+                    exporter.flush()
+                    print("📄 Report and shifts saved to Google Sheets.")
 
 
             def run_report_loop(user, work_calendar, vacation_calendar, holiday_calendar, all_day_policy):
@@ -765,17 +1391,24 @@ def main():
                     start_date = input_date("Start date (DD.MM.YYYY):\n> ")
                     end_date = input_date("End date (DD.MM.YYYY):\n> ")
 
-                    new_report = Report(
-                        user=user,
-                        work_calendar=work_calendar,
-                        vacation_calendar=vacation_calendar,
-                        holiday_calendar=holiday_calendar,
-                        start_date=start_date,
-                        end_date=end_date,
-                        all_day_policy=all_day_policy
-                    )
+                    # With a rollup store, re-queries are answered from the stored daily figures
+                    new_report = None
+                    rollup = get_stored_rollup(user, work_calendar, vacation_calendar, holiday_calendar, start_date, end_date, all_day_policy)
+                    if rollup is not None:
+                        row = rollup.to_dict(start_date, end_date)
+                    else:
+                        new_report = Report(
+                            user=user,
+                            work_calendar=work_calendar,
+                            vacation_calendar=vacation_calendar,
+                            holiday_calendar=holiday_calendar,
+                            start_date=start_date,
+                            end_date=end_date,
+                            all_day_policy=all_day_policy
+                        )
+                        row = new_report.to_dict()
                     
-                    if new_report.calculate_actual_working_hours() == 0 or new_report.calculate_actual_working_days() == 0:
+                    if row["actual_hours"] == 0 or row["actual_days"] == 0:
                         print("\n⚠️ No working events found in the selected calendars during this period.")
                         retry = input("Would you like to try a different date range? (yes/no)\n> ").strip().lower()
                         if retry in ("yes", "y"):
@@ -784,8 +1417,13 @@ def main():
                         else:
                             print("\n👋 Thank you for using the Working Hours Analyser. Goodbye!")
                             return 
-                    else:
+                    elif new_report is not None:
                         new_report.print_summary()
+                    else:
+                        print_hours_figures(row)
+                        show_days_report = input("\nDo you want to see your amount of worked & vacation days? (yes/no)\n> ").strip().lower()
+                        if show_days_report in ("yes", "y"):
+                            print_days_figures(row)
 
                     again = input("\nDo you want to generate another report with the SAME CALENDAR(s)? (yes/no): ").strip().lower()
                     if again not in ("yes", "y"):
@@ -795,24 +1433,32 @@ def main():
             while True:
                 print("\nDo you want to:")
                 print("1. Generate another report with the SAME CALENDARS")
-                print("2. Start fresh with NEW CALENDAR(s) *")
-                print("3. Exit")
+                print("2. Break this report down by month or week (no new fetch)")
+                print("3. Start fresh with NEW CALENDAR(s) *")
+                print("4. Exit")
                 choice = input("> ").strip()
 
                 if choice == "1":
                     run_report_loop(user, work_calendar, vacation_calendar, holiday_calendar, all_day_policy)
 
                 elif choice == "2":
+                    bucket = input("Break down by month or week? (month/week)\n> ").strip().lower()
+                    if bucket in ("month", "week"):
+                        report.print_breakdown_report(bucket)
+                    else:
+                        print("Please enter month or week.")
+
+                elif choice == "3":
                     print("\n🔁 Restarting setup...\n")
                     main()  
                     break
 
-                elif choice == "3":
+                elif choice == "4":
                     print("\n👋 Thanks for using Working Hours Analyser. Goodbye!")
                     break
 
                 else:
-                    print("Please enter 1, 2 or 3.")
+                    print("Please enter 1, 2, 3 or 4.")
         except Exception as e:
             # NEW: Global error handler
             print(f"\n😅 Oops, something went wrong: {str(e)}")
@@ -823,5 +1469,6 @@ def main():
             print("\n🔁 Restarting...\n")
 
 
-main()
+if __name__ == "__main__":
+    main()
 
@@ -0,0 +1,281 @@
+"""
+Long-running report service: a local HTTP/JSON API answering reports of
+the users of a batch.py config (its periods are not used), so dashboards
+don't start a process and authenticate for every report.
+
+    python server.py roster.json --port 8080
+
+    GET /report?user=Iliana&start=2025-01-01&end=2025-01-31[&split=month][&all_day_policy=8hr]
+        {"rows": [...]}, the rows of batch.py (Report.to_dict() figures)
+    GET /metrics   requests, errors and p50/p99 latency of the last requests
+    GET /health
+
+What is slow to set up is kept warm between requests: the Google clients
+(one per worker thread), the calendars with the snapshots of the periods
+already fetched, the holiday index and the calendar metadata. Snapshots
+are dropped REPORT_CACHE_SECONDS after a calendar was first read, so
+calendar edits show up; with EVENT_STORE_PATH the refetch is an
+incremental sync. Requests are served by REPORT_SERVER_WORKERS threads.
+With --synthetic the users' calendars are synthetic ones (see
+synthetic_calendar.py), so the service runs fully offline.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time as clock
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+import calendar_api
+from batch import BatchRunner
+from calendar_api import CalendarFetchError, TokenBucket, fetch_calendar_metadata
+from clients import get_calendar_service
+from run import HolidayCalendar, VacationCalendar, WorkCalendar
+
+SERVER_WORKERS = int(os.environ.get("REPORT_SERVER_WORKERS", 8))
+CACHE_SECONDS = float(os.environ.get("REPORT_CACHE_SECONDS", 300))
+# Requests the latency percentiles are computed over
+LATENCY_WINDOW = 10_000
+# Span of the --synthetic calendars
+SYNTHETIC_SPAN = (date(2015, 1, 1), date(2030, 12, 31))
+
+
+class LatencyStats:
+    """
+    Thread-safe request count, error count and durations of the last
+    LATENCY_WINDOW requests
+    """
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.requests = 0
+        self.errors = 0
+        self._durations = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, failed: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.errors += failed
+            self._durations.append(seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        To return the nearest-rank percentile of the recent durations in seconds
+        """
+        with self._lock:
+            durations = sorted(self._durations)
+        if not durations:
+            return None
+        return durations[max(math.ceil(percent / 100 * len(durations)) - 1, 0)]
+
+    def to_dict(self) -> Dict[str, object]:
+        p50, p99 = self.percentile(50), self.percentile(99)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "p50_ms": None if p50 is None else round(p50 * 1000, 3),
+            "p99_ms": None if p99 is None else round(p99 * 1000, 3),
+        }
+
+
+class ServiceRunner(BatchRunner):
+    """
+    BatchRunner whose jobs can run concurrently
+    """
+    def __init__(self, config: dict, service=None):
+        super().__init__(config, service=service)
+        self._lock = threading.Lock()
+
+    def get_calendar(self, calendar_class, calendar_config: dict):
+        with self._lock:
+            return super().get_calendar(calendar_class, calendar_config)
+
+    def get_holiday_calendar(self, country_code: str, subdivision: str = None) -> HolidayCalendar:
+        # A HolidayCalendar holds the holidays of its last period, so each
+        # report gets its own. The holiday index behind them is shared
+        return HolidayCalendar(country_code.upper(), subdivision or None)
+
+
+class ReportService:
+    def __init__(self, config: dict, service=None, cache_seconds: float = CACHE_SECONDS):
+        """
+        service: Calendar API service instead of the shared one (e.g. a FakeCalendarService)
+        cache_seconds: how long the fetched events of a calendar are reused
+        """
+        self.runner = ServiceRunner(config, service)
+        self.users = {user["name"].casefold(): user for user in config["users"]}
+        self.cache_seconds = cache_seconds
+        self.latency = LatencyStats()
+        self._first_read: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def report(self, params: Dict[str, str]) -> List[dict]:
+        """
+        To return the rows of a user's report from the query parameters
+        user, start, end and optionally split and all_day_policy.
+        Raises LookupError for an unknown user and ValueError for invalid parameters
+        """
+        for name in ("user", "start", "end"):
+            if not params.get(name):
+                raise ValueError(f"Missing parameter: {name}")
+        user_config = self.users.get(params["user"].casefold())
+        if user_config is None:
+            raise LookupError(f"Unknown user: {params['user']}")
+        try:
+            start_date, end_date = date.fromisoformat(params["start"]), date.fromisoformat(params["end"])
+        except ValueError:
+            raise ValueError("start and end must be dates like 2025-01-31") from None
+        settings = {**self.runner.defaults, **user_config}
+        calendars = [
+            self.runner.get_calendar(WorkCalendar, settings["work_calendar"]),
+            self.runner.get_calendar(VacationCalendar, settings["vacation_calendar"]),
+        ]
+        self._expire(calendars)
+        # Read from the metadata cache once validated (CALENDAR_METADATA_TTL)
+        self.runner.calendar_metadata.update(fetch_calendar_metadata(
+            self.runner.service or get_calendar_service(), [calendar.calendar_id for calendar in calendars]))
+        return self.runner.run_job({
+            "user": user_config,
+            "periods": [(start_date, end_date)],
+            "all_day_policy": params.get("all_day_policy") or settings.get("all_day_policy", "omit"),
+            "split": params.get("split") or settings.get("split"),
+        })
+
+    def _expire(self, calendars: list):
+        """
+        To drop the snapshots of calendars read more than cache_seconds ago
+        """
+        now = clock.monotonic()
+        with self._lock:
+            for calendar in calendars:
+                first_read = self._first_read.setdefault(id(calendar), now)
+                if now - first_read > self.cache_seconds:
+                    calendar.clear_snapshots()
+                    self._first_read[id(calendar)] = now
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    server: "ReportServer"
+
+    def do_GET(self):
+        started = clock.perf_counter()
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        report_service = self.server.report_service
+        if url.path == "/health":
+            self.send_json(200, {"status": "ok"})
+            return
+        if url.path == "/metrics":
+            self.send_json(200, {**report_service.latency.to_dict(), "workers": self.server.workers})
+            return
+        if url.path != "/report":
+            self.send_json(404, {"error": f"Unknown path {url.path}: use /report, /metrics or /health"})
+            return
+        try:
+            status, body = 200, {"rows": report_service.report(params)}
+        except LookupError as e:
+            status, body = 404, {"error": str(e)}
+        except ValueError as e:
+            status, body = 400, {"error": str(e)}
+        except CalendarFetchError as e:
+            status, body = 502, {"error": str(e)}
+        except Exception as e:
+            status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+        self.send_json(status, body)
+        report_service.latency.record(clock.perf_counter() - started, failed=status != 200)
+
+    def send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+
+class ReportServer(HTTPServer):
+    """
+    HTTP server handing each connection to a fixed pool of worker threads
+    (ThreadingHTTPServer would start a thread per connection)
+    """
+    def __init__(self, address, report_service: ReportService, workers: int = SERVER_WORKERS, access_log: bool = True):
+        super().__init__(address, ReportRequestHandler)
+        self.report_service = report_service
+        self.workers = workers
+        self.access_log = access_log
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+def synthetic_service(config: dict):
+    """
+    To build a FakeCalendarService with a synthetic calendar (shifts
+    and vacations) for every calendar ID of the config
+    """
+    from synthetic_calendar import CalendarProfile, FakeCalendarService, generate_events
+
+    defaults = config.get("defaults", {})
+    calendar_ids = []
+    for user_config in config["users"]:
+        settings = {**defaults, **user_config}
+        calendar_ids.extend(settings[name]["id"] for name in ("work_calendar", "vacation_calendar"))
+    return FakeCalendarService({
+        calendar_id: generate_events(*SYNTHETIC_SPAN, CalendarProfile(seed=seed))
+        for seed, calendar_id in enumerate(dict.fromkeys(calendar_ids), 1)
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the reports of the users of a config file over HTTP.")
+    parser.add_argument("config", help="JSON config file with users and calendars (see batch.py)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="requests served at once")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="serve synthetic calendars instead of Google Calendar (offline)")
+    parser.add_argument("--quiet", action="store_true", help="no access log")
+    args = parser.parse_args(argv)
+
+    with open(args.config, encoding="utf-8") as config_file:
+        config = json.load(config_file)
+    service = None
+    if args.synthetic:
+        service = synthetic_service(config)
+        # The stand-in service needs no rate limit
+        calendar_api.rate_limiter = TokenBucket(1e9, 10 ** 9)
+    server = ReportServer((args.host, args.port), ReportService(config, service), args.workers, not args.quiet)
+    print(f"Serving reports on http://{args.host}:{server.server_port} with {args.workers} workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
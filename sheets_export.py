@@ -0,0 +1,136 @@
+"""
+Export of reports to the working-hours-reports spreadsheet.
+Summary rows go to a "Summary" worksheet and the shifts of each report
+to a worksheet per user and period, created on demand. Rows are buffered
+and every worksheet is written with one call (append_rows/update) when
+flushing, paced to stay under the Sheets write quota on roster runs.
+"""
+import os
+import re
+import time as clock
+from datetime import date
+from typing import Dict, List, Optional
+
+from calendar_api import TokenBucket, http_status, retry_delay
+
+SUMMARY_WORKSHEET = "Summary"
+SUMMARY_FIELDS = [
+    "name", "start_date", "end_date",
+    "expected_hours", "actual_hours", "raw_hours", "overlap_hours", "difference",
+    "expected_days", "actual_days", "vacation_days", "holiday_days", "total_days_off",
+]
+SHIFT_FIELDS = ["date", "start", "end", "hours", "title", "all_day"]
+# The Sheets API allows 60 write requests per minute and user: keep some headroom
+SHEETS_WRITES_PER_MINUTE = float(os.environ.get("SHEETS_WRITES_PER_MINUTE", 50))
+MAX_RETRIES = 5
+# Longest worksheet title accepted by Google Sheets
+MAX_TITLE_LENGTH = 100
+
+
+def worksheet_title(name: str, start_date: date, end_date: date) -> str:
+    """
+    To name the shifts worksheet of a user and period, without the
+    characters Sheets rejects in titles
+    """
+    title = f"{name} {start_date.isoformat()} - {end_date.isoformat()}"
+    return re.sub(r"[\[\]:*?/\\]", " ", title)[:MAX_TITLE_LENGTH]
+
+
+class SheetsExporter:
+    """
+    Buffers report rows, then writes each worksheet with a single call.
+    spreadsheet: a gspread Spreadsheet (the shared one by default),
+    or any stand-in with worksheets() and add_worksheet()
+    """
+    def __init__(self, spreadsheet=None, writes_per_minute: float = SHEETS_WRITES_PER_MINUTE):
+        if spreadsheet is None:
+            from clients import get_sheet
+            spreadsheet = get_sheet()
+        self.spreadsheet = spreadsheet
+        self.limiter = TokenBucket(writes_per_minute / 60, max(1, int(writes_per_minute // 10)))
+        self.write_requests = 0
+        self.summary_rows: List[list] = []
+        self.shift_rows: Dict[str, List[list]] = {}
+        self._worksheets: Optional[Dict[str, object]] = None
+
+    def add_report(self, report):
+        """
+        To buffer the summary row and the shifts of a Report
+        """
+        self.add_summary_rows([report.to_dict()])
+        self.add_shifts(report.user.name, report.start_date, report.end_date, report.shifts)
+
+    def add_summary_rows(self, rows: List[dict]):
+        """
+        To buffer to_dict() rows, rows with an error being skipped
+        """
+        self.summary_rows.extend(
+            [row.get(field, "") for field in SUMMARY_FIELDS] for row in rows if not row.get("error")
+        )
+
+    def add_shifts(self, name: str, start_date: date, end_date: date, shifts):
+        rows = self.shift_rows.setdefault(worksheet_title(name, start_date, end_date), [])
+        for shift in shifts:
+            if shift.all_day:
+                rows.append([shift.start, "", "", round(shift.duration, 2), shift.title, True])
+            else:
+                rows.append([
+                    shift.start.date().isoformat(), shift.start.strftime("%H:%M"), shift.end.strftime("%H:%M"),
+                    round(shift.duration, 2), shift.title, False
+                ])
+
+    def flush(self) -> int:
+        """
+        To write everything buffered and return the number of write requests made.
+        Shift worksheets are rewritten, summary rows appended
+        """
+        writes_before = self.write_requests
+        for title, rows in self.shift_rows.items():
+            values = [SHIFT_FIELDS] + rows
+            worksheet = self._get_worksheet(title)
+            if worksheet is None:
+                worksheet = self._add_worksheet(title, len(values), len(SHIFT_FIELDS))
+            else:
+                # Blank out the rows of a previous export in the same update
+                blank_row = [""] * len(SHIFT_FIELDS)
+                values += [blank_row] * (worksheet.row_count - len(values))
+            self._write(worksheet.update, values, "A1")
+        self.shift_rows = {}
+        if self.summary_rows:
+            worksheet = self._get_worksheet(SUMMARY_WORKSHEET)
+            rows = self.summary_rows
+            if worksheet is None:
+                worksheet = self._add_worksheet(SUMMARY_WORKSHEET, len(rows) + 1, len(SUMMARY_FIELDS))
+                rows = [SUMMARY_FIELDS] + rows
+            self._write(worksheet.append_rows, rows)
+            self.summary_rows = []
+        return self.write_requests - writes_before
+
+    def _get_worksheet(self, title: str):
+        if self._worksheets is None:
+            # One read for all the titles instead of one lookup per worksheet
+            self._worksheets = {worksheet.title: worksheet for worksheet in self.spreadsheet.worksheets()}
+        return self._worksheets.get(title)
+
+    def _add_worksheet(self, title: str, rows: int, cols: int):
+        worksheet = self._write(self.spreadsheet.add_worksheet, title, rows, cols)
+        self._worksheets[title] = worksheet
+        return worksheet
+
+    def _write(self, method, *args):
+        """
+        To make one write request within the quota, retrying rate
+        limit and server errors with backoff
+        """
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            self.write_requests += 1
+            try:
+                return method(*args)
+            except Exception as e:
+                status = getattr(e, "code", None) or http_status(e)
+                if attempt >= MAX_RETRIES or not (status == 429 or (status or 0) >= 500):
+                    raise
+                clock.sleep(retry_delay(attempt, e))
+                attempt += 1
@@ -0,0 +1,280 @@
+"""
+Deterministic synthetic calendars for offline benchmarks: Calendar API
+events (shifts, all-day events, multi-day vacations, overlapping and
+DST-crossing shifts) generated from a seed, a stand-in Calendar API
+service paging through them like the real one, and a local HTTP server
+answering with that service like the REST endpoint.
+"""
+import json
+import random
+import re
+import time as clock
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, tzinfo
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from intervals import get_zone, local_midnight
+from timestamps import parse_timestamp
+
+WORK_TITLE = "Work shift"
+VACATION_TITLE = "Vacation bench"
+# Largest page the Calendar API returns (maxResults)
+MAX_PAGE_SIZE = 2500
+
+
+@dataclass(slots=True)
+class CalendarProfile:
+    """
+    Shape of a synthetic calendar. Rates are per day (or per shift for
+    overlaps), every_days values of 0 disable the event kind
+    """
+    shifts_per_week: float = 5
+    # Every night_shift_every-th shift runs 22:00 - 06:00
+    night_shift_every: int = 6
+    # Share of shifts covered again by a duplicate or partly overlapping shift
+    overlap_rate: float = 0.05
+    all_day_every_days: int = 30
+    vacation_every_days: int = 60
+    vacation_days: int = 5
+    # Events the title filters leave out (appointments...)
+    other_events_per_week: float = 2
+    time_zone: str = "Europe/Vienna"
+    seed: int = 1
+
+
+def generate_events(start_date: date, end_date: date, profile: Optional[CalendarProfile] = None) -> List[dict]:
+    """
+    To generate the events of [start_date, end_date] as the API returns
+    them with singleEvents and orderBy startTime. The same profile always
+    gives the same events. A night shift is added on every DST change
+    night, so clocks going forward and back are always crossed
+    """
+    profile = profile or CalendarProfile()
+    rng = random.Random(profile.seed)
+    zone = get_zone(profile.time_zone)
+    events = []
+    shift_count = 0
+
+    def add_timed(title: str, start: datetime, end: datetime):
+        events.append({
+            "id": f"synthetic{len(events)}",
+            "status": "confirmed",
+            "summary": title,
+            "start": {"dateTime": start.isoformat(), "timeZone": profile.time_zone},
+            "end": {"dateTime": end.isoformat(), "timeZone": profile.time_zone},
+        })
+
+    def add_all_day(title: str, first_day: date, days: int):
+        events.append({
+            "id": f"synthetic{len(events)}",
+            "status": "confirmed",
+            "summary": title,
+            "start": {"date": first_day.isoformat()},
+            "end": {"date": (first_day + timedelta(days=days)).isoformat()},
+        })
+
+    day = start_date
+    while day <= end_date:
+        next_day = day + timedelta(days=1)
+        # The clocks change in the early hours of next_day
+        dst_change = local_midnight(next_day, zone).utcoffset() != local_midnight(next_day + timedelta(days=1), zone).utcoffset()
+        if dst_change or rng.random() < profile.shifts_per_week / 7:
+            shift_count += 1
+            if dst_change or shift_count % profile.night_shift_every == 0:
+                # Wall clock times: 8 hours long, 7 or 9 on DST change nights
+                shift_start = datetime.combine(day, time(22), tzinfo=zone)
+                shift_end = datetime.combine(next_day, time(6), tzinfo=zone)
+            else:
+                shift_start = datetime.combine(day, time(8), tzinfo=zone) + timedelta(minutes=30 * rng.randrange(5))
+                shift_end = shift_start + timedelta(hours=rng.choice((4, 6, 8, 8, 10)))
+            add_timed(WORK_TITLE, shift_start, shift_end)
+            if rng.random() < profile.overlap_rate:
+                if rng.random() < 0.5:
+                    add_timed(WORK_TITLE, shift_start, shift_end)
+                else:
+                    cover_start = shift_start + timedelta(hours=2)
+                    add_timed(f"{WORK_TITLE} cover", cover_start, cover_start + timedelta(hours=4))
+        other_events = profile.other_events_per_week / 7
+        for i in range(int(other_events) + (rng.random() < other_events % 1)):
+            appointment = datetime.combine(day, time(17), tzinfo=zone) - timedelta(minutes=20 * (i % 45))
+            add_timed("Team meeting" if i % 2 else "Dentist", appointment, appointment + timedelta(hours=1))
+        index = (day - start_date).days
+        if profile.all_day_every_days and index % profile.all_day_every_days == profile.all_day_every_days - 1:
+            add_all_day(f"{WORK_TITLE} training", day, 1)
+        if profile.vacation_every_days and index % profile.vacation_every_days == profile.vacation_every_days // 2:
+            add_all_day(VACATION_TITLE, day, profile.vacation_days)
+        day = next_day
+    events.sort(key=lambda event: _timestamp(event["start"], zone))
+    return events
+
+
+def _timestamp(bound: dict, zone: tzinfo) -> float:
+    """
+    To read an event start or end as a timestamp, all-day dates
+    being local midnights of zone
+    """
+    if "date" in bound:
+        return local_midnight(date.fromisoformat(bound["date"]), zone).timestamp()
+    return parse_timestamp(bound["dateTime"]).timestamp()
+
+
+class _Request:
+    def __init__(self, function):
+        self.function = function
+
+    def execute(self):
+        return self.function()
+
+
+class FakeCalendarService:
+    """
+    Stand-in for the Calendar API service: events().list returns the
+    events of each calendar overlapping [timeMin, timeMax) in start order,
+    paged by maxResults (250 by default like the API) with nextPageToken,
+    along with the calendar's summary, timeZone and accessRole, which
+    calendars().get returns alone.
+    q= keeps the events having every search term at the start of a word
+    of their summary, description or location, which approximates the
+    API's full text search. Counts the requests made
+    """
+    def __init__(self, calendars: Dict[str, Iterable[dict]], time_zone: str = "Europe/Vienna"):
+        self.time_zone = time_zone
+        self.requests = 0
+        self._calendars = {}
+        zone = get_zone(time_zone)
+        for calendar_id, events in calendars.items():
+            events = sorted(events, key=lambda event: _timestamp(event["start"], zone))
+            starts = [_timestamp(event["start"], zone) for event in events]
+            ends = [_timestamp(event["end"], zone) for event in events]
+            # Events starting before timeMin - longest can't reach timeMin
+            longest = max((end - start for start, end in zip(starts, ends)), default=0)
+            self._calendars[calendar_id] = (events, starts, ends, longest)
+
+    def events(self):
+        return self
+
+    def list(self, calendarId=None, timeMin=None, timeMax=None, pageToken=None, maxResults=250, q=None, **params):
+        return _Request(lambda: self._page(calendarId, timeMin, timeMax, pageToken, maxResults, q))
+
+    def calendars(self):
+        return _CalendarsResource(self)
+
+    def _calendar(self, calendar_id) -> dict:
+        self.requests += 1
+        if calendar_id not in self._calendars:
+            raise LookupError(f"Unknown calendar {calendar_id}")
+        return {"id": calendar_id, "summary": calendar_id, "timeZone": self.time_zone}
+
+    def _page(self, calendar_id, time_min, time_max, page_token, max_results, query=None) -> dict:
+        self.requests += 1
+        if calendar_id not in self._calendars:
+            raise LookupError(f"Unknown calendar {calendar_id}")
+        events, starts, ends, longest = self._calendars[calendar_id]
+        min_ts = parse_timestamp(time_min).timestamp() if time_min else float("-inf")
+        max_ts = parse_timestamp(time_max).timestamp() if time_max else float("inf")
+        index = int(page_token) if page_token else bisect_left(starts, min_ts - longest)
+        stop = bisect_left(starts, max_ts)
+        page_size = min(max_results or 250, MAX_PAGE_SIZE)
+        terms = query.casefold().split() if query else []
+        items = []
+        while index < stop and len(items) < page_size:
+            if ends[index] > min_ts and (not terms or _has_terms(events[index], terms)):
+                items.append(events[index])
+            index += 1
+        page = {"summary": calendar_id, "timeZone": self.time_zone, "accessRole": "reader", "items": items}
+        if index < stop:
+            page["nextPageToken"] = str(index)
+        return page
+
+
+class _CalendarsResource:
+    def __init__(self, service: FakeCalendarService):
+        self.service = service
+
+    def get(self, calendarId=None, **params):
+        return _Request(lambda: self.service._calendar(calendarId))
+
+
+def _has_terms(event: dict, terms: List[str]) -> bool:
+    text = " ".join(event.get(name) or "" for name in ("summary", "description", "location"))
+    words = re.findall(r"\w+", text.casefold())
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+
+class _MockApiHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients can pool their connections
+    protocol_version = "HTTP/1.1"
+    # Headers and body are sent separately: don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+    server: "MockCalendarServer"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        match = re.search(r"/calendars/([^/]+)(/events)?$", url.path)
+        params = dict(parse_qsl(url.query))
+        if self.server.latency:
+            clock.sleep(self.server.latency)
+        try:
+            if match is None:
+                raise LookupError(f"Unknown path {url.path}")
+            calendar_id = unquote(match.group(1))
+            if match.group(2) is None:
+                request = self.server.service.calendars().get(calendarId=calendar_id)
+            else:
+                request = self.server.service.events().list(
+                    calendarId=calendar_id,
+                    timeMin=params.get("timeMin"),
+                    timeMax=params.get("timeMax"),
+                    pageToken=params.get("pageToken"),
+                    maxResults=int(params.get("maxResults", 250)),
+                    q=params.get("q"),
+                )
+            status, body = 200, request.execute()
+        except LookupError as e:
+            status, body = 404, {"error": {"code": 404, "message": str(e)}}
+        self.send_json(status, body)
+
+    def send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockCalendarServer(ThreadingHTTPServer):
+    """
+    Local HTTP server answering GET .../calendars/<id>/events and
+    .../calendars/<id> from a
+    FakeCalendarService after `latency` seconds (the round-trip to Google),
+    to benchmark the HTTP Calendar backends. Run serve_forever() on a thread
+    """
+    daemon_threads = True
+    # Clients open many connections at once
+    request_queue_size = 1024
+
+    def __init__(self, service: FakeCalendarService, latency: float = 0.0, address=("127.0.0.1", 0)):
+        super().__init__(address, _MockApiHandler)
+        self.service = service
+        self.latency = latency
+
+    @property
+    def root_url(self) -> str:
+        """
+        The server's root, as googleapiclient's api_endpoint
+        """
+        return f"http://{self.server_address[0]}:{self.server_port}/"
+
+    @property
+    def api_root(self) -> str:
+        """
+        The Calendar API root on the server, as async_calendar's api_root
+        """
+        return f"{self.root_url}calendar/v3"
@@ -1,22 +1,7 @@
-import gspread
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
 import holidays
+from clients import get_calendar_service, get_sheet
 # from datetime import datetime, date, timedelta
 
-SCOPE = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive.file",
-    "https://www.googleapis.com/auth/drive",
-    "https://www.googleapis.com/auth/calendar.readonly"
-]
-
-CREDS = Credentials.from_service_account_file('creds.json')
-SCOPE_CREDS = CREDS.with_scopes(SCOPE)
-GSPREAD_CLIENT = gspread.authorize(SCOPE_CREDS)
-SHEET = GSPREAD_CLIENT.open('working-hours-reports')
-CALENDAR_SERVICE = build('calendar', 'v3', credentials=SCOPE_CREDS)
-
 
 def fetch_calendar():
     """
@@ -24,7 +9,7 @@ def fetch_calendar():
     """
     calendar_id = input("Please enter your calendar ID:\n")
     try:
-        calendar_info = CALENDAR_SERVICE.calendars().get(calendarId=calendar_id).execute()
+        calendar_info = get_calendar_service().calendars().get(calendarId=calendar_id).execute()
         print("Calendar connected successfully!")
         print("Calendar name: ", calendar_info['summary'])
     except Exception as e:
@@ -37,7 +22,7 @@ def fetch_worksheet():
     """
     worksheet_name = input("please enter the name of your worksheet")
     try:
-        reports = SHEET.worksheet(worksheet_name).get_all_values()
+        reports = get_sheet().worksheet(worksheet_name).get_all_values()
         headings = reports
         print(headings)
     except Exception as e:
@@ -54,13 +39,14 @@ def fetch_holidays(year):
         print(f"{date}: {name}")
 
 
-print("Testing google calendar connection:")
-fetch_calendar()
-print("Testing google worksheet connection:")
-fetch_worksheet()
-print("testing holiday library connection:")
-fetch_holidays(2025)
-print("we are good to go")
+if __name__ == "__main__":
+    print("Testing google calendar connection:")
+    fetch_calendar()
+    print("Testing google worksheet connection:")
+    fetch_worksheet()
+    print("testing holiday library connection:")
+    fetch_holidays(2025)
+    print("we are good to go")
 
 
 """
@@ -0,0 +1,10 @@
+import pytest
+
+import calendar_api
+from calendar_api import TokenBucket
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    # The stand-in services need no rate limit
+    monkeypatch.setattr(calendar_api, "rate_limiter", TokenBucket(1e9, 10 ** 9))
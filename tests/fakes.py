@@ -0,0 +1,216 @@
+"""
+Stand-ins for the Google services the tests need beyond the
+FakeCalendarService of synthetic_calendar.py
+"""
+import random
+from typing import Dict, Iterable, List, Optional
+
+
+class FakeResponse(dict):
+    def __init__(self, status: int, headers: Optional[Dict[str, str]] = None):
+        super().__init__(status=str(status), **(headers or {}))
+        self.status = status
+
+
+class FakeHttpError(Exception):
+    """
+    Stand-in for googleapiclient's HttpError
+    """
+    def __init__(self, status: int, content: bytes = b"", headers: Optional[Dict[str, str]] = None):
+        super().__init__(f"HTTP {status}")
+        self.resp = FakeResponse(status, headers)
+        self.content = content
+
+
+class FakeRequest:
+    def __init__(self, function):
+        self.function = function
+
+    def execute(self):
+        return self.function()
+
+
+class FlakyService:
+    """
+    Wraps a stand-in service so that each request fails with one of
+    `statuses` with probability failure_rate (always if failure_rate is 1)
+    """
+    def __init__(self, service, failure_rate: float, statuses=(429, 500, 503), seed=3):
+        self.service = service
+        self.failure_rate = failure_rate
+        self.statuses = statuses
+        self.rng = random.Random(seed)
+        self.failures = 0
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        request = self.service.events().list(**params)
+
+        def execute():
+            if self.rng.random() < self.failure_rate:
+                self.failures += 1
+                raise FakeHttpError(self.rng.choice(self.statuses))
+            return request.execute()
+        return FakeRequest(execute)
+
+
+class FakeBatch:
+    """
+    Stand-in for googleapiclient's BatchHttpRequest: execute() runs the
+    added requests and hands each outcome to the callback
+    """
+    def __init__(self, service: "BatchingService", callback):
+        self.service = service
+        self.callback = callback
+        self.requests: List[tuple] = []
+
+    def add(self, request, request_id: str):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.service.batches.append(len(self.requests))
+        for request_id, request in self.requests:
+            try:
+                response, error = request.execute(), None
+            except Exception as e:
+                response, error = None, e
+            self.callback(request_id, response, error)
+
+
+class BatchingService:
+    """
+    Wraps a stand-in service with new_batch_http_request. The requests for
+    a calendar ID of `failures` raise its statuses in turn, then succeed.
+    Records the size of every batch executed
+    """
+    def __init__(self, service, failures: Optional[Dict[str, List[int]]] = None):
+        self.service = service
+        self.failures = {calendar_id: list(statuses) for calendar_id, statuses in (failures or {}).items()}
+        self.batches: List[int] = []
+
+    def events(self):
+        return self
+
+    def list(self, calendarId: str, **params):
+        request = self.service.events().list(calendarId=calendarId, **params)
+
+        def execute():
+            statuses = self.failures.get(calendarId)
+            if statuses:
+                raise FakeHttpError(statuses.pop(0))
+            return request.execute()
+        return FakeRequest(execute)
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+class SyncingCalendarService:
+    """
+    Stand-in for the Calendar API service with incremental sync: a listing
+    without syncToken returns every event, one with it the events changed
+    since the last listing (deleted ones as cancelled), both paged by
+    page_size and ending with a nextSyncToken. After expire_sync_tokens()
+    incremental listings fail with 410 Gone until the next full listing.
+    Records the parameters of every request
+    """
+    def __init__(self, calendars: Dict[str, Iterable[dict]], page_size: int = 250):
+        self.page_size = page_size
+        self.calendars = {calendar_id: {event["id"]: event for event in events}
+                          for calendar_id, events in calendars.items()}
+        self.changed: Dict[str, Dict[str, dict]] = {calendar_id: {} for calendar_id in calendars}
+        self.expired = False
+        self.requests: List[dict] = []
+
+    def put(self, calendar_id: str, event: dict):
+        self.calendars[calendar_id][event["id"]] = event
+        self.changed[calendar_id][event["id"]] = event
+
+    def delete(self, calendar_id: str, event_id: str):
+        del self.calendars[calendar_id][event_id]
+        self.changed[calendar_id][event_id] = {"id": event_id, "status": "cancelled"}
+
+    def expire_sync_tokens(self):
+        self.expired = True
+
+    def events(self):
+        return self
+
+    def list(self, calendarId: str, syncToken: Optional[str] = None, pageToken: Optional[str] = None, **params):
+        self.requests.append({"calendarId": calendarId, "syncToken": syncToken, "pageToken": pageToken, **params})
+        return FakeRequest(lambda: self._page(calendarId, syncToken, pageToken))
+
+    def _page(self, calendar_id: str, sync_token: Optional[str], page_token: Optional[str]) -> dict:
+        if sync_token is not None and self.expired:
+            raise FakeHttpError(410)
+        events = self.changed[calendar_id] if sync_token is not None else self.calendars[calendar_id]
+        items = list(events.values())
+        first = int(page_token or 0)
+        page = {"items": items[first:first + self.page_size]}
+        if first + self.page_size < len(items):
+            page["nextPageToken"] = str(first + self.page_size)
+        else:
+            self.changed[calendar_id] = {}
+            if sync_token is None:
+                self.expired = False
+            page["nextSyncToken"] = f"token{len(self.requests)}"
+        return page
+
+
+class FakeWorksheet:
+    """
+    Stand-in for a gspread Worksheet holding its cells as a list of rows
+    """
+    def __init__(self, spreadsheet: "FakeSpreadsheet", title: str, rows: int, cols: int):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.row_count = rows
+        self.values: List[list] = []
+
+    def update(self, values, range_name="A1"):
+        assert range_name == "A1"
+        self.spreadsheet.write()
+        self.values[:len(values)] = [list(row) for row in values]
+        self.row_count = max(self.row_count, len(self.values))
+
+    def append_rows(self, values):
+        self.spreadsheet.write()
+        self.values.extend(list(row) for row in values)
+        self.row_count = max(self.row_count, len(self.values))
+
+
+class FakeSpreadsheet:
+    """
+    Stand-in for a gspread Spreadsheet counting the read and write requests.
+    The next write requests raise the errors queued in `failures`
+    """
+    def __init__(self):
+        self.sheets: Dict[str, FakeWorksheet] = {}
+        self.writes = 0
+        self.reads = 0
+        self.failures: List[Exception] = []
+
+    def write(self):
+        self.writes += 1
+        if self.failures:
+            raise self.failures.pop(0)
+
+    def worksheets(self):
+        self.reads += 1
+        return list(self.sheets.values())
+
+    def add_worksheet(self, title, rows, cols):
+        assert title not in self.sheets
+        self.write()
+        self.sheets[title] = FakeWorksheet(self, title, rows, cols)
+        return self.sheets[title]
+
+
+def timed_event(event_id: str, start: str, end: str, summary: str = "Work shift") -> dict:
+    return {"id": event_id, "summary": summary, "start": {"dateTime": start}, "end": {"dateTime": end}}
+
+
+def all_day_event(event_id: str, start: str, end: str, summary: str = "Vacation") -> dict:
+    return {"id": event_id, "summary": summary, "start": {"date": start}, "end": {"date": end}}
@@ -0,0 +1,141 @@
+"""
+Reference implementations the faster calculations are tested against
+(the loops they replaced) and the synthetic inputs they are tested on.
+benchmark.py times the same pairs
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+import holidays
+
+from run import Shift, count_weekdays
+
+
+def loop_expected_working_days(start_date, end_date, weekdays, days_off):
+    """
+    Day by day loop formerly used by Report.calculate_expected_working_days
+    """
+    expected_days = 0
+    for i in range((end_date - start_date).days + 1):
+        current_day = start_date + timedelta(days=i)
+        if current_day.weekday() in weekdays and current_day not in days_off:
+            expected_days += 1
+    return expected_days
+
+
+def closed_form_expected_working_days(start_date, end_date, weekdays, days_off):
+    weekdays = set(weekdays)
+    off = {day for day in days_off if day.weekday() in weekdays and start_date <= day <= end_date}
+    return count_weekdays(start_date, end_date, weekdays) - len(off)
+
+
+def loop_contract_dates(start_date, end_date, weekdays):
+    """
+    Comprehension formerly used by User.get_contract_working_weekdays_dates
+    """
+    return {
+        start_date + timedelta(days=i)
+        for i in range((end_date - start_date).days + 1)
+        if (start_date + timedelta(days=i)).weekday() in weekdays
+    }
+
+
+def loop_holidays(country_code, start_date, end_date):
+    """
+    Day by day loop formerly used by HolidayCalendar.fetch_holidays
+    """
+    all_holidays = holidays.country_holidays(country_code)
+    found = []
+    included_day = start_date
+    while included_day <= end_date:
+        if included_day in all_holidays:
+            found.append({"date": included_day, "title": all_holidays[included_day]})
+        included_day += timedelta(days=1)
+    return found
+
+
+def synthetic_timestamps(total=100_000, seed=11):
+    """
+    To generate the start/end strings of `total` events the way the API
+    sends them: mostly local times with an offset, some UTC 'Z' times,
+    fractional seconds and all-day dates
+    """
+    rng = random.Random(seed)
+    offsets = ["+01:00", "+02:00", "Z", "-05:00", "+05:30", "+00:00"]
+    values = []
+    for i in range(total):
+        moment = datetime(2015, 1, 1) + timedelta(minutes=rng.randrange(10 * 365 * 24 * 60))
+        if i % 50 == 0:
+            values.append(moment.date().isoformat())
+            continue
+        text = moment.isoformat(timespec="milliseconds" if i % 7 == 0 else "seconds")
+        values.append(text + rng.choice(offsets))
+    return values
+
+
+def overlapping_shifts(total, seed=5):
+    """
+    To generate `total` shifts in random order, a third of them
+    duplicated or overlapping others, some crossing midnight
+    """
+    rng = random.Random(seed)
+    start = datetime(2015, 1, 1, tzinfo=timezone.utc)
+    shifts = []
+    for i in range(total):
+        if shifts and i % 3 == 0:
+            other = rng.choice(shifts)
+            shift_start = other.start + timedelta(minutes=rng.randrange(-120, 240, 30))
+        else:
+            shift_start = start + timedelta(minutes=30 * rng.randrange(total * 16))
+        shift_end = shift_start + timedelta(hours=rng.choice((1, 4, 8, 10)))
+        shifts.append(Shift("Work shift", shift_start, shift_end, (shift_end - shift_start).total_seconds() / 3600, False))
+    rng.shuffle(shifts)
+    return shifts
+
+
+def slot_union_hours(shifts):
+    """
+    Reference union: the set of half-hour slots covered by the shifts
+    """
+    slots = set()
+    for shift in shifts:
+        first = int(shift.start.timestamp()) // 1800
+        slots.update(range(first, first + int(shift.duration * 2)))
+    return len(slots) / 2
+
+
+TITLE_WORDS = ["shift", "night", "early", "late", "dienst", "urlaub", "meeting", "training", "cover", "standby",
+               "nacht", "früh", "spät", "team", "review", "dentist", "Straße", "call", "on", "duty"]
+
+
+def synthetic_titles(total=100_000, seed=13):
+    """
+    To generate `total` distinct event titles of 2 to 4 words
+    """
+    rng = random.Random(seed)
+    return [f"{' '.join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(2, 4)))} #{i}" for i in range(total)]
+
+
+def synthetic_keywords(count, seed=17):
+    """
+    To generate `count` keywords, a few real title words and random others
+    """
+    rng = random.Random(seed)
+    keywords = {"nacht", "cover"}
+    while len(keywords) < count:
+        keywords.add("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9))))
+    return sorted(keywords)[:count]
+
+
+def loop_title_filter(titles, include, exclude):
+    """
+    One substring test per keyword and title, as the former single keyword filter did
+    """
+    include = [keyword.lower() for keyword in include]
+    exclude = [keyword.lower() for keyword in exclude]
+    matched = []
+    for title in titles:
+        lowered = title.lower()
+        if any(keyword in lowered for keyword in include) and not any(keyword in lowered for keyword in exclude):
+            matched.append(title)
+    return matched
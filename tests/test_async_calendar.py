@@ -0,0 +1,79 @@
+import json
+import threading
+from datetime import date
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from async_calendar import AsyncCalendarService, HttpError  # noqa: E402
+from calendar_api import CalendarFetchError  # noqa: E402
+from run import VacationCalendar, WorkCalendar, fetch_snapshots  # noqa: E402
+from synthetic_calendar import (VACATION_TITLE, WORK_TITLE, CalendarProfile, FakeCalendarService,  # noqa: E402
+                                MockCalendarServer, generate_events)
+
+YEAR = (date(2024, 1, 1), date(2024, 12, 31))
+
+
+@pytest.fixture(scope="module")
+def calendar_service():
+    return FakeCalendarService({
+        f"calendar{seed}": generate_events(*YEAR, CalendarProfile(seed=seed)) for seed in range(3)
+    })
+
+
+@pytest.fixture(scope="module")
+def async_service(calendar_service):
+    server = MockCalendarServer(calendar_service)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    service = AsyncCalendarService(api_root=server.api_root)
+    yield service
+    service.close()
+    server.shutdown()
+    server.server_close()
+
+
+def calendars(service, calendar_id: str) -> list:
+    return [
+        WorkCalendar(calendar_id, WORK_TITLE, None, service, "Europe/Vienna"),
+        VacationCalendar(calendar_id, VACATION_TITLE, None, service, "Europe/Vienna"),
+    ]
+
+
+def test_snapshots_match_the_stand_in_service(calendar_service, async_service):
+    for calendar_id in ("calendar0", "calendar1"):
+        expected, _, expected_pages = fetch_snapshots(calendars(calendar_service, calendar_id), *YEAR)
+        fetched = calendars(async_service, calendar_id)
+        snapshots, _, pages = fetch_snapshots(fetched, *YEAR)
+        assert [snapshot.events for snapshot in snapshots] == [snapshot.events for snapshot in expected]
+        assert pages == expected_pages
+        assert [calendar.fetch_stats.requests for calendar in fetched] == [snapshot.pages_requested for snapshot in snapshots]
+
+
+def test_stats_hold_the_http_payload(async_service):
+    calendar = calendars(async_service, "calendar2")[0]
+    calendar.fetch_events_by_period(*YEAR)
+    # Sent with Content-Length and no compression by the mock server
+    assert calendar.fetch_stats.requests == calendar.pages_requested > 0
+    assert calendar.fetch_stats.bytes > 0 and calendar.fetch_stats.gzip_responses == 0
+
+
+def test_requests_report_their_payload(async_service):
+    request = async_service.events().list(calendarId="calendar2", maxResults=10)
+    page = request.execute()
+    assert len(page["items"]) == 10
+    assert request.payload_bytes == len(json.dumps(page)) and request.gzipped is False
+
+
+def test_calendars_get(async_service):
+    assert async_service.calendars().get(calendarId="calendar1").execute() == {
+        "id": "calendar1", "summary": "calendar1", "timeZone": "Europe/Vienna"}
+    with pytest.raises(HttpError) as raised:
+        async_service.calendars().get(calendarId="unknown").execute()
+    assert raised.value.status == 404
+
+
+def test_failed_calendar_raises(async_service):
+    with pytest.raises(CalendarFetchError) as raised:
+        fetch_snapshots(calendars(async_service, "calendar0")[:1] + calendars(async_service, "unknown")[:1], *YEAR)
+    assert raised.value.status == 404
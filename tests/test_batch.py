@@ -0,0 +1,71 @@
+from datetime import date
+
+import pytest
+
+import calendar_api
+import run
+from batch import BatchRunner
+from calendar_api import MetadataCache
+from fakes import all_day_event, timed_event
+from synthetic_calendar import FakeCalendarService
+
+SHIFTS = [timed_event(f"shift{day}", f"2025-03-{day:02d}T09:00:00+01:00", f"2025-03-{day:02d}T17:00:00+01:00")
+          for day in range(3, 29)] + [
+    timed_event("night", "2025-02-28T22:00:00+01:00", "2025-03-01T06:00:00+01:00"),
+    all_day_event("seminar", "2025-02-27", "2025-03-05", "Work seminar"),
+    all_day_event("training", "2025-03-10", "2025-03-17", "Work training"),
+]
+VACATIONS = [all_day_event("vacation", "2025-02-26", "2025-03-04", "Urlaub")]
+PERIODS = [{"start": "2025-02-01", "end": "2025-02-28"}, {"start": "2025-03-01", "end": "2025-03-31"},
+           {"start": "2025-03-12", "end": "2025-03-20"}]
+
+
+@pytest.fixture(autouse=True)
+def metadata_cache(monkeypatch):
+    monkeypatch.setattr(calendar_api, "metadata_cache", MetadataCache())
+
+
+@pytest.fixture
+def service():
+    return FakeCalendarService({"work": SHIFTS, "vacation": VACATIONS})
+
+
+def config(all_day_policy="8hr", split=None):
+    return {
+        "defaults": {"country": "AT", "weekdays": "mon-fri", "all_day_policy": all_day_policy, "split": split},
+        "periods": PERIODS,
+        "users": [{
+            "name": "Ana",
+            "weekly_contract_hours": 40,
+            "work_calendar": {"id": "work", "title_filter": "work"},
+            "vacation_calendar": {"id": "vacation", "title_filter": "urlaub"},
+        }],
+    }
+
+
+def standalone(service, row, all_day_policy):
+    report = run.Report(
+        run.User("Ana", "AT", 40, [0, 1, 2, 3, 4]),
+        run.WorkCalendar("work", "work", service=service),
+        run.VacationCalendar("vacation", "urlaub", service=service),
+        run.HolidayCalendar("AT"),
+        date.fromisoformat(row["start_date"]), date.fromisoformat(row["end_date"]), all_day_policy)
+    return report.to_dict()
+
+
+@pytest.mark.parametrize("all_day_policy", ["omit", "8hr", "24hr"])
+def test_period_rows_match_standalone_reports(service, all_day_policy):
+    rows, _ = BatchRunner(config(all_day_policy, "week"), service=service).run()
+    assert len(rows) > len(PERIODS)
+    for row in rows:
+        expected = standalone(service, row, all_day_policy)
+        assert {**row, "api_pages_requested": 0} == {**expected, "api_pages_requested": 0}
+
+
+def test_rows_do_not_depend_on_the_other_periods(service):
+    rows, _ = BatchRunner(config(), service=service).run()
+    alone = {**config(), "periods": PERIODS[1:2]}
+    march, = BatchRunner(alone, service=service).run()[0]
+    assert {**rows[1], "api_pages_requested": 0} == {**march, "api_pages_requested": 0}
+    # The seminar and the night shift count in February, where they start
+    assert rows[0]["actual_days"] == 1 and rows[0]["raw_hours"] == 8 + 2
@@ -0,0 +1,195 @@
+import json
+import time as clock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+import calendar_api
+from calendar_api import (CalendarFetchError, FetchStats, MetadataCache, TokenBucket, fetch_calendar_metadata, is_retryable,
+                          list_events_page, retry_delay)
+from fakes import BatchingService, FakeHttpError, FlakyService
+from synthetic_calendar import CalendarProfile, FakeCalendarService, generate_events
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(calendar_api, "BACKOFF_BASE", 0.0001)
+
+
+@pytest.fixture(scope="module")
+def service():
+    return FakeCalendarService({"work": generate_events(date(2024, 1, 1), date(2024, 12, 31), CalendarProfile(seed=1))})
+
+
+def list_all(service, stats=None) -> list:
+    """
+    To page through the calendar 20 events at a time
+    """
+    events, page_token = [], None
+    while True:
+        page = list_events_page(service, stats, calendarId="work", maxResults=20, pageToken=page_token)
+        events.extend(page["items"])
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return events
+
+
+def test_failed_pages_are_retried_without_changing_the_events(service):
+    expected = list_all(service)
+    flaky = FlakyService(service, failure_rate=0.3)
+    stats = FetchStats()
+    assert list_all(flaky, stats) == expected
+    assert flaky.failures and stats.retries == flaky.failures
+    assert stats.requests == len(expected) // 20 + 1
+
+
+@pytest.mark.parametrize("status, attempts", [(404, 1), (503, calendar_api.MAX_RETRIES + 1)])
+def test_unrecoverable_failures_raise(service, status, attempts):
+    with pytest.raises(CalendarFetchError) as raised:
+        list_events_page(FlakyService(service, 1.0, statuses=(status,)), calendarId="work", pageToken="40")
+    assert (raised.value.status, raised.value.attempts, raised.value.page_token) == (status, attempts, "40")
+
+
+def test_retryable_errors():
+    rate_limited = json.dumps({"error": {"errors": [{"reason": "userRateLimitExceeded"}]}}).encode()
+    forbidden = json.dumps({"error": {"errors": [{"reason": "forbidden"}]}}).encode()
+    assert is_retryable(FakeHttpError(429)) and is_retryable(FakeHttpError(503))
+    assert is_retryable(FakeHttpError(403, rate_limited)) and not is_retryable(FakeHttpError(403, forbidden))
+    assert not is_retryable(FakeHttpError(404)) and not is_retryable(FakeHttpError(410))
+    assert is_retryable(ConnectionResetError()) and is_retryable(TimeoutError())
+    assert not is_retryable(ValueError())
+
+
+def test_retry_delay_honours_retry_after():
+    assert retry_delay(0, FakeHttpError(429, headers={"retry-after": "3"})) == 3.0
+    assert retry_delay(0, FakeHttpError(429, headers={"retry-after": "3600"})) == calendar_api.BACKOFF_MAX
+    for attempt in range(10):
+        assert 0 <= retry_delay(attempt, FakeHttpError(503)) <= min(calendar_api.BACKOFF_MAX, 0.0001 * 2 ** attempt)
+
+
+def test_token_bucket_keeps_threads_within_its_rate(rate=200, burst=10, requests=60):
+    bucket = TokenBucket(rate, burst)
+    started = clock.perf_counter()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: bucket.acquire(), range(requests)))
+    assert clock.perf_counter() - started >= (requests - burst) / rate * 0.95
+
+
+def test_token_bucket_try_acquire_does_not_wait():
+    bucket = TokenBucket(10, 2)
+    assert bucket.try_acquire() == 0 and bucket.try_acquire() == 0
+    assert 0 < bucket.try_acquire() <= 0.1
+
+
+class FakeClock:
+    """
+    Stand-in for the time module in calendar_api: sleeping moves the clock
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class CountingBucket(TokenBucket):
+    def __init__(self):
+        super().__init__(1e9, 10 ** 9)
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+        return super().acquire()
+
+
+@pytest.fixture
+def metadata_clock(monkeypatch):
+    fake_clock = FakeClock()
+    monkeypatch.setattr(calendar_api, "clock", fake_clock)
+    return fake_clock
+
+
+@pytest.fixture
+def calendars():
+    return FakeCalendarService({f"calendar{i}": [] for i in range(120)}, "Europe/Vienna")
+
+
+def test_metadata_probes_are_batched_with_one_token_per_batch(calendars, monkeypatch):
+    bucket = CountingBucket()
+    monkeypatch.setattr(calendar_api, "rate_limiter", bucket)
+    service = BatchingService(calendars)
+    ids = [f"calendar{i}" for i in range(120)]
+    metadata = fetch_calendar_metadata(service, ids + ids[:5], MetadataCache())
+    assert service.batches == [50, 50, 20] and bucket.acquired == 3
+    assert list(metadata) == ids
+    assert all(entry.is_valid and entry.time_zone == "Europe/Vienna" and entry.access_role == "reader"
+               for entry in metadata.values())
+
+
+def test_metadata_probes_without_batches_take_one_token_each(calendars, monkeypatch):
+    bucket = CountingBucket()
+    monkeypatch.setattr(calendar_api, "rate_limiter", bucket)
+    fetch_calendar_metadata(calendars, ["calendar1", "calendar2", "calendar3"], MetadataCache())
+    assert bucket.acquired == 3
+
+
+def test_batch_callback_failures(calendars, metadata_clock):
+    service = BatchingService(calendars, {"calendar1": [404], "calendar2": [503, 429]})
+    cache = MetadataCache()
+    metadata = fetch_calendar_metadata(service, ["calendar0", "calendar1", "calendar2"], cache)
+    assert metadata["calendar0"].is_valid
+    assert (metadata["calendar1"].is_valid, metadata["calendar1"].status) == (False, 404)
+    # Retried in batches of the failed calendars only
+    assert metadata["calendar2"].is_valid and service.batches == [3, 1, 1]
+    assert cache.get("calendar1").status == 404
+
+
+def test_a_failed_batch_round_trip_fails_its_probes(calendars):
+    class BrokenBatch:
+        def add(self, request, request_id):
+            pass
+
+        def execute(self):
+            raise FakeHttpError(400)
+
+    service = BatchingService(calendars)
+    service.new_batch_http_request = lambda callback: BrokenBatch()
+    metadata = fetch_calendar_metadata(service, ["calendar0", "calendar1"], MetadataCache())
+    assert [entry.status for entry in metadata.values()] == [400, 400]
+
+
+def test_transient_metadata_failures_are_not_cached(calendars, metadata_clock):
+    cache = MetadataCache()
+    service = BatchingService(calendars, {"calendar1": [503] * (calendar_api.MAX_RETRIES + 1)})
+    failed = fetch_calendar_metadata(service, ["calendar1"], cache)["calendar1"]
+    assert (failed.is_valid, failed.status) == (False, 503)
+    assert cache.get("calendar1") is None
+    assert fetch_calendar_metadata(service, ["calendar1"], cache)["calendar1"].is_valid
+
+
+def test_cached_errors_are_reused_unless_refused(calendars):
+    cache = MetadataCache()
+    service = BatchingService(calendars, {"calendar1": [403]})
+    assert fetch_calendar_metadata(service, ["calendar1"], cache)["calendar1"].status == 403
+    assert fetch_calendar_metadata(service, ["calendar1"], cache)["calendar1"].status == 403
+    assert fetch_calendar_metadata(service, ["calendar1"], cache, use_cached_errors=False)["calendar1"].is_valid
+    assert service.batches == [1, 1]
+
+
+def test_metadata_cache_ttl(calendars, metadata_clock):
+    cache = MetadataCache(ttl=60)
+    service = BatchingService(calendars)
+    fetch_calendar_metadata(service, ["calendar1"], cache)
+    metadata_clock.sleep(59)
+    fetch_calendar_metadata(service, ["calendar1"], cache)
+    assert service.batches == [1]
+    metadata_clock.sleep(2)
+    assert cache.get("calendar1") is None
+    fetch_calendar_metadata(service, ["calendar1"], cache)
+    assert service.batches == [1, 1]
+    cache.clear()
+    assert cache.get("calendar1") is None
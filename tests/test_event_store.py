@@ -0,0 +1,114 @@
+import threading
+import time as clock
+from datetime import datetime, timezone
+
+import pytest
+
+from event_store import ALL_DAY_MARGIN, EventStore
+from fakes import SyncingCalendarService, all_day_event, timed_event
+
+MARCH = (datetime(2025, 3, 1, tzinfo=timezone.utc), datetime(2025, 4, 1, tzinfo=timezone.utc))
+
+
+def shifts(days) -> list:
+    return [timed_event(f"shift{day}", f"2025-03-{day:02d}T08:00:00Z", f"2025-03-{day:02d}T16:00:00Z") for day in days]
+
+
+def timestamp(text: str) -> float:
+    return datetime.fromisoformat(text).timestamp()
+
+
+def event_ids(store: EventStore, calendar_id: str = "work") -> list:
+    return [event["id"] for event in store.query(calendar_id, *MARCH)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EventStore(str(tmp_path / "events.sqlite3"), min_sync_interval=0)
+    yield store
+    store.close()
+
+
+def test_full_sync_pages_through_every_event(store):
+    service = SyncingCalendarService({"work": shifts(range(1, 11))}, page_size=4)
+    assert store.sync(service, "work") == 3
+    assert event_ids(store) == [f"shift{day}" for day in range(1, 11)]
+    assert [event["id"] for event in store.query(
+        "work", datetime(2025, 3, 3, 12, tzinfo=timezone.utc), datetime(2025, 3, 5, tzinfo=timezone.utc)
+    )] == ["shift3", "shift4"]
+
+
+def test_incremental_sync_applies_changes_and_logs_their_spans(store):
+    service = SyncingCalendarService({"work": shifts(range(1, 11))})
+    store.sync(service, "work")
+    seq, _ = store.changes_since("work")
+    service.delete("work", "shift2")
+    service.put("work", timed_event("shift20", "2025-03-20T08:00:00Z", "2025-03-20T12:00:00Z"))
+    service.put("work", all_day_event("off25", "2025-03-25", "2025-03-26"))
+    assert store.sync(service, "work") == 1
+    assert service.requests[-1]["syncToken"] is not None
+    assert event_ids(store) == [f"shift{day}" for day in (1, *range(3, 11), 20)] + ["off25"]
+    _, spans = store.changes_since("work", seq)
+    assert sorted(spans) == [
+        (timestamp("2025-03-02T08:00:00+00:00"), timestamp("2025-03-02T16:00:00+00:00")),
+        (timestamp("2025-03-20T08:00:00+00:00"), timestamp("2025-03-20T12:00:00+00:00")),
+        (timestamp("2025-03-25T00:00:00+00:00") - ALL_DAY_MARGIN, timestamp("2025-03-26T00:00:00+00:00") + ALL_DAY_MARGIN),
+    ]
+
+
+def test_recently_synced_calendar_is_not_requested_again(tmp_path):
+    store = EventStore(str(tmp_path / "events.sqlite3"), min_sync_interval=60)
+    service = SyncingCalendarService({"work": shifts(range(1, 4))})
+    store.sync(service, "work")
+    assert store.sync(service, "work") == 0
+    assert len(service.requests) == 1
+    store.close()
+
+
+def test_expired_sync_token_falls_back_to_a_full_sync(store):
+    service = SyncingCalendarService({"work": shifts(range(1, 11))})
+    store.sync(service, "work")
+    seq, _ = store.changes_since("work")
+    service.expire_sync_tokens()
+    # Deleted while the token expired: only a full sync can notice
+    del service.calendars["work"]["shift2"]
+    assert store.sync(service, "work") == 1
+    assert [request["syncToken"] is not None for request in service.requests[-2:]] == [True, False]
+    assert "shift2" not in event_ids(store)
+    _, spans = store.changes_since("work", seq)
+    assert (None, None) in spans
+    # The new token is used from then on
+    store.sync(service, "work")
+    assert service.requests[-1]["syncToken"] is not None
+
+
+def test_clear_logs_a_whole_calendar_change_and_forces_a_full_sync(store):
+    service = SyncingCalendarService({"work": shifts(range(1, 4)), "vacation": []})
+    store.sync(service, "work")
+    store.sync(service, "vacation")
+    seq, _ = store.changes_since("work")
+    store.clear()
+    assert event_ids(store) == []
+    for calendar_id in ("work", "vacation"):
+        assert store.changes_since(calendar_id, seq)[1] == [(None, None)]
+    store.sync(service, "work")
+    assert service.requests[-1]["syncToken"] is None
+    assert event_ids(store) == ["shift1", "shift2", "shift3"]
+
+
+class SlowService(SyncingCalendarService):
+    def _page(self, *args):
+        clock.sleep(0.2)
+        return super()._page(*args)
+
+
+def test_calendars_sync_concurrently(store):
+    service = SlowService({"work": shifts(range(1, 4)), "vacation": [all_day_event("off", "2025-03-10", "2025-03-12")]})
+    threads = [threading.Thread(target=store.sync, args=(service, calendar_id)) for calendar_id in ("work", "vacation")]
+    started = clock.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert clock.perf_counter() - started < 0.35
+    assert event_ids(store) == ["shift1", "shift2", "shift3"] and event_ids(store, "vacation") == ["off"]
@@ -0,0 +1,131 @@
+import importlib
+import io
+import json
+import time as clock
+from datetime import date
+
+import pytest
+
+import instrumentation
+import run
+from fakes import SyncingCalendarService, all_day_event, timed_event
+from instrumentation import COUNTERS, STAGES, Metrics, configure, metrics_enabled, profiled, timed
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    # configure() and reloads change the module settings: restored after each test
+    monkeypatch.setattr(instrumentation, "PROFILER", instrumentation.PROFILER)
+    for name in ("METRICS_FORMAT", "METRICS_FILE", "PROFILE_DIR"):
+        monkeypatch.setattr(instrumentation, name, None)
+
+
+def test_timers_sum_over_calls_and_counters_add_up():
+    metrics = Metrics({"user": "Ana"})
+    with metrics.timer("fetch"):
+        clock.sleep(0.01)
+    metrics.add_time("fetch", 1.0)
+
+    @metrics.timer("shifts")
+    def parse():
+        return 3
+
+    assert parse() == 3
+    metrics.count("shifts", 3)
+    metrics.count("shifts")
+    metrics.count("api_pages", 2)
+    record = metrics.to_dict()
+    assert record["labels"] == {"user": "Ana"}
+    assert 1.01 <= record["stage_seconds"]["fetch"] < 1.5
+    assert set(record["stage_seconds"]) == {"fetch", "shifts"}
+    assert record["counters"] == {"shifts": 4, "api_pages": 2}
+
+
+def test_timed_method_uses_the_metrics_of_its_object():
+    class Stage:
+        def __init__(self):
+            self.metrics = Metrics()
+
+        @timed("figures")
+        def figures(self):
+            return "done"
+
+    stage = Stage()
+    assert stage.figures() == "done" and stage.figures.__name__ == "figures"
+    assert set(stage.metrics.to_dict()["stage_seconds"]) == {"figures"}
+
+
+def test_prometheus_output_escapes_labels():
+    metrics = Metrics({"user": 'Ana "A"\\B\nC', "start_date": "2025-03-01"})
+    metrics.add_time("fetch", 0.25)
+    metrics.count("api_pages", 2)
+    labels = 'user="Ana \\"A\\"\\\\B\\nC",start_date="2025-03-01"'
+    assert metrics.to_prometheus() == (
+        "# TYPE report_stage_seconds gauge\n"
+        f'report_stage_seconds{{{labels},stage="fetch"}} 0.25\n'
+        "# TYPE report_api_pages_total counter\n"
+        f"report_api_pages_total{{{labels}}} 2\n"
+    )
+    assert Metrics().to_prometheus().startswith('# TYPE report_stage_seconds gauge\n')
+    unlabelled = Metrics()
+    unlabelled.add_time("fetch", 1)
+    assert 'report_stage_seconds{stage="fetch"} 1' in unlabelled.to_prometheus()
+
+
+def test_emit_does_nothing_unless_enabled(capsys):
+    Metrics().emit()
+    assert capsys.readouterr().err == "" and not metrics_enabled()
+    output = io.StringIO()
+    Metrics({"user": "Ana"}).emit("json", output)
+    assert json.loads(output.getvalue())["labels"] == {"user": "Ana"}
+
+
+def test_configure(tmp_path):
+    metrics_file = tmp_path / "metrics.jsonl"
+    configure("prometheus", str(metrics_file))
+    assert metrics_enabled() and instrumentation.METRICS_FORMAT == "prometheus"
+    Metrics({"user": "Ana"}).emit()
+    assert metrics_file.read_text().startswith("# TYPE report_stage_seconds gauge")
+    # None leaves a setting as it is
+    configure(profiler="pyinstrument")
+    assert instrumentation.METRICS_FORMAT == "prometheus" and instrumentation.METRICS_FILE == str(metrics_file)
+    with pytest.raises(ValueError):
+        configure("xml")
+    with pytest.raises(ValueError):
+        configure(profiler="perf")
+
+
+def test_profiled_writes_one_dump_per_block(tmp_path):
+    with profiled("report"):
+        pass
+    assert not list(tmp_path.iterdir())
+    configure(profile_dir=str(tmp_path / "profiles"))
+    with profiled("report Ana/2025"):
+        sum(range(1000))
+    dump, = (tmp_path / "profiles").iterdir()
+    assert dump.name.startswith("report_Ana_2025-") and dump.suffix == ".prof"
+
+
+def test_report_records_its_stages_and_counters(monkeypatch, tmp_path):
+    metrics_file = tmp_path / "metrics.jsonl"
+    monkeypatch.setenv("REPORT_METRICS", "json")
+    monkeypatch.setenv("REPORT_METRICS_FILE", str(metrics_file))
+    # The settings are read on import
+    importlib.reload(instrumentation)
+    service = SyncingCalendarService({
+        "work": [timed_event(f"shift{day}", f"2025-03-{day:02d}T09:00:00+01:00", f"2025-03-{day:02d}T17:00:00+01:00")
+                 for day in range(3, 8)] + [timed_event("meeting", "2025-03-03T10:00:00+01:00", "2025-03-03T11:00:00+01:00",
+                                                        "Meeting")],
+        "vacation": [all_day_event("vacation", "2025-03-10", "2025-03-12", "Urlaub")],
+    })
+    run.Report(run.User("Ana", "AT", 40, [0, 1, 2, 3, 4]),
+               run.WorkCalendar("work", "work", service=service, time_zone="Europe/Vienna"),
+               run.VacationCalendar("vacation", "urlaub", service=service, time_zone="Europe/Vienna"),
+               run.HolidayCalendar("AT"), date(2025, 3, 1), date(2025, 3, 31))
+    record, = [json.loads(line) for line in metrics_file.read_text().splitlines()]
+    assert record["labels"] == {"user": "Ana", "start_date": "2025-03-01", "end_date": "2025-03-31"}
+    assert set(record["stage_seconds"]) == set(STAGES)
+    assert set(record["counters"]) == set(COUNTERS)
+    assert record["counters"]["api_pages"] == 2
+    assert record["counters"]["events_seen"] == 7 and record["counters"]["events_matched"] == 6
+    assert record["counters"]["shifts"] == 5
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from reference import overlapping_shifts, slot_union_hours
+from intervals import clip, hours_between
+from run import Shift, summarise_shifts
+
+
+def test_sweep_union_matches_half_hour_slots():
+    shifts = overlapping_shifts(20_000)
+    totals = summarise_shifts(shifts)
+    assert totals.hours == slot_union_hours(shifts)
+    assert totals.raw_hours == sum(shift.duration for shift in shifts)
+    assert abs(sum(totals.overlap_hours_by_day.values()) - totals.overlap_hours) < 1e-6
+
+
+def test_fall_back_night_orders_shifts_by_instant():
+    vienna = ZoneInfo("Europe/Vienna")
+    first = Shift("A", datetime(2025, 10, 26, 1, 30, tzinfo=vienna), datetime(2025, 10, 26, 2, 30, tzinfo=vienna), 1.0, False)
+    second = Shift("B", datetime(2025, 10, 26, 2, 15, fold=1, tzinfo=vienna), datetime(2025, 10, 26, 3, 0, tzinfo=vienna), 0.75, False)
+    assert first.end.utcoffset() == timedelta(hours=2) and second.start.utcoffset() == timedelta(hours=1)
+    for shifts in ([first, second], [second, first]):
+        totals = summarise_shifts(shifts)
+        assert totals.raw_hours == 1.75
+        assert totals.hours == 1.75
+        assert totals.overlap_hours == 0
+        assert totals.overlap_hours_by_day == {}
+    assert summarise_shifts([first, second], presorted=True).hours == 1.75
+
+
+def test_clip_compares_instants_on_the_fall_back_night():
+    vienna = ZoneInfo("Europe/Vienna")
+    range_start = datetime(2025, 10, 26, 2, 15, fold=1, tzinfo=vienna)
+    range_end = datetime(2025, 10, 27, tzinfo=vienna)
+    assert clip(datetime(2025, 10, 26, 1, 30, tzinfo=vienna), datetime(2025, 10, 26, 2, 30, tzinfo=vienna), range_start, range_end) is None
+    clipped_start, clipped_end = clip(datetime(2025, 10, 26, 2, 30, tzinfo=vienna), datetime(2025, 10, 26, 2, 45, fold=1, tzinfo=vienna), range_start, range_end)
+    assert hours_between(clipped_start, clipped_end) == 0.5
@@ -0,0 +1,98 @@
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import calendar_api
+import run
+from calendar_api import CalendarFetchError, MetadataCache
+from fakes import FlakyService, all_day_event, timed_event
+from intervals import clip, hours_between, period_bounds, split_by_day
+from synthetic_calendar import FakeCalendarService
+
+VIENNA = ZoneInfo("Europe/Vienna")
+MARCH = (date(2025, 3, 1), date(2025, 3, 31))
+
+
+@pytest.fixture(autouse=True)
+def metadata_cache(monkeypatch):
+    cache = MetadataCache()
+    monkeypatch.setattr(calendar_api, "metadata_cache", cache)
+    return cache
+
+
+def work_calendar(events, time_zone="Europe/Vienna"):
+    service = FakeCalendarService({"work": events}, time_zone)
+    return run.WorkCalendar("work", "work", service=service, time_zone=time_zone)
+
+
+def worked(calendar, start_date, end_date):
+    return calendar.calculate_worked_hours(start_date, end_date), calendar.calculate_worked_days(start_date, end_date)
+
+
+def test_period_bounds_are_local_midnights_over_dst():
+    start, end = period_bounds(*MARCH, VIENNA)
+    assert start == datetime(2025, 3, 1, tzinfo=VIENNA) and start.utcoffset() == timedelta(hours=1)
+    assert end == datetime(2025, 4, 1, tzinfo=VIENNA) and end.utcoffset() == timedelta(hours=2)
+    # Spring forward: March has an hour less
+    assert hours_between(start, end) == 31 * 24 - 1
+    assert period_bounds(datetime(2025, 3, 1, 12), datetime(2025, 3, 31, 12), VIENNA) == (start, end)
+
+
+def test_clip_keeps_the_part_inside_the_range():
+    range_start, range_end = period_bounds(*MARCH, VIENNA)
+    inside = (datetime(2025, 3, 3, 8, tzinfo=VIENNA), datetime(2025, 3, 3, 16, tzinfo=VIENNA))
+    assert clip(*inside, range_start, range_end) == inside
+    night = (datetime(2025, 2, 28, 21, tzinfo=timezone.utc), datetime(2025, 3, 1, 5, tzinfo=timezone.utc))
+    assert clip(*night, range_start, range_end) == (range_start, night[1])
+    assert clip(datetime(2025, 2, 27, 8, tzinfo=VIENNA), datetime(2025, 2, 27, 16, tzinfo=VIENNA), range_start, range_end) is None
+    assert clip(range_end, range_end + timedelta(hours=8), range_start, range_end) is None
+
+
+def test_split_by_day_over_the_spring_forward_night():
+    segments = list(split_by_day(datetime(2025, 3, 29, 22, tzinfo=VIENNA), datetime(2025, 3, 30, 6, tzinfo=VIENNA)))
+    assert [day for day, _, _ in segments] == [date(2025, 3, 29), date(2025, 3, 30)]
+    assert [hours_between(start, end) for _, start, end in segments] == [2.0, 5.0]
+
+
+def test_night_shifts_count_one_worked_day_on_their_start_day():
+    calendar = work_calendar([
+        timed_event("feb", "2025-02-28T22:00:00+01:00", "2025-03-01T06:00:00+01:00"),
+        timed_event("n1", "2025-03-10T22:00:00+01:00", "2025-03-11T06:00:00+01:00"),
+        timed_event("n2", "2025-03-11T22:00:00+01:00", "2025-03-12T06:00:00+01:00"),
+    ])
+    # The night from February counts its March hours but is worked in February
+    assert worked(calendar, *MARCH) == (22.0, 2)
+    assert worked(calendar, date(2025, 2, 1), date(2025, 2, 28)) == (2.0, 1)
+
+
+def test_vacation_days_are_local_days_of_the_calendar():
+    service = FakeCalendarService({"vacation": [
+        # 00:30 - 09:00 in Vienna, the 11th only
+        timed_event("late", "2025-03-10T23:30:00Z", "2025-03-11T08:00:00Z", "Urlaub"),
+        # Ends at local midnight, which isn't a day of the event
+        timed_event("day", "2025-03-20T00:00:00+01:00", "2025-03-21T00:00:00+01:00", "Urlaub"),
+        all_day_event("week", "2025-03-28", "2025-04-02", "Urlaub"),
+    ]})
+    calendar = run.VacationCalendar("vacation", "urlaub", service=service, time_zone="Europe/Vienna")
+    assert calendar.get_vacation_days(*MARCH) == {
+        date(2025, 3, 11), date(2025, 3, 20), date(2025, 3, 28), date(2025, 3, 29), date(2025, 3, 30), date(2025, 3, 31)
+    }
+
+
+def test_report_days_follow_the_calendar_time_zone():
+    shift = timed_event("late", "2025-03-31T23:30:00+00:00", "2025-04-01T03:00:00+00:00")
+    # 01:30 - 05:00 on April 1st in Vienna, 23:30 - 03:00 from March 31st in UTC
+    assert worked(work_calendar([shift]), *MARCH) == (0, 0)
+    assert worked(work_calendar([shift], "UTC"), *MARCH) == (0.5, 1)
+
+
+def test_time_zone_failures_are_not_remembered(monkeypatch):
+    monkeypatch.setattr(calendar_api.clock, "sleep", lambda seconds: None)
+    service = FakeCalendarService({"work": []}, "America/New_York")
+    calendar = run.WorkCalendar("work", "work", service=FlakyService(service, 1.0, statuses=(503,)))
+    with pytest.raises(CalendarFetchError):
+        calendar.get_zone()
+    assert calendar.time_zone is None
+    calendar.service = service
+    assert calendar.get_zone() == ZoneInfo("America/New_York")
@@ -0,0 +1,84 @@
+from datetime import date
+
+import pytest
+
+import run
+from event_store import EventStore
+from fakes import FakeRequest, SyncingCalendarService, timed_event
+from synthetic_calendar import FakeCalendarService
+from title_matcher import TitleMatcher, get_title_matcher
+
+MARCH = (date(2025, 3, 1), date(2025, 3, 31))
+EVENTS = [
+    timed_event("shift", "2025-03-03T09:00:00+01:00", "2025-03-03T17:00:00+01:00", "Early shift"),
+    timed_event("night", "2025-03-04T22:00:00+01:00", "2025-03-05T06:00:00+01:00", "Night SHIFT"),
+    # Found by the API's search in the description, not by the title filter
+    {**timed_event("handover", "2025-03-05T08:00:00+01:00", "2025-03-05T09:00:00+01:00", "Handover"),
+     "description": "shift notes"},
+    # The title contains the keyword inside a word, which the API's word search misses
+    timed_event("swap", "2025-03-06T09:00:00+01:00", "2025-03-06T17:00:00+01:00", "Nightshift cover"),
+    timed_event("meeting", "2025-03-07T10:00:00+01:00", "2025-03-07T11:00:00+01:00", "Team meeting"),
+]
+
+
+class RecordingService:
+    """
+    Wraps a stand-in service, recording the parameters of every events().list
+    """
+    def __init__(self, service):
+        self.service = service
+        self.params = []
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        self.params.append(params)
+        request = self.service.events().list(**params)
+        return FakeRequest(request.execute)
+
+
+def calendar(service, title_filter="shift", **options):
+    return run.WorkCalendar("work", title_filter, service=service, time_zone="Europe/Vienna", **options)
+
+
+@pytest.mark.parametrize("title_filter, query", [
+    ("Shift", "shift"),
+    ({"include": ["shift"], "exclude": ["cancelled"]}, "shift"),
+    ({"include": ["shift", "dienst"]}, None),
+    ({"include": ["shift"], "include_regex": ["^night"]}, None),
+    ({"exclude": ["cancelled"]}, None),
+    (None, None),
+])
+def test_only_a_single_include_keyword_is_pushed_down(title_filter, query):
+    assert get_title_matcher(title_filter).server_query == query
+    service = RecordingService(FakeCalendarService({"work": EVENTS}))
+    calendar(service, title_filter, query_pushdown=True).get_snapshot(*MARCH)
+    assert [params.get("q") for params in service.params] == [query]
+
+
+def test_pushdown_is_off_by_default():
+    service = RecordingService(FakeCalendarService({"work": EVENTS}))
+    calendar(service).get_snapshot(*MARCH)
+    assert "q" not in service.params[0]
+
+
+def test_pushed_down_results_still_pass_the_local_filter():
+    api = FakeCalendarService({"work": EVENTS})
+    pushed = calendar(api, query_pushdown=True).get_snapshot(*MARCH)
+    local = calendar(api).get_snapshot(*MARCH)
+    # The API returned the handover for its description, the local filter dropped it
+    assert pushed.events_seen == 3 and local.events_seen == 5
+    assert [event["id"] for event in pushed.events] == ["shift", "night"]
+    assert [event["id"] for event in local.events] == ["shift", "night", "swap"]
+    assert all(TitleMatcher(["shift"]).matches(event["summary"]) for event in pushed.events)
+
+
+def test_no_query_with_the_event_store(tmp_path):
+    store = EventStore(str(tmp_path / "events.sqlite3"), min_sync_interval=0)
+    service = SyncingCalendarService({"work": EVENTS})
+    snapshot = calendar(service, event_store=store, query_pushdown=True).get_snapshot(*MARCH)
+    store.close()
+    # The store keeps every event of the calendar, the title filter runs locally
+    assert service.requests and all(request.get("q") is None for request in service.requests)
+    assert [event["id"] for event in snapshot.events] == ["shift", "night", "swap"]
@@ -0,0 +1,98 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from report import SHIFT_SCHEMA, SUMMARY_SCHEMA, RecordWriter, open_path, open_writer, shift_records
+from run import Shift
+
+VIENNA = ZoneInfo("Europe/Vienna")
+SHIFTS = [
+    Shift("Night shift", datetime(2025, 3, 3, 22, tzinfo=VIENNA), datetime(2025, 3, 4, 6, tzinfo=VIENNA), 8.0, False),
+    Shift("Training", "2025-03-05", "2025-03-06", 8.0, True),
+]
+ROWS = [
+    {"name": "Ana", "start_date": "2025-03-01", "end_date": "2025-03-31", "expected_hours": 160.0,
+     "actual_hours": 150.5, "raw_hours": 152, "overlap_hours": 1.5, "difference": -9.5, "expected_days": 20,
+     "actual_days": 19, "vacation_days": 1, "holiday_days": 0, "total_days_off": 1, "api_pages_requested": 2},
+    {"name": "Ben", "start_date": "2025-03-01", "end_date": "2025-03-31", "error": "Calendar not found"},
+]
+
+
+def test_shift_records():
+    night, training = shift_records("Ana", SHIFTS)
+    assert night == {"name": "Ana", "date": date(2025, 3, 3), "start": SHIFTS[0].start, "end": SHIFTS[0].end,
+                     "hours": 8.0, "title": "Night shift", "all_day": False}
+    assert training == {"name": "Ana", "date": "2025-03-05", "start": None, "end": None,
+                        "hours": 8.0, "title": "Training", "all_day": True}
+
+
+def test_csv_writer():
+    output = io.StringIO()
+    with open_writer(output, "csv", SUMMARY_SCHEMA, chunk_size=1) as writer:
+        assert writer.write(ROWS) == 2
+    rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+    assert list(rows[0]) == [name for name, _ in SUMMARY_SCHEMA]
+    assert rows[0]["raw_hours"] == "152.0" and rows[0]["error"] == ""
+    assert rows[1]["actual_hours"] == "" and rows[1]["error"] == "Calendar not found"
+
+
+def test_json_lines_writer_has_utc_timestamps():
+    output = io.StringIO()
+    writer = open_writer(output, "jsonl", SHIFT_SCHEMA)
+    writer.write(shift_records("Ana", SHIFTS))
+    writer.write(shift_records("Ben", SHIFTS[:1]))
+    assert writer.rows_written == 3
+    night, training, _ = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert list(night) == [name for name, _ in SHIFT_SCHEMA]
+    assert night["start"] == "2025-03-03T21:00:00+00:00" and night["end"] == "2025-03-04T05:00:00+00:00"
+    assert night["date"] == "2025-03-03"
+    assert training["start"] is None and training["date"] == "2025-03-05" and training["all_day"] is True
+
+
+def test_parquet_writer(tmp_path):
+    pyarrow = pytest.importorskip("pyarrow")
+    parquet = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "shifts.parquet")
+    with open_path(path, "parquet", SHIFT_SCHEMA, chunk_size=1) as writer:
+        writer.write(shift_records("Ana", SHIFTS))
+    file = parquet.ParquetFile(path)
+    assert file.num_row_groups == 2
+    table = file.read()
+    assert table.schema.names == [name for name, _ in SHIFT_SCHEMA]
+    assert table.schema.field("date").type == pyarrow.date32()
+    assert table.schema.field("start").type == pyarrow.timestamp("us", tz="UTC")
+    assert table.schema.field("hours").type == pyarrow.float64()
+    assert table.schema.field("all_day").type == pyarrow.bool_()
+    night, training = table.to_pylist()
+    assert night["start"] == datetime(2025, 3, 3, 21, tzinfo=timezone.utc)
+    assert training["date"] == date(2025, 3, 5) and training["end"] is None
+
+
+def test_parquet_summary_schema(tmp_path):
+    pytest.importorskip("pyarrow")
+    parquet = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "reports.parquet")
+    with open_path(path, "parquet", SUMMARY_SCHEMA) as writer:
+        writer.write(ROWS)
+    first, second = parquet.read_table(path).to_pylist()
+    assert first["start_date"] == date(2025, 3, 1) and first["api_pages_requested"] == 2
+    assert second["expected_hours"] is None and second["error"] == "Calendar not found"
+
+
+def test_open_path_closes_its_file(tmp_path):
+    path = tmp_path / "reports.csv"
+    with open_path(str(path), "csv", SUMMARY_SCHEMA) as writer:
+        writer.write(ROWS[:1])
+    assert writer._owned_file.closed
+    assert path.read_text(encoding="utf-8").splitlines()[1].startswith("Ana,2025-03-01,2025-03-31,160.0")
+
+
+def test_unknown_format_and_abstract_writer():
+    with pytest.raises(ValueError):
+        open_writer(io.StringIO(), "xlsx", SUMMARY_SCHEMA)
+    with pytest.raises(TypeError):
+        RecordWriter(io.StringIO(), SUMMARY_SCHEMA)
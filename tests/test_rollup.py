@@ -0,0 +1,121 @@
+from datetime import date
+
+import pytest
+
+import run
+from event_store import EventStore
+from fakes import SyncingCalendarService, all_day_event, timed_event
+from rollup import RollupStore
+
+MARCH = (date(2025, 3, 1), date(2025, 3, 31))
+SHIFTS = [timed_event(f"shift{day}", f"2025-03-{day:02d}T09:00:00+01:00", f"2025-03-{day:02d}T17:00:00+01:00")
+          for day in range(1, 29)]
+ALL_DAY_SHIFTS = [all_day_event("training", "2025-03-10", "2025-03-17", "Work training"),
+                  all_day_event("seminar", "2025-02-27", "2025-03-05", "Work seminar")]
+VACATIONS = [all_day_event("vacation", "2025-03-10", "2025-03-12", "Urlaub")]
+
+
+@pytest.fixture
+def service():
+    return SyncingCalendarService({"work": SHIFTS + ALL_DAY_SHIFTS, "vacation": VACATIONS})
+
+
+@pytest.fixture
+def event_store(tmp_path):
+    store = EventStore(str(tmp_path / "events.sqlite3"), min_sync_interval=0)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def rollup_store(tmp_path, monkeypatch):
+    store = RollupStore(str(tmp_path / "rollup.sqlite3"))
+    monkeypatch.setattr(run, "_rollup_store", store)
+    yield store
+    store.close()
+
+
+class Roster:
+    """
+    The calendars of one user, to query the stored rollup and fresh reports with
+    """
+    def __init__(self, service, event_store):
+        self.service = service
+        self.event_store = event_store
+        self.user = run.User("Ana", "AT", 40, [0, 1, 2, 3, 4])
+        self.calendars = self.new_calendars()
+
+    def new_calendars(self):
+        return (
+            run.WorkCalendar("work", "work", self.event_store, self.service, "Europe/Vienna"),
+            run.VacationCalendar("vacation", "urlaub", self.event_store, self.service, "Europe/Vienna"),
+        )
+
+    def stored(self, start_date: date, end_date: date) -> dict:
+        rollup = run.get_stored_rollup(self.user, *self.calendars, run.HolidayCalendar("AT"), start_date, end_date, "8hr")
+        return {**rollup.to_dict(start_date, end_date), "api_pages_requested": None}
+
+    def fresh(self, start_date: date, end_date: date) -> dict:
+        report = run.Report(self.user, *self.new_calendars(), run.HolidayCalendar("AT"), start_date, end_date, "8hr")
+        return {**report.to_dict(), "api_pages_requested": None}
+
+
+@pytest.fixture
+def roster(service, event_store, rollup_store):
+    return Roster(service, event_store)
+
+
+def test_rollup_matches_fresh_reports(roster):
+    assert roster.stored(*MARCH) == roster.fresh(*MARCH)
+    week = (date(2025, 3, 17), date(2025, 3, 23))
+    requests = len(roster.service.requests)
+    stored = roster.stored(*week)
+    # Answered from the rollup after one incremental sync per calendar
+    assert len(roster.service.requests) - requests == 2
+    assert stored == roster.fresh(*week)
+
+
+def test_changed_days_are_recomputed(roster):
+    roster.stored(*MARCH)
+    roster.service.delete("work", "shift5")
+    roster.service.put("work", timed_event("extra", "2025-03-20T12:00:00Z", "2025-03-20T20:00:00Z"))
+    roster.service.put("vacation", all_day_event("vacation2", "2025-03-25", "2025-03-26", "Urlaub"))
+    assert roster.stored(*MARCH) == roster.fresh(*MARCH)
+    assert roster.stored(date(2025, 3, 1), date(2025, 4, 30)) == roster.fresh(date(2025, 3, 1), date(2025, 4, 30))
+
+
+def test_changed_days_inside_an_all_day_shift(roster):
+    roster.stored(*MARCH)
+    # Recomputes March 12, in the middle of the training (March 10 to 16)
+    roster.service.put("work", timed_event("shift12", "2025-03-12T08:00:00+01:00", "2025-03-12T18:00:00+01:00"))
+    assert roster.stored(*MARCH) == roster.fresh(*MARCH)
+
+
+@pytest.mark.parametrize("periods", [
+    [MARCH, (date(2025, 2, 20), date(2025, 3, 31))],
+    [(date(2025, 2, 20), date(2025, 3, 31)), MARCH],
+    [(date(2025, 3, 12), date(2025, 3, 20)), (date(2025, 2, 28), date(2025, 3, 12)), MARCH],
+])
+def test_periods_crossing_all_day_shifts_in_any_order(roster, periods):
+    # The seminar (Feb 27 to March 4) and the training (March 10 to 16) count on their first day
+    for period in periods:
+        assert roster.stored(*period) == roster.fresh(*period)
+    for period in [MARCH, (date(2025, 3, 1), date(2025, 3, 9)), (date(2025, 3, 11), date(2025, 3, 31)),
+                   (date(2025, 2, 27), date(2025, 2, 28))]:
+        assert roster.stored(*period) == roster.fresh(*period)
+    assert roster.fresh(*MARCH)["actual_hours"] == 28 * 8 + 8
+
+
+def test_rollup_is_reloaded_from_sqlite(roster, rollup_store, monkeypatch):
+    roster.stored(*MARCH)
+    reopened = RollupStore(rollup_store.path)
+    monkeypatch.setattr(run, "_rollup_store", reopened)
+    assert roster.stored(*MARCH) == roster.fresh(*MARCH)
+    reopened.close()
+
+
+def test_events_forgotten_by_the_event_store_leave_the_rollup(roster):
+    roster.stored(*MARCH)
+    roster.event_store.clear()
+    del roster.service.calendars["work"]["training"]
+    assert roster.stored(*MARCH) == roster.fresh(*MARCH)
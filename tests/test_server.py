@@ -0,0 +1,121 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+from batch import BatchRunner
+from calendar_api import fetch_calendar_metadata
+from server import ReportServer, ReportService, synthetic_service
+from synthetic_calendar import VACATION_TITLE, WORK_TITLE
+
+CONFIG = {
+    "defaults": {"country": "AT", "weekdays": "mon-fri", "all_day_policy": "8hr"},
+    "users": [{
+        "name": name,
+        "weekly_contract_hours": 38.5,
+        "work_calendar": {"id": f"{name.lower()}@synthetic", "title_filter": WORK_TITLE},
+        "vacation_calendar": {"id": "team@synthetic", "title_filter": VACATION_TITLE},
+    } for name in ("Ana", "Ben")],
+}
+MARCH = {"user": "Ana", "start": "2024-03-01", "end": "2024-03-31"}
+
+
+def figures(rows: list) -> list:
+    # Pages are only requested by the first report of a period
+    return [{**row, "api_pages_requested": None} for row in rows]
+
+
+@pytest.fixture(scope="module")
+def calendar_service():
+    return synthetic_service(CONFIG)
+
+
+@pytest.fixture
+def server(calendar_service):
+    # A new report service each time, so every test starts with cold calendars
+    server = ReportServer(("127.0.0.1", 0), ReportService(CONFIG, calendar_service), 4, access_log=False)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server: ReportServer, path: str, params: dict = None):
+    """
+    To return the status and JSON body of a GET request
+    """
+    query = "?" + "&".join(f"{name}={value}" for name, value in params.items()) if params else ""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}{path}{query}") as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_report_matches_the_batch_rows(server, calendar_service):
+    status, body = get(server, "/report", MARCH)
+    assert status == 200
+    expected = BatchRunner(CONFIG, service=calendar_service).run_job({
+        "user": CONFIG["users"][0], "periods": [(date(2024, 3, 1), date(2024, 3, 31))],
+        "all_day_policy": "8hr", "split": None,
+    })
+    assert figures(body["rows"]) == figures(json.loads(json.dumps(expected)))
+
+
+def test_warm_calendars_need_no_api_request(server, calendar_service):
+    get(server, "/report", MARCH)
+    requests = calendar_service.requests
+    status, body = get(server, "/report", {**MARCH, "user": "ana"})
+    assert status == 200 and body["rows"][0]["api_pages_requested"] == 0
+    assert calendar_service.requests == requests
+
+
+def test_concurrent_requests_fetch_a_period_once(server, calendar_service):
+    # Calendar metadata is cached for the process: read it beforehand so only pages are counted
+    fetch_calendar_metadata(calendar_service, ["ana@synthetic", "team@synthetic"])
+    requests = calendar_service.requests
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        bodies = list(executor.map(lambda _: get(server, "/report", MARCH)[1], range(8)))
+    assert all(figures(body["rows"]) == figures(bodies[0]["rows"]) for body in bodies)
+    # Each page is counted once, by the report that requested it
+    assert sum(body["rows"][0]["api_pages_requested"] for body in bodies) == calendar_service.requests - requests > 0
+
+
+def test_split_returns_a_row_per_month(server):
+    status, body = get(server, "/report", {**MARCH, "end": "2024-05-31", "split": "month"})
+    assert status == 200
+    assert [(row["start_date"], row["end_date"]) for row in body["rows"][1:]] == [
+        ("2024-03-01", "2024-03-31"), ("2024-04-01", "2024-04-30"), ("2024-05-01", "2024-05-31")]
+
+
+@pytest.mark.parametrize("path, params, status", [
+    ("/report", {**MARCH, "user": "Zoe"}, 404),
+    ("/report", {"user": "Ana", "start": "2024-03-01"}, 400),
+    ("/report", {**MARCH, "start": "March"}, 400),
+    ("/report", {**MARCH, "split": "year"}, 400),
+    ("/unknown", None, 404),
+])
+def test_invalid_requests(server, path, params, status):
+    assert get(server, path, params)[0] == status
+
+
+def test_health_and_metrics(server):
+    assert get(server, "/health") == (200, {"status": "ok"})
+    get(server, "/report", MARCH)
+    get(server, "/report", {**MARCH, "user": "Zoe"})
+    status, metrics = get(server, "/metrics")
+    assert status == 200
+    assert (metrics["requests"], metrics["errors"], metrics["workers"]) == (2, 1, 4)
+    assert 0 < metrics["p50_ms"] <= metrics["p99_ms"]
+
+
+def test_expired_snapshots_are_fetched_again(calendar_service):
+    report_service = ReportService(CONFIG, calendar_service, cache_seconds=0)
+    first = report_service.report(MARCH)
+    requests = calendar_service.requests
+    assert figures(report_service.report(MARCH)) == figures(first)
+    assert calendar_service.requests > requests
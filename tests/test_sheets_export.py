@@ -0,0 +1,78 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+import calendar_api
+from fakes import FakeHttpError, FakeSpreadsheet
+from run import Shift
+from sheets_export import SHIFT_FIELDS, SUMMARY_FIELDS, SheetsExporter, worksheet_title
+
+START = datetime(2025, 3, 1, 8, tzinfo=timezone.utc)
+
+
+def work_shifts(count: int) -> list:
+    return [Shift("Work shift", START + timedelta(days=i), START + timedelta(days=i, hours=8), 8.0, False)
+            for i in range(count)]
+
+
+def export(spreadsheet: FakeSpreadsheet, users: int, shift_count: int) -> int:
+    exporter = SheetsExporter(spreadsheet, writes_per_minute=1e9)
+    for user in range(users):
+        exporter.add_shifts(f"user{user}", date(2025, 3, 1), date(2025, 3, 31), work_shifts(shift_count))
+        exporter.add_summary_rows([{"name": f"user{user}", "actual_hours": 8.0 * shift_count}])
+    return exporter.flush()
+
+
+def test_roster_export_writes_each_worksheet_once(users=50):
+    spreadsheet = FakeSpreadsheet()
+    # New worksheets: one add_worksheet and one update each, then the summary (created and appended)
+    assert export(spreadsheet, users, 20) == users * 2 + 2
+    assert spreadsheet.reads == 1
+    summary = spreadsheet.sheets["Summary"].values
+    assert summary[0] == SUMMARY_FIELDS and len(summary) == users + 1
+
+
+def test_re_export_overwrites_the_previous_shifts(users=50):
+    spreadsheet = FakeSpreadsheet()
+    export(spreadsheet, users, 20)
+    assert export(spreadsheet, users, 5) == users + 1
+    sheet = spreadsheet.sheets["user0 2025-03-01 - 2025-03-31"]
+    assert len([row for row in sheet.values if any(row)]) == 6
+    # Summary rows are appended, the header written once
+    assert len(spreadsheet.sheets["Summary"].values) == 2 * users + 1
+
+
+def test_shift_and_summary_rows():
+    spreadsheet = FakeSpreadsheet()
+    exporter = SheetsExporter(spreadsheet, writes_per_minute=1e9)
+    exporter.add_shifts("Ana", date(2025, 3, 1), date(2025, 3, 31), [
+        work_shifts(1)[0], Shift("Training", date(2025, 3, 3), date(2025, 3, 3), 8.0, True)
+    ])
+    exporter.add_summary_rows([{"name": "Ana", "actual_hours": 8.0}, {"name": "Ben", "error": "HTTP 404"}])
+    exporter.flush()
+    assert spreadsheet.sheets["Ana 2025-03-01 - 2025-03-31"].values == [
+        SHIFT_FIELDS,
+        ["2025-03-01", "08:00", "16:00", 8.0, "Work shift", False],
+        [date(2025, 3, 3), "", "", 8.0, "Training", True],
+    ]
+    assert [row[0] for row in spreadsheet.sheets["Summary"].values[1:]] == ["Ana"]
+
+
+def test_worksheet_title_drops_rejected_characters():
+    assert worksheet_title("a/b [c]: d?", date(2025, 3, 1), date(2025, 3, 31)) == "a b  c   d  2025-03-01 - 2025-03-31"
+    assert len(worksheet_title("x" * 200, date(2025, 3, 1), date(2025, 3, 31))) == 100
+
+
+def test_rate_limited_writes_are_retried(monkeypatch):
+    monkeypatch.setattr(calendar_api, "BACKOFF_BASE", 0.0001)
+    spreadsheet = FakeSpreadsheet()
+    spreadsheet.failures = [FakeHttpError(429), FakeHttpError(503)]
+    assert export(spreadsheet, 1, 3) == 6
+    assert len(spreadsheet.sheets["user0 2025-03-01 - 2025-03-31"].values) == 4
+
+
+def test_other_write_errors_raise():
+    spreadsheet = FakeSpreadsheet()
+    spreadsheet.failures = [FakeHttpError(400)]
+    with pytest.raises(FakeHttpError):
+        export(spreadsheet, 1, 3)
@@ -0,0 +1,73 @@
+from datetime import date
+
+import run
+from fakes import SyncingCalendarService, timed_event
+
+MARCH = (date(2025, 3, 1), date(2025, 3, 31))
+USER = run.User("Ana", "AT", 40, [0, 1, 2, 3, 4])
+
+
+def calendars(service):
+    return (run.WorkCalendar("work", "work", service=service, time_zone="Europe/Vienna"),
+            run.VacationCalendar("vacation", "urlaub", service=service, time_zone="Europe/Vienna"))
+
+
+def report(calendars, **options):
+    return run.Report(USER, *calendars, run.HolidayCalendar("AT"), *MARCH, "8hr", **options)
+
+
+def service():
+    return SyncingCalendarService({
+        "work": [timed_event("shift", "2025-03-03T09:00:00+01:00", "2025-03-03T17:00:00+01:00")],
+        "vacation": [],
+    })
+
+
+def test_one_fetch_per_report_and_calendar():
+    api = service()
+    first = report(calendars(api))
+    assert len(api.requests) == 2 and first.api_pages_requested == 2
+    assert first.to_dict()["actual_hours"] == 8.0
+
+
+def test_a_new_report_reads_calendar_edits():
+    api = service()
+    reused = calendars(api)
+    assert report(reused).to_dict()["actual_hours"] == 8.0
+    api.put("work", timed_event("extra", "2025-03-04T09:00:00+01:00", "2025-03-04T13:00:00+01:00"))
+    # As on a re-run of run_report_loop with the same calendars
+    again = report(reused)
+    assert again.to_dict()["actual_hours"] == 12.0
+    assert again.api_pages_requested == 2
+
+
+def test_reused_snapshots_are_not_fetched_again():
+    api = service()
+    reused = calendars(api)
+    report(reused)
+    api.put("work", timed_event("extra", "2025-03-04T09:00:00+01:00", "2025-03-04T13:00:00+01:00"))
+    again = report(reused, reuse_snapshots=True)
+    assert again.to_dict()["actual_hours"] == 8.0
+    assert again.api_pages_requested == 0 and len(api.requests) == 2
+
+
+def test_figures_come_from_the_snapshots_received(monkeypatch):
+    api = service()
+    work_calendar, vacation_calendar = calendars(api)
+
+    def cleared(calendar):
+        fetch_snapshot = calendar.fetch_snapshot
+
+        def fetch_and_clear(*args, **kwargs):
+            # As if the server dropped the snapshots right after they were fetched
+            snapshot = fetch_snapshot(*args, **kwargs)
+            calendar.clear_snapshots()
+            return snapshot
+        monkeypatch.setattr(calendar, "fetch_snapshot", fetch_and_clear)
+
+    cleared(work_calendar)
+    cleared(vacation_calendar)
+    built = report((work_calendar, vacation_calendar))
+    assert built.to_dict()["actual_hours"] == 8.0
+    # No fetch outside fetch_snapshots, whose pages are counted
+    assert len(api.requests) == built.api_pages_requested == 2
@@ -0,0 +1,10 @@
+from dateutil.parser import parse
+
+from reference import synthetic_timestamps
+from timestamps import parse_timestamp
+
+
+def test_fast_path_matches_dateutil():
+    for value in synthetic_timestamps(20_000) + ["2025-03-01T09:00:00.123456789+01:00", "01.03.2025 09:00"]:
+        parsed, expected = parse_timestamp(value), parse(value)
+        assert parsed == expected and parsed.utcoffset() == expected.utcoffset(), value
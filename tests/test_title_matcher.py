@@ -0,0 +1,32 @@
+import pytest
+
+from reference import loop_title_filter, synthetic_keywords, synthetic_titles
+from title_matcher import TitleMatcher
+
+
+@pytest.mark.parametrize("count", [1, 3, 50])
+def test_matcher_selects_the_titles_of_substring_tests(count):
+    titles = synthetic_titles(20_000)
+    include = synthetic_keywords(count)
+    events = [{"summary": title} for title in titles]
+    matched = [event["summary"] for event in TitleMatcher(include, ["review"]).filter(events)]
+    assert matched == loop_title_filter(titles, include, ["review"])
+
+
+def test_matcher_ignores_case_and_reads_regexes():
+    assert TitleMatcher(["NIGHT"]).matches("Night shift")
+    assert TitleMatcher(["straße"]).matches("HAUPTSTRASSE 1") is False
+    assert TitleMatcher(["STRASSE"]).matches("Hauptstrasse 1")
+    assert TitleMatcher(include_regex=["^night"]).matches("Night shift")
+
+
+@pytest.mark.parametrize("keyword, title", [("strasse", "Hauptstraße 1"), ("ß", "Klasse"), ("ss", "Fußball")])
+def test_keywords_are_not_casefolded(keyword, title):
+    # Same as keyword.lower() in title.lower()
+    assert TitleMatcher([keyword]).matches(title) is False
+    assert TitleMatcher(exclude=[keyword]).matches(title)
+
+
+def test_invalid_regex_raises_value_error():
+    with pytest.raises(ValueError):
+        TitleMatcher(include_regex=["("])
@@ -0,0 +1,41 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from reference import closed_form_expected_working_days, loop_contract_dates, loop_expected_working_days, loop_holidays
+from run import HolidayCalendar, User, count_weekdays
+
+
+def random_periods(samples=500, seed=7):
+    """
+    To generate random periods, weekday sets and days off
+    """
+    rng = random.Random(seed)
+    for _ in range(samples):
+        start_date = date(2015, 1, 1) + timedelta(days=rng.randrange(3000))
+        end_date = start_date + timedelta(days=rng.randrange(1200))
+        weekdays = rng.sample(range(7), rng.randint(1, 7))
+        days_off = {start_date + timedelta(days=rng.randrange(-10, 1300)) for _ in range(rng.randrange(40))}
+        yield start_date, end_date, weekdays, days_off
+
+
+def test_closed_form_matches_the_day_loops():
+    for start_date, end_date, weekdays, days_off in random_periods():
+        assert count_weekdays(start_date, end_date, weekdays) == len(loop_contract_dates(start_date, end_date, weekdays))
+        assert closed_form_expected_working_days(start_date, end_date, weekdays, days_off) == \
+            loop_expected_working_days(start_date, end_date, weekdays, days_off)
+        user = User("test", "AT", 40, weekdays)
+        assert user.get_contract_working_weekdays_dates(start_date, end_date) == \
+            loop_contract_dates(start_date, end_date, weekdays)
+
+
+def test_count_weekdays_of_an_empty_period():
+    assert count_weekdays(date(2025, 3, 2), date(2025, 3, 1), range(7)) == 0
+
+
+@pytest.mark.parametrize("country_code", ["AT", "DE", "US", "GB"])
+def test_holiday_index_matches_the_day_loop(country_code):
+    start_date, end_date = date(2019, 3, 15), date(2025, 11, 2)
+    assert HolidayCalendar(country_code).fetch_holidays(start_date, end_date) == \
+        loop_holidays(country_code, start_date, end_date)
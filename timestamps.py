@@ -0,0 +1,34 @@
+"""
+Fast parsing of the RFC3339 timestamps returned by the Calendar API
+('2025-03-01T09:00:00+01:00', '2025-03-01T08:00:00Z', or '2025-03-01'
+for all-day events). dateutil's general purpose parser is only used
+as a fallback for anything else.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from dateutil.parser import parse
+
+# UTC offsets seen so far, a calendar only ever uses a handful of them
+_OFFSETS: Dict[str, timezone] = {"Z": timezone.utc, "z": timezone.utc}
+
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    To parse an API timestamp into a datetime (timezone aware when the
+    value has an offset), the same datetime dateutil's parse would return
+    """
+    try:
+        if value[-1] in "Zz":
+            return datetime.fromisoformat(value[:-1]).replace(tzinfo=timezone.utc)
+        if len(value) > 10 and value[-6] in "+-" and value[-3] == ":":
+            offset = value[-6:]
+            zone = _OFFSETS.get(offset)
+            if zone is None:
+                sign = -1 if offset[0] == "-" else 1
+                zone = timezone(sign * timedelta(hours=int(offset[1:3]), minutes=int(offset[4:6])))
+                _OFFSETS[offset] = zone
+            return datetime.fromisoformat(value[:-6]).replace(tzinfo=zone)
+        return datetime.fromisoformat(value)
+    except (ValueError, IndexError, TypeError):
+        return parse(value)
@@ -0,0 +1,137 @@
+"""
+Compiled event title filters. A filter is either a single keyword (the
+title_filter typed in the app) or a dict of include/exclude keywords and
+regular expressions, e.g. in a batch config:
+
+    "title_filter": {"include": ["shift", "dienst"], "exclude": ["cancelled"],
+                     "include_regex": ["^night "], "exclude_regex": []}
+
+A title matches if it contains any include keyword or regex (when there
+are some) and none of the exclude ones, case-insensitively: keywords are
+plain substrings of the lowercased title, like `keyword.lower() in
+title.lower()` (no casefolding, so 'ss' doesn't match 'ß'). The keywords
+are compiled into a single regex shaped like a trie, so each title is
+scanned once whatever the number of keywords, and the verdict of every
+distinct title is cached: recurring shifts share their title.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, Optional, Pattern, Tuple, Union
+
+FILTER_KEYS = ("include", "exclude", "include_regex", "exclude_regex")
+# Verdicts kept per matcher before the cache is emptied
+MAX_CACHED_TITLES = 100_000
+
+
+def trie_pattern(keywords: Iterable[str]) -> str:
+    """
+    To build a regex matching any of the keywords, factored like a trie
+    ('night shift', 'nightly' -> 'night(?: shift|ly)'). A keyword that
+    extends another one is dropped, finding the shorter one is enough
+    """
+    trie: dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        if "" in node:
+            return ""
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+
+    return build(trie) if trie else ""
+
+
+def _compile(keywords: Tuple[str, ...], patterns: Tuple[str, ...]) -> Optional[Pattern]:
+    """
+    To compile keywords and regexes into one pattern searched in lowercased
+    titles. Only the regexes are case-insensitive: IGNORECASE on the whole
+    pattern would keep re from skipping ahead to the keywords' first letters
+    """
+    parts = ([trie_pattern(keywords)] if keywords else []) + [f"(?i:{pattern})" for pattern in patterns]
+    return re.compile("|".join(parts)) if parts else None
+
+
+class TitleMatcher:
+    def __init__(self, include: Iterable[str] = (), exclude: Iterable[str] = (),
+                 include_regex: Iterable[str] = (), exclude_regex: Iterable[str] = ()):
+        self.include = tuple(sorted({keyword.lower() for keyword in include if keyword}))
+        self.exclude = tuple(sorted({keyword.lower() for keyword in exclude if keyword}))
+        self.include_regex = tuple(include_regex)
+        self.exclude_regex = tuple(exclude_regex)
+        # Hashable and JSON friendly identity of the filter
+        self.key = (self.include, self.exclude, self.include_regex, self.exclude_regex)
+        try:
+            self._include = _compile(self.include, self.include_regex)
+            self._exclude = _compile(self.exclude, self.exclude_regex)
+        except re.error as e:
+            raise ValueError(f"Invalid title filter regex: {e}") from None
+        self._verdicts: Dict[str, bool] = {}
+
+    @property
+    def matches_all(self) -> bool:
+        return self._include is None and self._exclude is None
+
+    @property
+    def server_query(self) -> Optional[str]:
+        """
+        To return the text the Calendar API can search for (q=) to
+        pre-select the events, None if the filter can't be pushed down.
+        Only a single include keyword can: the API requires every search
+        term, so it can't express 'any of' several keywords or a regex
+        """
+        if len(self.include) == 1 and not self.include_regex:
+            return self.include[0]
+        return None
+
+    def matches(self, title: str) -> bool:
+        verdict = self._verdicts.get(title)
+        if verdict is None:
+            lowered = title.lower()
+            verdict = (self._include is None or self._include.search(lowered) is not None) and \
+                (self._exclude is None or self._exclude.search(lowered) is None)
+            if len(self._verdicts) >= MAX_CACHED_TITLES:
+                self._verdicts.clear()
+            self._verdicts[title] = verdict
+        return verdict
+
+    def filter(self, events: Iterable[dict]) -> Iterator[dict]:
+        """
+        To yield the events whose summary matches, in one pass
+        """
+        if self.matches_all:
+            yield from events
+            return
+        matches = self.matches
+        for event in events:
+            if matches(event.get("summary") or ""):
+                yield event
+
+
+def get_title_matcher(title_filter: Union[None, str, dict, TitleMatcher]) -> TitleMatcher:
+    """
+    To return the compiled matcher of a title filter (a keyword, a dict
+    with FILTER_KEYS or a TitleMatcher), shared by every equal filter
+    """
+    if isinstance(title_filter, TitleMatcher):
+        return title_filter
+    if not title_filter:
+        return _get_matcher((), (), (), ())
+    if isinstance(title_filter, str):
+        return _get_matcher((title_filter,), (), (), ())
+    unknown = set(title_filter) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown title filter keys {', '.join(sorted(unknown))}: use {', '.join(FILTER_KEYS)}")
+    values = []
+    for name in FILTER_KEYS:
+        value = title_filter.get(name) or ()
+        values.append((value,) if isinstance(value, str) else tuple(value))
+    return _get_matcher(*values)
+
+
+@lru_cache(maxsize=256)
+def _get_matcher(include, exclude, include_regex, exclude_regex) -> TitleMatcher:
+    return TitleMatcher(include, exclude, include_regex, exclude_regex)